@@ -18,8 +18,11 @@ from logging_config import logger
 load_dotenv()
 
 from config import FRONTEND_URL, init_supabase
+from http_client import close_http_sessions
+from db_metrics import finalizar_resumo_db, iniciar_resumo_db
 from api_pkg.rate_limit import limiter
-from api_pkg.observability import inc_counter, observe_histogram, render_metrics
+from observability import counter, histogram, render_metrics
+from api_pkg.webhook_worker import start_webhook_workers, stop_webhook_workers
 
 # ─── App & Rate Limiter ─────────────────────────────────────────────────────
 
@@ -35,6 +38,15 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 async def startup_event():
     await init_supabase()
     logger.info("Supabase async client initialized (API).")
+    start_webhook_workers(process_webhook_event)
+    logger.info("Webhook workers started (API).")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_webhook_workers()
+    await close_http_sessions()
+    logger.info("Shared HTTP sessions closed (API).")
 
 
 # ─── CORS ────────────────────────────────────────────────────────────────────
@@ -78,26 +90,39 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
 app.add_middleware(SecurityHeadersMiddleware)
 
 
+API_REQUESTS = counter("api_requests_total", "HTTP requests by method, route template and status")
+API_REQUEST_DURATION = histogram(
+    "api_request_duration_seconds",
+    "HTTP request latency by method and route template",
+)
+
+
+def _route_template(request: Request) -> str:
+    # Set by the router on the shared scope; unmatched paths (404 scans) share one label
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
 class RequestObservabilityMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         start = time.perf_counter()
-        response = await call_next(request)
+        db_token = iniciar_resumo_db(f"{request.method} {request.url.path}")
+        try:
+            response = await call_next(request)
+        finally:
+            finalizar_resumo_db(db_token)
         duration = time.perf_counter() - start
-        route_path = request.url.path
-        labels = {
-            "method": request.method,
-            "path": route_path,
-            "status": str(response.status_code),
-        }
-        inc_counter("api_requests_total", labels=labels)
-        observe_histogram("api_request_duration_seconds", duration, labels=labels)
+        route_path = _route_template(request)
+        API_REQUESTS.labels(method=request.method, path=route_path, status=str(response.status_code)).inc()
+        API_REQUEST_DURATION.labels(method=request.method, path=route_path).observe(duration)
         logger.info(
             "request_id=%s method=%s path=%s status=%s duration_ms=%.2f",
             getattr(request.state, "request_id", "n/a"),
             request.method,
-            route_path,
+            request.url.path,
             response.status_code,
             duration * 1000,
+            extra={"sampled": True},
         )
         return response
 
@@ -107,9 +132,12 @@ app.add_middleware(RequestObservabilityMiddleware)
 
 # ─── Routes ──────────────────────────────────────────────────────────────────
 
-from api_pkg.routes.payment import router as payment_router
+from api_pkg.routes.payment import process_webhook_event, router as payment_router
 app.include_router(payment_router)
 
+from api_pkg.routes.transacoes import router as transacoes_router
+app.include_router(transacoes_router)
+
 
 @app.get("/")
 async def root():
@@ -2,13 +2,36 @@
 
 from __future__ import annotations
 
+import asyncio
+import time
 from dataclasses import dataclass
 from typing import Any, Optional
 
 import aiohttp
+import jwt
 from fastapi import Header, HTTPException
 
-from config import KEY_TO_USE, SUPABASE_KEY, SUPABASE_URL, supabase
+from observability import inc_counter
+from config import (
+    AUTH_TOKEN_VERIFICATION,
+    KEY_TO_USE,
+    SUPABASE_JWKS_CACHE_TTL,
+    SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWT_SECRET,
+    SUPABASE_KEY,
+    SUPABASE_URL,
+    acessos_frontend_cache,
+    supabase,
+)
+from http_client import get_http_session
+from logging_config import logger
+
+_ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+_JWKS_MIN_REFRESH_SECONDS = 30.0
+
+_jwks_keys: dict[str, jwt.PyJWK] = {}
+_jwks_fetched_at = 0.0
+_jwks_lock = asyncio.Lock()
 
 
 @dataclass
@@ -45,24 +68,151 @@ async def _fetch_user_from_token(access_token: str) -> dict[str, Any]:
     }
 
     timeout = aiohttp.ClientTimeout(total=10)
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        async with session.get(url, headers=headers) as response:
-            if response.status != 200:
-                raise HTTPException(status_code=401, detail="Invalid or expired token")
-            return await response.json()
+    session = get_http_session("supabase")
+    async with session.get(url, headers=headers, timeout=timeout) as response:
+        if response.status != 200:
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+        return await response.json()
 
 
-async def _check_superadmin(discord_id: str) -> bool:
+class _LocalVerificationUnavailable(Exception):
+    """No key available to verify the token locally; caller should use the remote check."""
+
+
+async def _fetch_jwks() -> None:
+    global _jwks_keys, _jwks_fetched_at
+    url = f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+    session = get_http_session("supabase")
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+        if response.status != 200:
+            raise _LocalVerificationUnavailable(f"JWKS status {response.status}")
+        data = await response.json()
+
+    keys: dict[str, jwt.PyJWK] = {}
+    for jwk in data.get("keys", []):
+        kid = jwk.get("kid")
+        if not kid:
+            continue
+        try:
+            keys[kid] = jwt.PyJWK(jwk)
+        except jwt.PyJWTError as exc:
+            logger.warning(f"Ignoring unsupported JWK {kid}: {exc}")
+    _jwks_keys = keys
+    _jwks_fetched_at = time.monotonic()
+
+
+async def _get_signing_key(kid: Optional[str]) -> Any:
+    if not kid:
+        raise _LocalVerificationUnavailable("Token without kid")
+
+    age = time.monotonic() - _jwks_fetched_at
+    if kid not in _jwks_keys or age > SUPABASE_JWKS_CACHE_TTL:
+        async with _jwks_lock:
+            age = time.monotonic() - _jwks_fetched_at
+            # Refetch on expiry, or on an unknown kid (key rotation) at most every few seconds
+            if age > SUPABASE_JWKS_CACHE_TTL or (kid not in _jwks_keys and age > _JWKS_MIN_REFRESH_SECONDS):
+                try:
+                    await _fetch_jwks()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                    raise _LocalVerificationUnavailable(f"JWKS fetch failed: {exc}") from exc
+
+    jwk = _jwks_keys.get(kid)
+    if jwk is None:
+        raise _LocalVerificationUnavailable(f"Unknown kid {kid}")
+    return jwk.key
+
+
+async def _verify_token_locally(access_token: str) -> dict[str, Any]:
+    """Validates signature, expiry and audience of a Supabase access token without a network call."""
+    try:
+        header = jwt.get_unverified_header(access_token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    alg = header.get("alg")
+    if alg == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise _LocalVerificationUnavailable("SUPABASE_JWT_SECRET not configured")
+        key: Any = SUPABASE_JWT_SECRET
+    elif alg in _ASYMMETRIC_ALGORITHMS:
+        key = await _get_signing_key(header.get("kid"))
+    else:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    try:
+        return jwt.decode(
+            access_token,
+            key,
+            algorithms=[alg],
+            audience=SUPABASE_JWT_AUDIENCE,
+            options={"require": ["exp", "sub"]},
+            leeway=5,
+        )
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def _user_from_claims(claims: dict[str, Any]) -> dict[str, Any]:
+    """Shapes JWT claims like the /auth/v1/user payload used by the rest of the API."""
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email"),
+        "role": claims.get("role"),
+        "user_metadata": claims.get("user_metadata") or {},
+        "app_metadata": claims.get("app_metadata") or {},
+    }
+
+
+async def _resolve_user(access_token: str) -> tuple[dict[str, Any], Optional[str]]:
+    if AUTH_TOKEN_VERIFICATION != "remote":
+        try:
+            claims = await _verify_token_locally(access_token)
+        except _LocalVerificationUnavailable as exc:
+            logger.debug(f"Local token verification unavailable, using remote: {exc}")
+        else:
+            user_data = _user_from_claims(claims)
+            discord_id = _extract_discord_id(user_data)
+            if discord_id:
+                inc_counter("auth_token_verifications_total", labels={"method": "local"})
+                return user_data, discord_id
+
+    # Remote check: no local key, remote mode, or claims without the Discord provider id
+    user_data = await _fetch_user_from_token(access_token)
+    inc_counter("auth_token_verifications_total", labels={"method": "remote"})
+    return user_data, _extract_discord_id(user_data)
+
+
+async def _load_frontend_access(discord_id: str) -> dict[str, Any]:
+    """
+    Returns every active usuarios_frontend row of a Discord user in one query:
+    {"superadmin": bool, "guilds": {guild_id: row}}. Cached per discord_id for a
+    short TTL, so repeated requests (e.g. payment status polling) skip the DB.
+    """
+    cached = acessos_frontend_cache.get(discord_id)
+    if cached is not None:
+        inc_counter("auth_access_cache_total", labels={"result": "hit"})
+        return cached
+
+    inc_counter("auth_access_cache_total", labels={"result": "miss"})
     response = await (
         supabase.table("usuarios_frontend")
-        .select("id")
+        .select("id, role, guild_id, ativo")
         .eq("discord_id", discord_id)
-        .eq("role", "superadmin")
         .eq("ativo", True)
-        .limit(1)
         .execute()
     )
-    return bool(response.data)
+    rows = response.data or []
+    access = {
+        "superadmin": any(row.get("role") == "superadmin" for row in rows),
+        "guilds": {str(row.get("guild_id")): row for row in rows if row.get("guild_id")},
+    }
+    acessos_frontend_cache[discord_id] = access
+    return access
+
+
+async def _check_superadmin(discord_id: str) -> bool:
+    access = await _load_frontend_access(discord_id)
+    return access["superadmin"]
 
 
 async def require_auth_context(authorization: Optional[str] = Header(None)) -> AuthContext:
@@ -73,8 +223,7 @@ async def require_auth_context(authorization: Optional[str] = Header(None)) -> A
     if not token:
         raise HTTPException(status_code=401, detail="Authorization bearer token is required")
 
-    user_data = await _fetch_user_from_token(token)
-    discord_id = _extract_discord_id(user_data)
+    user_data, discord_id = await _resolve_user(token)
     if not discord_id:
         raise HTTPException(status_code=403, detail="Discord identity not found in session")
 
@@ -89,13 +238,20 @@ async def require_auth_context(authorization: Optional[str] = Header(None)) -> A
 
 
 async def get_guild_access(discord_id: str, guild_id: str) -> Optional[dict[str, Any]]:
-    response = await (
-        supabase.table("usuarios_frontend")
-        .select("id, role, guild_id, ativo")
-        .eq("discord_id", discord_id)
-        .eq("guild_id", guild_id)
-        .eq("ativo", True)
-        .limit(1)
-        .execute()
-    )
-    return response.data[0] if response.data else None
+    access = await _load_frontend_access(discord_id)
+    row = access["guilds"].get(str(guild_id))
+    return dict(row) if row else None
+
+
+async def authorize_guild_access(auth: AuthContext, guild_id: str, *, require_admin: bool = False) -> dict:
+    """Returns the caller's access row for the guild or raises 403."""
+    if auth.is_superadmin:
+        return {"role": "superadmin", "guild_id": guild_id}
+
+    access = await get_guild_access(auth.discord_id, guild_id)
+    if not access:
+        raise HTTPException(status_code=403, detail="User has no access to this guild")
+
+    if require_admin and access.get("role") not in {"admin", "superadmin"}:
+        raise HTTPException(status_code=403, detail="Admin role required for this action")
+    return access
@@ -0,0 +1,192 @@
+"""Circuit breaker and adaptive concurrency limiter for outbound provider calls."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from observability import inc_counter, register_collector, set_gauge
+from logging_config import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when no outbound slot frees up within the limiter queue timeout."""
+
+    def __init__(self, name: str):
+        super().__init__(f"Concurrency limit reached for '{name}'")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open breaker.
+
+    closed: calls pass; `failure_threshold` consecutive failures open the circuit.
+    open: calls fail fast until `recovery_timeout` seconds have passed.
+    half_open: up to `half_open_max_calls` probe calls pass; a success closes the
+    circuit, a failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.changed_at = 0.0
+        self.half_open_calls = 0
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        logger.warning("Circuit '%s' %s -> %s", self.name, self.state, state)
+        inc_counter("circuit_breaker_transitions_total", labels={"circuit": self.name, "to": state})
+        self.state = state
+        self.changed_at = time.monotonic()
+        self.half_open_calls = 0
+
+    def before_call(self) -> None:
+        """Raises CircuitOpenError when the call must not reach the provider."""
+        if self.state == OPEN:
+            elapsed = time.monotonic() - self.changed_at
+            if elapsed < self.recovery_timeout:
+                inc_counter("circuit_breaker_rejected_total", labels={"circuit": self.name})
+                raise CircuitOpenError(self.name, self.recovery_timeout - elapsed)
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if time.monotonic() - self.changed_at >= self.recovery_timeout:
+                # Probes never reported back (cancelled request): allow new ones
+                self.changed_at = time.monotonic()
+                self.half_open_calls = 0
+            if self.half_open_calls >= self.half_open_max_calls:
+                inc_counter("circuit_breaker_rejected_total", labels={"circuit": self.name})
+                raise CircuitOpenError(self.name, self.recovery_timeout)
+            self.half_open_calls += 1
+
+    def record_success(self) -> None:
+        self.failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._transition(OPEN)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on in-flight calls: grows by one slot per `limit` fast successes,
+    halves on failures or slow responses (latency above `latency_target`).
+    Callers wait up to `queue_timeout` seconds for a slot before being rejected.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 50,
+        latency_target: float = 2.0,
+        queue_timeout: float = 5.0,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.queue_timeout = queue_timeout
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        self._condition: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # The condition belongs to the loop it was first used on
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+        return self._condition
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self.on_failure()
+            return
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_failure(self) -> None:
+        self.limit = max(self.min_limit, self.limit / 2)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        condition = self._get_condition()
+        async with condition:
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self.in_flight < int(self.limit)),
+                    timeout=self.queue_timeout,
+                )
+            except asyncio.TimeoutError:
+                inc_counter("concurrency_limiter_rejected_total", labels={"limiter": self.name})
+                raise ConcurrencyLimitExceeded(self.name) from None
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_flight -= 1
+                condition.notify_all()
+
+
+asaas_breaker = CircuitBreaker(
+    "asaas",
+    failure_threshold=int(os.getenv("ASAAS_CIRCUIT_FAILURE_THRESHOLD", "5")),
+    recovery_timeout=float(os.getenv("ASAAS_CIRCUIT_RECOVERY_SECONDS", "30")),
+)
+asaas_limiter = AdaptiveConcurrencyLimiter(
+    "asaas",
+    initial_limit=int(os.getenv("ASAAS_CONCURRENCY_INITIAL", "10")),
+    max_limit=int(os.getenv("ASAAS_CONCURRENCY_MAX", "50")),
+    latency_target=float(os.getenv("ASAAS_LATENCY_TARGET_SECONDS", "2.0")),
+    queue_timeout=float(os.getenv("ASAAS_CONCURRENCY_QUEUE_TIMEOUT", "5.0")),
+)
+
+
+def collect_resilience_metrics() -> None:
+    for breaker in (asaas_breaker,):
+        set_gauge("circuit_breaker_state", _STATE_VALUES[breaker.state], {"circuit": breaker.name})
+    for limiter in (asaas_limiter,):
+        set_gauge("concurrency_limiter_limit", int(limiter.limit), {"limiter": limiter.name})
+        set_gauge("concurrency_limiter_in_flight", limiter.in_flight, {"limiter": limiter.name})
+
+
+register_collector(collect_resilience_metrics)
@@ -1,3 +1,4 @@
 from api_pkg.routes.payment import router as payment_router
+from api_pkg.routes.transacoes import router as transacoes_router
 
-__all__ = ["payment_router"]
+__all__ = ["payment_router", "transacoes_router"]
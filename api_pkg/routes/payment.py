@@ -18,10 +18,25 @@ import aiohttp
 from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from pydantic import BaseModel, Field
 
-from api_pkg.auth import AuthContext, get_guild_access, require_auth_context
-from api_pkg.observability import inc_counter, observe_histogram
+from api_pkg.auth import AuthContext, authorize_guild_access, require_auth_context
+from api_pkg.circuit_breaker import (
+    CircuitOpenError,
+    ConcurrencyLimitExceeded,
+    asaas_breaker,
+    asaas_limiter,
+)
+from observability import inc_counter, observe_histogram
 from api_pkg.rate_limit import limiter
-from config import ASAAS_API_KEY, ASAAS_API_URL, ASAAS_WEBHOOK_TOKEN, supabase
+from api_pkg.webhook_worker import notify_webhook_worker
+from config import (
+    ASAAS_API_KEY,
+    ASAAS_API_URL,
+    ASAAS_CUSTOMER_HASH_KEY,
+    ASAAS_WEBHOOK_TOKEN,
+    asaas_clientes_cache,
+    supabase,
+)
+from http_client import get_http_session
 from logging_config import logger
 
 router = APIRouter(prefix="/api/pix", tags=["payments"])
@@ -49,52 +64,185 @@ async def _request_asaas(
     timeout = aiohttp.ClientTimeout(total=20, connect=5, sock_connect=5, sock_read=15)
     delay = 0.5
     for attempt in range(retries):
-        start = time.perf_counter()
         try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.request(method, url, headers=headers, json=json_data) as response:
-                    elapsed = time.perf_counter() - start
-                    text = await response.text()
-                    payload: dict | str
-                    try:
-                        payload = json.loads(text) if text else {}
-                    except json.JSONDecodeError:
-                        payload = text
-
-                    inc_counter(
-                        "asaas_http_requests_total",
-                        labels={"method": method, "status": str(response.status), "endpoint": url.split("/")[-1]},
-                    )
-                    observe_histogram(
-                        "asaas_http_request_duration_seconds",
-                        elapsed,
-                        labels={"method": method, "status": str(response.status)},
-                    )
-                    if response.status in {429, 500, 502, 503, 504} and attempt < retries - 1:
-                        await asyncio.sleep(delay + random.uniform(0.05, delay * 0.2))
-                        delay *= 2
-                        continue
-                    return response.status, payload
-        except aiohttp.ClientError:
+            asaas_breaker.before_call()
+            async with asaas_limiter.acquire():
+                start = time.perf_counter()
+                try:
+                    session = get_http_session("asaas")
+                    async with session.request(method, url, headers=headers, json=json_data, timeout=timeout) as response:
+                        text = await response.text()
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    asaas_breaker.record_failure()
+                    asaas_limiter.on_failure()
+                    raise
+                elapsed = time.perf_counter() - start
+        except CircuitOpenError as exc:
+            raise HTTPException(
+                status_code=503,
+                detail="Payment provider temporarily unavailable, try again shortly",
+                headers={"Retry-After": str(max(1, int(exc.retry_after)))},
+            )
+        except ConcurrencyLimitExceeded:
+            raise HTTPException(status_code=503, detail="Payment provider busy, try again shortly")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
             inc_counter("asaas_http_errors_total", labels={"method": method})
             if attempt >= retries - 1:
                 raise
             await asyncio.sleep(delay + random.uniform(0.05, delay * 0.2))
             delay *= 2
+            continue
+
+        payload: dict | str
+        try:
+            payload = json.loads(text) if text else {}
+        except json.JSONDecodeError:
+            payload = text
+
+        inc_counter(
+            "asaas_http_requests_total",
+            labels={"method": method, "status": str(response.status), "endpoint": url.split("/")[-1]},
+        )
+        observe_histogram(
+            "asaas_http_request_duration_seconds",
+            elapsed,
+            labels={"method": method, "status": str(response.status)},
+        )
+        if response.status in {429, 500, 502, 503, 504}:
+            asaas_breaker.record_failure()
+            asaas_limiter.on_failure()
+            if attempt < retries - 1:
+                await asyncio.sleep(delay + random.uniform(0.05, delay * 0.2))
+                delay *= 2
+                continue
+        else:
+            # 4xx are caller errors, not provider health problems
+            asaas_breaker.record_success()
+            asaas_limiter.on_success(elapsed)
+        return response.status, payload
     return 500, {"error": "unexpected_retry_exhausted"}
 
 
-async def _authorize_guild_access(auth: AuthContext, guild_id: str, *, require_admin: bool = False) -> dict:
-    if auth.is_superadmin:
-        return {"role": "superadmin", "guild_id": guild_id}
+def _customer_doc_hash(normalized_doc: str) -> str:
+    # Keyed: a plain SHA-256 of an 11-digit CPF is reversible by brute force
+    key = (ASAAS_CUSTOMER_HASH_KEY or "").encode()
+    return hmac.new(key, normalized_doc.encode(), hashlib.sha256).hexdigest()
 
-    access = await get_guild_access(auth.discord_id, guild_id)
-    if not access:
-        raise HTTPException(status_code=403, detail="User has no access to this guild")
 
-    if require_admin and access.get("role") not in {"admin", "superadmin"}:
-        raise HTTPException(status_code=403, detail="Admin role required for this action")
-    return access
+def _is_stale_customer_error(status: int, payload: dict | str) -> bool:
+    """True when Asaas rejected the charge because of the customer itself."""
+    if status == 404:
+        return True
+    if status != 400 or not isinstance(payload, dict):
+        return False
+    # Other 400s (value, dueDate, ...) are validation errors: the mapping is still good
+    return any(
+        "customer" in str(error.get("code", "")).lower()
+        for error in payload.get("errors") or []
+        if isinstance(error, dict)
+    )
+
+
+async def _get_stored_customer_id(discord_id: str, normalized_doc: str) -> Optional[str]:
+    """Asaas customer id for (discord_id, CPF/CNPJ): in-memory LRU first, then asaas_clientes."""
+    key = (discord_id, _customer_doc_hash(normalized_doc))
+    customer_id = asaas_clientes_cache.get(key)
+    if customer_id:
+        inc_counter("asaas_customer_lookup_total", labels={"source": "memory"})
+        return customer_id
+
+    try:
+        response = await (
+            supabase.table("asaas_clientes")
+            .select("customer_id")
+            .eq("discord_id", key[0])
+            .eq("cpf_cnpj_hash", key[1])
+            .limit(1)
+            .execute()
+        )
+    except Exception as exc:
+        logger.warning("Asaas customer lookup failed discord_id=%s: %s", discord_id, exc)
+        return None
+
+    if not response.data:
+        inc_counter("asaas_customer_lookup_total", labels={"source": "miss"})
+        return None
+    customer_id = response.data[0]["customer_id"]
+    asaas_clientes_cache[key] = customer_id
+    inc_counter("asaas_customer_lookup_total", labels={"source": "table"})
+    return customer_id
+
+
+async def _store_customer_id(discord_id: str, normalized_doc: str, customer_id: str) -> None:
+    key = (discord_id, _customer_doc_hash(normalized_doc))
+    asaas_clientes_cache[key] = customer_id
+    try:
+        await (
+            supabase.table("asaas_clientes")
+            .upsert(
+                {
+                    "discord_id": key[0],
+                    "cpf_cnpj_hash": key[1],
+                    "customer_id": customer_id,
+                    "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                },
+                on_conflict="discord_id,cpf_cnpj_hash",
+            )
+            .execute()
+        )
+    except Exception as exc:
+        logger.warning("Could not persist Asaas customer discord_id=%s: %s", discord_id, exc)
+
+
+async def _forget_customer_id(discord_id: str, normalized_doc: str) -> None:
+    key = (discord_id, _customer_doc_hash(normalized_doc))
+    asaas_clientes_cache.pop(key, None)
+    try:
+        await (
+            supabase.table("asaas_clientes")
+            .delete()
+            .eq("discord_id", key[0])
+            .eq("cpf_cnpj_hash", key[1])
+            .execute()
+        )
+    except Exception as exc:
+        logger.warning("Could not remove Asaas customer discord_id=%s: %s", discord_id, exc)
+
+
+async def _create_asaas_customer(discord_id: str, normalized_doc: str, customer_email: str, headers: dict) -> str:
+    """Creates (or finds by e-mail) the Asaas customer and remembers its id."""
+    customer_data = {
+        "name": f"Discord {discord_id}",
+        "email": customer_email,
+        "cpfCnpj": normalized_doc,
+        "externalReference": discord_id,
+    }
+
+    status, customer_payload = await _request_asaas(
+        "POST", f"{ASAAS_API_URL}/customers", headers, json_data=customer_data
+    )
+    if status != 200:
+        # Attempt by e-mail fallback.
+        status_search, search_payload = await _request_asaas(
+            "GET", f"{ASAAS_API_URL}/customers?email={customer_email}", headers
+        )
+        if status_search == 200 and isinstance(search_payload, dict) and search_payload.get("data"):
+            customer_id = search_payload["data"][0]["id"]
+            await _request_asaas(
+                "PUT",
+                f"{ASAAS_API_URL}/customers/{customer_id}",
+                headers,
+                json_data={"cpfCnpj": normalized_doc},
+            )
+        else:
+            raise HTTPException(status_code=400, detail="Error creating payment customer")
+    else:
+        if not isinstance(customer_payload, dict) or "id" not in customer_payload:
+            raise HTTPException(status_code=502, detail="Invalid customer response from Asaas")
+        customer_id = customer_payload["id"]
+
+    await _store_customer_id(discord_id, normalized_doc, customer_id)
+    return customer_id
 
 
 async def _authorize_payment_access(auth: AuthContext, payment: dict, *, require_admin: bool = False) -> dict:
@@ -109,7 +257,7 @@ async def _authorize_payment_access(auth: AuthContext, payment: dict, *, require
             raise HTTPException(status_code=403, detail="Payment does not belong to authenticated user")
         return {"role": "owner"}
 
-    access = await _authorize_guild_access(auth, guild_id, require_admin=False)
+    access = await authorize_guild_access(auth, guild_id, require_admin=False)
     if require_admin and access.get("role") not in {"admin", "superadmin"}:
         raise HTTPException(status_code=403, detail="Admin role required")
 
@@ -142,61 +290,46 @@ async def _register_webhook_event(
     return bool(response.data)
 
 
-async def _mark_webhook_event(event_hash: str, status: str, error_message: Optional[str] = None) -> None:
-    update_data = {
-        "status": status,
-        "processed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
-    }
-    if error_message:
-        update_data["error_message"] = error_message[:1000]
-    await supabase.table("webhook_events").update(update_data).eq("event_hash", event_hash).execute()
+def _is_unique_violation(exc: Exception) -> bool:
+    code = getattr(exc, "code", None)
+    return code == "23505" or "duplicate key" in str(exc).lower()
 
 
 async def process_payment_confirmation(payment_id: str) -> bool:
+    """Activates the subscription for a paid PIX exactly once (RPC `confirmar_pagamento_pix`).
+
+    The RPC locks the payment row, so concurrent confirmations of the same payment
+    (PAYMENT_RECEIVED + PAYMENT_CONFIRMED on different workers) apply it once.
+    """
     logger.info("Processing confirmation for payment_id=%s", payment_id)
 
-    pay_record = (
-        await supabase.table("pagamentos_pix").select("*").eq("pix_id", payment_id).single().execute()
-    )
-    if not pay_record.data:
-        logger.warning("Payment %s not found in database", payment_id)
-        inc_counter("payment_confirmation_not_found_total")
-        return False
+    response = await supabase.rpc("confirmar_pagamento_pix", {"p_pix_id": payment_id}).execute()
+    resultado = (response.data or {}).get("resultado")
 
-    if pay_record.data.get("status") == "pago":
+    if resultado == "pago":
+        inc_counter("payment_confirmation_success_total")
+        return True
+    if resultado == "pendente_ativacao":
+        logger.warning("Payment %s paid but no guild linked yet", payment_id)
+        inc_counter("payment_confirmation_pending_activation_total")
+        return True
+    if resultado == "ja_processado":
         logger.info("Payment %s already processed", payment_id)
         inc_counter("payment_confirmation_already_processed_total")
         return False
+    if resultado == "nao_encontrado":
+        logger.warning("Payment %s not found in database", payment_id)
+        inc_counter("payment_confirmation_not_found_total")
+        return False
+    # plano_nao_encontrado or an unexpected payload: fail so the webhook event is retried
+    raise RuntimeError(f"Payment {payment_id} confirmation failed: {resultado or response.data!r}")
 
-    await supabase.table("pagamentos_pix").update({"status": "pago"}).eq("pix_id", payment_id).execute()
-
-    guild_id = pay_record.data["guild_id"]
-    plano_id = pay_record.data["plano_id"]
-    if guild_id == "pending_activation":
-        logger.warning("Payment %s paid but no guild linked yet", payment_id)
-        inc_counter("payment_confirmation_pending_activation_total")
-        return True
 
-    plano = await supabase.table("planos").select("*").eq("id", plano_id).single().execute()
-    days = int(plano.data["duracao_dias"])
-    now = datetime.datetime.now(datetime.timezone.utc)
-    expiration = (now + datetime.timedelta(days=days)).isoformat()
-
-    existing = await supabase.table("assinaturas").select("id").eq("guild_id", guild_id).execute()
-    subscription_data = {
-        "plano_id": plano_id,
-        "data_inicio": now.isoformat(),
-        "data_expiracao": expiration,
-        "status": "ativa",
-        "pagador_discord_id": pay_record.data.get("discord_id"),
-    }
-    if existing.data:
-        await supabase.table("assinaturas").update(subscription_data).eq("guild_id", guild_id).execute()
-    else:
-        subscription_data["guild_id"] = guild_id
-        await supabase.table("assinaturas").insert(subscription_data).execute()
-    inc_counter("payment_confirmation_success_total")
-    return True
+async def process_webhook_event(event: dict) -> None:
+    """Webhook worker handler: applies one recorded `webhook_events` row."""
+    payment_id = event.get("payment_id")
+    if payment_id and event.get("event_type") in {"PAYMENT_RECEIVED", "PAYMENT_CONFIRMED"}:
+        await process_payment_confirmation(payment_id)
 
 
 @router.post("/create")
@@ -215,7 +348,7 @@ async def create_pix_charge(
         raise HTTPException(status_code=422, detail="cpf_cnpj must be valid digits")
 
     if req.guild_id != "pending_activation":
-        await _authorize_guild_access(auth, req.guild_id)
+        await authorize_guild_access(auth, req.guild_id)
 
     plan_resp = await supabase.table("planos").select("*").eq("id", req.plano_id).single().execute()
     if not plan_resp.data:
@@ -227,35 +360,10 @@ async def create_pix_charge(
         "Content-Type": "application/json",
     }
     customer_email = req.email or auth.email or f"user_{auth.discord_id}@fazendeiro.bot"
-    customer_data = {
-        "name": f"Discord {auth.discord_id}",
-        "email": customer_email,
-        "cpfCnpj": normalized_doc,
-        "externalReference": auth.discord_id,
-    }
-
-    status, customer_payload = await _request_asaas(
-        "POST", f"{ASAAS_API_URL}/customers", headers, json_data=customer_data
-    )
-    if status != 200:
-        # Attempt by e-mail fallback.
-        status_search, search_payload = await _request_asaas(
-            "GET", f"{ASAAS_API_URL}/customers?email={customer_email}", headers
-        )
-        if status_search == 200 and isinstance(search_payload, dict) and search_payload.get("data"):
-            customer_id = search_payload["data"][0]["id"]
-            await _request_asaas(
-                "PUT",
-                f"{ASAAS_API_URL}/customers/{customer_id}",
-                headers,
-                json_data={"cpfCnpj": normalized_doc},
-            )
-        else:
-            raise HTTPException(status_code=400, detail="Error creating payment customer")
-    else:
-        if not isinstance(customer_payload, dict) or "id" not in customer_payload:
-            raise HTTPException(status_code=502, detail="Invalid customer response from Asaas")
-        customer_id = customer_payload["id"]
+    customer_id = await _get_stored_customer_id(auth.discord_id, normalized_doc)
+    customer_from_store = customer_id is not None
+    if customer_id is None:
+        customer_id = await _create_asaas_customer(auth.discord_id, normalized_doc, customer_email, headers)
 
     due_date = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
     charge_data = {
@@ -269,6 +377,16 @@ async def create_pix_charge(
     status_charge, charge_payload = await _request_asaas(
         "POST", f"{ASAAS_API_URL}/payments", headers, json_data=charge_data
     )
+    if customer_from_store and _is_stale_customer_error(status_charge, charge_payload):
+        # Stored customer may have been removed on Asaas: resolve it again once.
+        logger.warning("Stored Asaas customer rejected, recreating discord_id=%s", auth.discord_id)
+        await _forget_customer_id(auth.discord_id, normalized_doc)
+        charge_data["customer"] = await _create_asaas_customer(
+            auth.discord_id, normalized_doc, customer_email, headers
+        )
+        status_charge, charge_payload = await _request_asaas(
+            "POST", f"{ASAAS_API_URL}/payments", headers, json_data=charge_data
+        )
     if status_charge != 200 or not isinstance(charge_payload, dict):
         raise HTTPException(status_code=502, detail="Error creating charge with Asaas")
     payment_id = charge_payload.get("id")
@@ -352,8 +470,12 @@ async def handle_webhook(
             payment_id=payment_id,
             payload=data,
         )
-    except Exception:
-        # Duplicate event hash.
+    except Exception as exc:
+        if not _is_unique_violation(exc):
+            # Not recorded: let Asaas retry instead of acknowledging a lost event.
+            logger.exception("Webhook not recorded request_id=%s payment_id=%s", request_id, payment_id)
+            inc_counter("pix_webhook_failed_total")
+            raise HTTPException(status_code=500, detail="Webhook processing error")
         logger.info(
             "Duplicate webhook ignored request_id=%s event_hash=%s payment_id=%s",
             request_id,
@@ -365,17 +487,10 @@ async def handle_webhook(
     if not was_inserted:
         return {"status": "duplicate", "payment_id": payment_id}
 
-    try:
-        if payment_id and event in {"PAYMENT_RECEIVED", "PAYMENT_CONFIRMED"}:
-            await process_payment_confirmation(payment_id)
-        await _mark_webhook_event(event_hash, "processed")
-        inc_counter("pix_webhook_processed_total", labels={"event": event})
-        return {"status": "success", "event": event, "payment_id": payment_id}
-    except Exception as exc:
-        await _mark_webhook_event(event_hash, "failed", str(exc))
-        logger.exception("Webhook error request_id=%s payment_id=%s", request_id, payment_id)
-        inc_counter("pix_webhook_failed_total")
-        raise HTTPException(status_code=500, detail="Webhook processing error")
+    # Durably recorded: the webhook workers apply it in the background.
+    notify_webhook_worker()
+    inc_counter("pix_webhook_queued_total", labels={"event": event})
+    return {"status": "queued", "event": event, "payment_id": payment_id}
 
 
 @router.get("/status/{payment_id}")
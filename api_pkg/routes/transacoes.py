@@ -0,0 +1,48 @@
+"""
+Ledger routes for the dashboard.
+Cursor (keyset) paginated transacoes per empresa, newest first.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+
+from api_pkg.auth import AuthContext, authorize_guild_access, require_auth_context
+from api_pkg.rate_limit import limiter
+from config import supabase
+from database import listar_transacoes_empresa
+
+router = APIRouter(prefix="/api/empresas", tags=["transacoes"])
+
+
+@router.get("/{empresa_id}/transacoes")
+@limiter.limit("60/minute")
+async def list_transacoes(
+    request: Request,
+    empresa_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=100),
+    tipo: Optional[str] = None,
+    funcionario_id: Optional[int] = None,
+    auth: AuthContext = Depends(require_auth_context),
+):
+    empresa = await supabase.table("empresas").select("id, guild_id").eq("id", empresa_id).limit(1).execute()
+    if not empresa.data:
+        raise HTTPException(status_code=404, detail="Empresa not found")
+    await authorize_guild_access(auth, empresa.data[0]["guild_id"])
+
+    try:
+        page = await listar_transacoes_empresa(empresa_id, limit, cursor, tipo, funcionario_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+    if page is None:
+        raise HTTPException(status_code=503, detail="Ledger temporarily unavailable")
+
+    return {
+        "request_id": getattr(request.state, "request_id", "n/a"),
+        "empresa_id": empresa_id,
+        "items": page["itens"],
+        "next_cursor": page["proximo_cursor"],
+    }
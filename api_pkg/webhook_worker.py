@@ -0,0 +1,181 @@
+"""Background processing of payment webhooks stored in `webhook_events`.
+
+`handle_webhook` only records the event (status 'processing') and wakes the
+dispatcher. The dispatcher claims due rows through the `claim_webhook_events`
+RPC and hands them to a fixed number of workers, claiming again as soon as a
+slot frees while a backlog remains; failures are retried with
+exponential backoff until WEBHOOK_MAX_ATTEMPTS, then marked 'failed'. Rows left
+claimed by a dead process are reclaimed after WEBHOOK_STALE_SECONDS.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import os
+import random
+from typing import Any, Awaitable, Callable, Optional
+
+from observability import inc_counter, observe_histogram
+from config import supabase
+from logging_config import logger
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "600"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "10"))
+WEBHOOK_STALE_SECONDS = int(os.getenv("WEBHOOK_STALE_SECONDS", "300"))
+
+WebhookHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+_wakeup: Optional[asyncio.Event] = None
+_tasks: list[asyncio.Task] = []
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt number."""
+    delay = min(WEBHOOK_RETRY_MAX_SECONDS, WEBHOOK_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return delay + random.uniform(0, delay * 0.1)
+
+
+async def claim_due_events(limit: int) -> list[dict[str, Any]]:
+    response = await supabase.rpc(
+        "claim_webhook_events",
+        {"p_limit": limit, "p_stale_seconds": WEBHOOK_STALE_SECONDS},
+    ).execute()
+    return response.data or []
+
+
+async def _update_event(event_id: int, data: dict[str, Any]) -> None:
+    await supabase.table("webhook_events").update(data).eq("id", event_id).execute()
+
+
+async def process_event(event: dict[str, Any], handler: WebhookHandler) -> str:
+    """Runs the handler for one claimed event and records the outcome. Returns the new status."""
+    attempts = int(event.get("attempts") or 1)
+    event_type = event.get("event_type", "unknown")
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        await handler(event)
+    except Exception as exc:
+        error_message = str(exc)[:1000]
+        if attempts >= WEBHOOK_MAX_ATTEMPTS:
+            logger.exception("Webhook event %s failed permanently after %s attempts", event.get("id"), attempts)
+            await _update_event(
+                event["id"],
+                {
+                    "status": "failed",
+                    "locked_at": None,
+                    "error_message": error_message,
+                    "processed_at": _now().isoformat(),
+                },
+            )
+            inc_counter("pix_webhook_failed_total")
+            return "failed"
+
+        delay = retry_delay(attempts)
+        logger.warning(
+            "Webhook event %s failed (attempt %s/%s), retrying in %.1fs: %s",
+            event.get("id"),
+            attempts,
+            WEBHOOK_MAX_ATTEMPTS,
+            delay,
+            exc,
+        )
+        await _update_event(
+            event["id"],
+            {
+                "locked_at": None,
+                "error_message": error_message,
+                "next_attempt_at": (_now() + datetime.timedelta(seconds=delay)).isoformat(),
+            },
+        )
+        inc_counter("pix_webhook_retries_total", labels={"event": event_type})
+        return "processing"
+
+    await _update_event(
+        event["id"],
+        {"status": "processed", "locked_at": None, "processed_at": _now().isoformat()},
+    )
+    inc_counter("pix_webhook_processed_total", labels={"event": event_type})
+    observe_histogram("pix_webhook_processing_seconds", loop.time() - start, labels={"event": event_type})
+    return "processed"
+
+
+async def _worker(queue: asyncio.Queue, handler: WebhookHandler, wakeup: asyncio.Event, backlog: asyncio.Event) -> None:
+    while True:
+        event = await queue.get()
+        try:
+            await process_event(event, handler)
+        except Exception:
+            # Could not even record the outcome; the row is reclaimed once stale.
+            logger.exception("Webhook worker could not update event %s", event.get("id"))
+        finally:
+            queue.task_done()
+            # The last claim filled the queue: more rows are due, claim as soon as a slot frees
+            if backlog.is_set():
+                wakeup.set()
+
+
+async def _dispatcher(queue: asyncio.Queue, wakeup: asyncio.Event, backlog: asyncio.Event) -> None:
+    capacity = WEBHOOK_WORKERS * 2
+    while True:
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=WEBHOOK_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        wakeup.clear()
+
+        while True:
+            free = capacity - queue.qsize()
+            if free <= 0:
+                backlog.set()
+                break
+            try:
+                events = await claim_due_events(free)
+            except Exception as exc:
+                logger.warning("Could not claim webhook events: %s", exc)
+                break
+            for event in events:
+                queue.put_nowait(event)
+            if len(events) < free:
+                backlog.clear()
+                break
+
+
+def notify_webhook_worker() -> None:
+    """Wakes the dispatcher right after a new event is recorded."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+def start_webhook_workers(handler: WebhookHandler) -> None:
+    """Starts the dispatcher and WEBHOOK_WORKERS workers on the running loop (API startup)."""
+    global _wakeup
+    if _tasks:
+        return
+    queue: asyncio.Queue = asyncio.Queue(maxsize=WEBHOOK_WORKERS * 2)
+    _wakeup = asyncio.Event()
+    # Drain whatever was left pending/claimed before this process started
+    _wakeup.set()
+    # Set while the last claim may have left due rows behind (queue was full)
+    backlog = asyncio.Event()
+    _tasks.append(asyncio.create_task(_dispatcher(queue, _wakeup, backlog), name="webhook-dispatcher"))
+    for i in range(WEBHOOK_WORKERS):
+        _tasks.append(asyncio.create_task(_worker(queue, handler, _wakeup, backlog), name=f"webhook-worker-{i}"))
+
+
+async def stop_webhook_workers() -> None:
+    """Cancels the workers; events still claimed are reclaimed by the next process."""
+    global _wakeup
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    _wakeup = None
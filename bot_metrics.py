@@ -0,0 +1,222 @@
+"""
+Bot Multi-Empresa Downtown - Métricas do bot
+Instrumenta comandos (latência, erros, checks que bloquearam) e o tempo até o
+ack das interações, e expõe tudo em /metrics num servidor aiohttp local.
+
+Usa o mesmo registro de `observability`, então as métricas do pool HTTP
+também aparecem aqui.
+"""
+
+import functools
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from aiohttp import web
+from discord import InteractionType
+from discord.ext import commands
+from discord.interactions import InteractionResponse
+
+from observability import counter, gauge, histogram, register_collector, render_metrics
+from db_metrics import finalizar_resumo_db, iniciar_resumo_db
+from logging_config import logger
+
+# Só localhost por padrão (as métricas expõem detalhes por servidor e shard);
+# BOT_METRICS_HOST=0.0.0.0 libera para um Prometheus externo. Porta 0 desativa o servidor
+BOT_METRICS_HOST = os.getenv('BOT_METRICS_HOST', '127.0.0.1')
+BOT_METRICS_PORT = int(os.getenv('BOT_METRICS_PORT', '9108'))
+
+COMANDOS = counter('bot_commands_total', 'Comandos executados por comando, cog e resultado')
+DURACAO_COMANDO = histogram(
+    'bot_command_duration_seconds',
+    'Latência dos comandos (do before_invoke ao after_invoke)',
+)
+ERROS_COMANDO = counter('bot_command_errors_total', 'Erros de comando por tipo de exceção')
+CHECKS_FALHOS = counter('bot_check_failures_total', 'Comandos barrados por checks (permissão, empresa, etc.)')
+BLOQUEIOS_ASSINATURA = counter('bot_subscription_blocks_total', 'Comandos bloqueados por falta de assinatura')
+ACK_INTERACAO = histogram(
+    'bot_interaction_ack_seconds',
+    'Tempo entre a criação da interação no Discord e o primeiro ack do bot',
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0),
+)
+FASES_INICIALIZACAO = gauge('bot_startup_phase_seconds', 'Duração de cada fase da inicialização do bot')
+TEMPO_INICIALIZACAO = gauge('bot_startup_seconds', 'Tempo do início do processo até o primeiro on_ready')
+CARGA_COG = gauge('bot_cog_load_seconds', 'Tempo de carga de cada extensão')
+LATENCIA_SHARD = gauge('bot_shard_latency_seconds', 'Latência do heartbeat do gateway por shard')
+GUILDS_SHARD = gauge('bot_shard_guilds', 'Servidores atendidos por shard')
+SHARD_CONECTADO = gauge('bot_shard_up', 'Shard conectado ao gateway (1) ou não (0)')
+
+_METODOS_ACK = ('defer', 'send_message', 'send_modal', 'edit_message')
+_runner: Optional[web.AppRunner] = None
+
+
+def _rotulos(ctx) -> dict:
+    comando = ctx.command.qualified_name if ctx.command else 'desconhecido'
+    cog = ctx.cog.qualified_name if ctx.cog else 'nenhum'
+    return {'command': comando, 'cog': cog}
+
+
+async def _antes_do_comando(ctx):
+    ctx.metricas_inicio = time.perf_counter()
+    ctx.resumo_db_token = iniciar_resumo_db(f"cmd:{_rotulos(ctx)['command']}")
+
+
+async def _depois_do_comando(ctx):
+    inicio = getattr(ctx, 'metricas_inicio', None)
+    if inicio is None:
+        return
+    token = getattr(ctx, 'resumo_db_token', None)
+    if token is not None:
+        try:
+            finalizar_resumo_db(token)
+        except ValueError:
+            pass  # token criado em outro contexto (hook chamado fora da task do comando)
+    rotulos = _rotulos(ctx)
+    DURACAO_COMANDO.labels(rotulos).observe(time.perf_counter() - inicio)
+    COMANDOS.labels(rotulos, status='error' if ctx.command_failed else 'ok').inc()
+
+
+def registrar_erro_comando(ctx, error):
+    """Conta o erro de um comando (chamado pelo on_command_error)."""
+    if isinstance(error, commands.CommandNotFound):
+        return
+    rotulos = _rotulos(ctx)
+    if isinstance(error, commands.CheckFailure):
+        CHECKS_FALHOS.labels(rotulos, check=type(error).__name__).inc()
+        COMANDOS.labels(rotulos, status='check_failure').inc()
+        return
+    original = getattr(error, 'original', error)
+    ERROS_COMANDO.labels(rotulos, error=type(original).__name__).inc()
+
+
+def registrar_bloqueio_assinatura(ctx, motivo: str):
+    """Conta um comando barrado pelo check global de assinatura."""
+    BLOQUEIOS_ASSINATURA.labels(_rotulos(ctx), reason=motivo).inc()
+
+
+def _instrumentar_ack(nome: str):
+    original = getattr(InteractionResponse, nome)
+    if getattr(original, '_metricas_ack', False):
+        return
+
+    @functools.wraps(original)
+    async def wrapper(self, *args, **kwargs):
+        resultado = await original(self, *args, **kwargs)
+        interacao = self._parent
+        criada_em = getattr(interacao, 'created_at', None)
+        if criada_em is not None:
+            if interacao.type is InteractionType.application_command and interacao.command:
+                origem = interacao.command.qualified_name
+            else:
+                origem = interacao.type.name if interacao.type else 'desconhecido'
+            atraso = (datetime.now(timezone.utc) - criada_em).total_seconds()
+            ACK_INTERACAO.labels(kind=nome, source=origem).observe(max(atraso, 0.0))
+        return resultado
+
+    wrapper._metricas_ack = True
+    setattr(InteractionResponse, nome, wrapper)
+
+
+def registrar_metricas_bot(bot: commands.Bot):
+    """Instala os hooks de métricas de comandos e de ack de interações."""
+    bot.before_invoke(_antes_do_comando)
+    bot.after_invoke(_depois_do_comando)
+    # discord.py não tem hook de resposta: o primeiro ack passa por um destes métodos
+    for nome in _METODOS_ACK:
+        _instrumentar_ack(nome)
+
+
+def coletar_metricas_shards(bot: commands.Bot):
+    """Atualiza latência, servidores e estado de cada shard deste processo."""
+    guilds_por_shard: dict = {}
+    for guild in bot.guilds:
+        guilds_por_shard[guild.shard_id] = guilds_por_shard.get(guild.shard_id, 0) + 1
+
+    shards = getattr(bot, 'shards', None)
+    if shards is None:
+        # commands.Bot sem sharding: um único "shard" 0
+        estados = {0: (bot.latency, not bot.is_closed() and bot.is_ready())}
+    else:
+        estados = {
+            shard_id: (info.latency, not info.is_closed())
+            for shard_id, info in shards.items()
+        }
+
+    for shard_id, (latencia, conectado) in estados.items():
+        rotulos = {'shard': str(shard_id)}
+        if latencia == latencia and latencia != float('inf'):  # ignora NaN/inf antes do 1º heartbeat
+            LATENCIA_SHARD.labels(rotulos).set(latencia)
+        GUILDS_SHARD.labels(rotulos).set(guilds_por_shard.get(shard_id, 0))
+        SHARD_CONECTADO.labels(rotulos).set(1 if conectado else 0)
+
+
+def registrar_metricas_shards(bot: commands.Bot):
+    """Publica as métricas por shard a cada scrape de /metrics."""
+    register_collector(functools.partial(coletar_metricas_shards, bot))
+
+
+class LinhaDoTempoInicializacao:
+    """Fases da inicialização: cada `marcar` fecha a fase iniciada na marca anterior."""
+
+    def __init__(self, inicio: float):
+        self.inicio = inicio
+        self._ultima = inicio
+        self.fases: list = []
+        self.concluida = False
+
+    def marcar(self, fase: str) -> float:
+        agora = time.perf_counter()
+        duracao = agora - self._ultima
+        self._ultima = agora
+        self.fases.append((fase, duracao))
+        FASES_INICIALIZACAO.labels(phase=fase).set(duracao)
+        return duracao
+
+    def tem_fase(self, fase: str) -> bool:
+        return any(nome == fase for nome, _ in self.fases)
+
+    def concluir(self):
+        """Publica o total e loga o relatório (só na primeira vez)."""
+        if self.concluida:
+            return
+        self.concluida = True
+        total = self._ultima - self.inicio
+        TEMPO_INICIALIZACAO.set(total)
+        detalhes = ' | '.join(f"{fase}={duracao * 1000:.0f}ms" for fase, duracao in self.fases)
+        logger.info(f"Inicialização concluída em {total:.2f}s: {detalhes}")
+
+
+def registrar_carga_cog(cog: str, duracao: float):
+    """Publica quanto tempo a extensão levou para carregar."""
+    CARGA_COG.labels(cog=cog).set(duracao)
+
+
+async def _handler_metricas(request: web.Request) -> web.Response:
+    return web.Response(text=render_metrics(), content_type='text/plain', charset='utf-8')
+
+
+async def iniciar_servidor_metricas(host: str = BOT_METRICS_HOST, port: int = BOT_METRICS_PORT):
+    """Sobe o endpoint /metrics do bot (não faz nada com porta 0)."""
+    global _runner
+    if _runner is not None or not port:
+        return
+    app = web.Application()
+    app.router.add_get('/metrics', _handler_metricas)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logger.error(f"Não foi possível abrir o endpoint de métricas em {host}:{port}: {e}")
+        await runner.cleanup()
+        return
+    _runner = runner
+    logger.info(f"  [OK] Métricas do bot em http://{host}:{port}/metrics")
+
+
+async def parar_servidor_metricas():
+    global _runner
+    if _runner is not None:
+        await _runner.cleanup()
+        _runner = None
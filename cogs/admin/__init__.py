@@ -5,7 +5,7 @@ Admin cog module - Administrative commands for company and user management.
 import asyncio
 import discord
 from discord.ext import commands
-from config import supabase, empresas_cache, servidores_cache
+from config import supabase
 from database import (
     get_or_create_servidor,
     get_servidor_by_guild,
@@ -13,7 +13,9 @@ from database import (
     get_empresas_by_guild,
     get_tipos_empresa,
     criar_usuario_frontend,
-    get_bases_redm
+    get_bases_redm,
+    limpar_cache_empresa,
+    limpar_cache_servidor
 )
 from utils import empresa_configurada, selecionar_empresa
 from ui_utils import create_success_embed, create_error_embed, create_info_embed
@@ -39,8 +41,8 @@ class AdminCog(commands.Cog, name="Administração"):
         """Limpa o cache local do servidor forçando recarregamento do banco."""
         guild_id = str(ctx.guild.id)
 
-        servidores_cache.pop(guild_id, None)
-        empresas_cache.pop(guild_id, None)
+        limpar_cache_servidor(guild_id)
+        limpar_cache_empresa(guild_id)
 
         servidor = await get_servidor_by_guild(guild_id)
         empresas = await get_empresas_by_guild(guild_id)
@@ -162,8 +164,7 @@ class AdminCog(commands.Cog, name="Administração"):
 
             if sucesso:
                 # Limpa cache para atualizar
-                if str(ctx.guild.id) in empresas_cache:
-                    del empresas_cache[str(ctx.guild.id)]
+                limpar_cache_empresa(str(ctx.guild.id))
 
                 await ctx.send(f"✅ Modo de pagamento alterado para **{novomodo.upper()}**!")
             else:
@@ -3,7 +3,6 @@ Bot Multi-Empresa Downtown - Cog de Assinatura
 Gerencia verificaÃ§Ã£o de assinatura e pagamentos.
 """
 
-import aiohttp
 import discord
 import os
 from discord.ext import commands
@@ -22,6 +21,7 @@ from database import (
     ativar_assinatura_servidor
 )
 from config import FRONTEND_URL, CHECKOUT_URL, SUPERADMIN_IDS, ASAAS_API_KEY, ASAAS_API_URL, supabase
+from http_client import get_http_session
 
 
 def criar_embed_assinatura_expirada():
@@ -79,7 +79,8 @@ class Assinatura(commands.Cog):
     async def ver_assinatura(self, ctx):
         """Mostra o status da assinatura do servidor."""
         guild_id = str(ctx.guild.id)
-        assinatura = await verificar_assinatura_servidor(guild_id)
+        # Consulta sem cache para refletir pagamentos recentes (e renovar o cache)
+        assinatura = await verificar_assinatura_servidor(guild_id, usar_cache=False)
 
         if assinatura.get('ativa'):
             # Check if tester
@@ -312,14 +313,14 @@ class Assinatura(commands.Cog):
                 return
             else:
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(f"{ASAAS_API_URL}/payments/{pix_id}", headers=headers) as resp:
-                            if resp.status == 200:
-                                data = await resp.json()
-                                status_real = data.get('status')
-                            else:
-                                await ctx.send(f"âŒ Erro de comunicaÃ§Ã£o com o gateway de pagamento (Status {resp.status}).")
-                                return
+                    session = get_http_session('asaas')
+                    async with session.get(f"{ASAAS_API_URL}/payments/{pix_id}", headers=headers) as resp:
+                        if resp.status == 200:
+                            data = await resp.json()
+                            status_real = data.get('status')
+                        else:
+                            await ctx.send(f"âŒ Erro de comunicaÃ§Ã£o com o gateway de pagamento (Status {resp.status}).")
+                            return
                 except Exception as e:
                     await ctx.send(f"âŒ Erro de conexÃ£o: {e}")
                     return
@@ -4,16 +4,22 @@ Comandos para pagamentos e relatórios financeiros.
 """
 
 import asyncio
+from datetime import datetime
 from decimal import Decimal
+from typing import Optional
 import discord
 from discord.ext import commands
 from config import supabase
 from database import (
     get_funcionario_by_discord_id,
-    get_estoque_funcionario
+    get_estoque_funcionario,
+    get_resumo_financeiro_funcionarios,
+    pagar_estoque_funcionario,
+    creditar_saldo_funcionario,
+    listar_transacoes_empresa
 )
 from utils import empresa_configurada, selecionar_empresa
-from ui_utils import create_success_embed, create_error_embed, create_warning_embed, handle_interaction_error
+from ui_utils import create_success_embed, create_error_embed, create_warning_embed, handle_interaction_error, CursorPaginatorView
 
 class PagamentoConfirmView(discord.ui.View):
     def __init__(self, ctx, func_db: dict, membro: discord.Member, valor: float, descricao: str):
@@ -33,25 +39,23 @@ class PagamentoConfirmView(discord.ui.View):
 
     @discord.ui.button(label="Confirmar Pagamento", style=discord.ButtonStyle.green, emoji="✅")
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        from database import registrar_transacao # Import locally to avoid circle or ensure availability
-        
         try:
-            # 1. Update Balance (Manual calculation for now, but atomic RPC would be better)
-            novo_saldo = float(Decimal(str(self.func_db['saldo'])) + Decimal(str(self.valor)))
-            
-            await supabase.table('funcionarios').update({
-                'saldo': novo_saldo
-            }).eq('id', self.func_db['id']).execute()
-            
-            # 2. Register Transaction (Using central function)
-            await registrar_transacao(
+            # Incremento relativo ao saldo atual + transação, numa única transação no banco
+            resultado = await creditar_saldo_funcionario(
+                funcionario_id=self.func_db['id'],
                 empresa_id=self.func_db['empresa_id'],
-                tipo='saida', # Payment to employee is specific, usually 'saida' or 'pagamento'
                 valor=self.valor,
-                descricao=f"Pagamento para {self.membro.display_name}: {self.descricao}",
-                funcionario_id=self.func_db['id']
+                descricao=f"Pagamento para {self.membro.display_name}: {self.descricao}"
             )
-            
+            if not resultado or resultado.get('resultado') != 'pago':
+                await interaction.response.edit_message(
+                    embed=create_error_embed("Erro", "Não foi possível registrar o pagamento."), view=None
+                )
+                self.stop()
+                return
+
+            novo_saldo = Decimal(str(resultado['saldo_final']))
+
             embed = create_success_embed(
                 f"Pagamento de R$ {self.valor:.2f} Realizado!", 
                 f"Funcionário: {self.membro.mention}\nNovo Saldo: R$ {novo_saldo:.2f}"
@@ -193,14 +197,13 @@ class FinanceiroCog(commands.Cog, name="Financeiro"):
     # ============================================
 
     class PayStockView(discord.ui.View):
-        def __init__(self, ctx, func_id, empresa_id, total_pagar, valor_estoque, valor_pendente, pendentes_ids):
+        def __init__(self, ctx, func_id, empresa_id, total_pagar, estoque_previsto, pendentes_ids):
             super().__init__(timeout=60)
             self.ctx = ctx
             self.func_id = func_id
             self.empresa_id = empresa_id
             self.total_pagar = total_pagar
-            self.valor_estoque = valor_estoque
-            self.valor_pendente = valor_pendente
+            self.estoque_previsto = estoque_previsto
             self.pendentes_ids = pendentes_ids
 
         async def interaction_check(self, interaction: discord.Interaction):
@@ -208,36 +211,41 @@ class FinanceiroCog(commands.Cog, name="Financeiro"):
 
         @discord.ui.button(label="Confirmar Pagamento", style=discord.ButtonStyle.green, emoji="✅")
         async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-            # Processa Pagamento
+            # Processa Pagamento (uma transação: só o que foi mostrado na prévia é pago)
             try:
-                # 1. Registra Histórico
-                await supabase.table('historico_pagamentos').insert({
-                    'funcionario_id': self.func_id,
-                    'tipo': 'estoque_acumulado',
-                    'valor': float(self.total_pagar),
-                    'descricao': f'Pagamento Acumulado (Estoque: R${self.valor_estoque:.2f} + Vendas: R${self.valor_pendente:.2f})'
-                }).execute()
-                
-                # 2. Atualiza Saldo
-                # Get current balance fresh
-                f_data = await supabase.table('funcionarios').select('saldo').eq('id', self.func_id).single().execute()
-                current_balance = float(f_data.data['saldo'])
-                
-                await supabase.table('funcionarios').update({
-                    'saldo': current_balance + float(self.total_pagar)
-                }).eq('id', self.func_id).execute()
-                
-                # 3. Limpa Estoque
-                await supabase.table('estoque_produtos').delete().eq('funcionario_id', self.func_id).eq('empresa_id', self.empresa_id).execute()
-                
-                # 4. Atualiza Comissões
-                if self.pendentes_ids:
-                    await supabase.table('transacoes').update({'tipo': 'comissao_paga'}).in_('id', self.pendentes_ids).execute()
-
-                embed = create_success_embed("Pagamento Realizado!", f"Total Pago: **R$ {self.total_pagar:.2f}**")
+                resultado = await pagar_estoque_funcionario(
+                    self.func_id, self.empresa_id, self.estoque_previsto, self.pendentes_ids
+                )
+                if not resultado:
+                    await interaction.response.edit_message(
+                        embed=create_error_embed("Erro", "Não foi possível processar o pagamento."), view=None
+                    )
+                    self.stop()
+                    return
+
+                if resultado.get('resultado') != 'pago':
+                    await interaction.response.edit_message(
+                        embed=create_warning_embed("Nada a Pagar", "Os valores da prévia já foram pagos."), view=None
+                    )
+                    self.stop()
+                    return
+
+                total_pago = Decimal(str(resultado['total_pago']))
+                embed = create_success_embed("Pagamento Realizado!", f"Total Pago: **R$ {total_pago:.2f}**")
+                if total_pago != self.total_pagar:
+                    embed.add_field(
+                        name="ℹ️ Valor atualizado",
+                        value=f"Prévia: R$ {self.total_pagar:.2f} (preços ou comissões mudaram desde a prévia)",
+                        inline=False
+                    )
+                embed.add_field(
+                    name="💰 Novo Saldo",
+                    value=f"R$ {Decimal(str(resultado['saldo_final'])):.2f}",
+                    inline=False
+                )
                 await interaction.response.edit_message(embed=embed, view=None)
                 self.stop()
-                
+
             except Exception as e:
                 await handle_interaction_error(interaction, e)
 
@@ -291,7 +299,8 @@ class FinanceiroCog(commands.Cog, name="Financeiro"):
         embed.add_field(name="📄 Comissões", value=f"R$ {valor_pendente:.2f}", inline=True)
         embed.add_field(name="💵 TOTAL", value=f"**R$ {total_pagar:.2f}**", inline=False)
         
-        view = self.PayStockView(ctx, func['id'], empresa['id'], total_pagar, valor_estoque, valor_pendente, pendentes_ids)
+        estoque_previsto = [{'id': item['id'], 'quantidade': item['quantidade']} for item in estoque or []]
+        view = self.PayStockView(ctx, func['id'], empresa['id'], total_pagar, estoque_previsto, pendentes_ids)
         await ctx.send(embed=embed, view=view)
 
     # ============================================
@@ -301,43 +310,93 @@ class FinanceiroCog(commands.Cog, name="Financeiro"):
     @commands.command(name='caixa', aliases=['financeiro'])
     @commands.has_permissions(manage_messages=True)
     @empresa_configurada()
-    async def verificar_caixa(self, ctx):
-        """Relatório financeiro."""
+    async def verificar_caixa(self, ctx, top: int = 10):
+        """Relatório financeiro. Uso: !caixa [top] (padrão 10, máximo 20)."""
         empresa = await selecionar_empresa(ctx)
         if not empresa:
             return
-        
-        funcionarios = await supabase.table('funcionarios').select('*').eq('empresa_id', empresa['id']).eq('ativo', True).execute()
-        
-        total_saldos = Decimal('0')
-        total_estoque = Decimal('0')
-        detalhes = []
-        
-        if funcionarios.data:
-            for func in funcionarios.data:
-                saldo = Decimal(str(func['saldo']))
-                total_saldos += saldo
-                
-                estoque = await get_estoque_funcionario(func['id'], empresa['id'])
-                valor_estoque = Decimal('0')
-                if estoque:
-                    valor_estoque = sum(Decimal(str(i['preco_funcionario'])) * i['quantidade'] for i in estoque)
-                total_estoque += valor_estoque
-                
-                if saldo > 0 or valor_estoque > 0:
-                    detalhes.append({'nome': func['nome'], 'saldo': saldo, 'estoque': valor_estoque})
-        
+
+        top = max(1, min(top, 20))
+        resumo = await get_resumo_financeiro_funcionarios(empresa['id'], top)
+        if resumo is None:
+            await ctx.send(embed=create_error_embed("Erro", "Não foi possível gerar o relatório financeiro."))
+            return
+
+        total_saldos = Decimal(str(resumo.get('total_saldos', 0)))
+        total_estoque = Decimal(str(resumo.get('total_estoque', 0)))
+
         embed = discord.Embed(title=f"📊 Financeiro - {empresa['nome']}", color=discord.Color.gold())
-        
-        for d in sorted(detalhes, key=lambda x: x['saldo'] + x['estoque'], reverse=True)[:10]:
-            embed.add_field(name=d['nome'], value=f"Saldo: R$ {d['saldo']:.2f}\nEstoque: R$ {d['estoque']:.2f}", inline=True)
-        
+
+        for d in resumo.get('top', []):
+            saldo = Decimal(str(d['saldo']))
+            estoque = Decimal(str(d['estoque']))
+            embed.add_field(name=d['nome'], value=f"Saldo: R$ {saldo:.2f}\nEstoque: R$ {estoque:.2f}", inline=True)
+
         embed.add_field(name="💰 Total Saldos", value=f"**R$ {total_saldos:.2f}**", inline=False)
         embed.add_field(name="📦 Total Estoque", value=f"**R$ {total_estoque:.2f}**", inline=False)
         embed.add_field(name="📈 TOTAL", value=f"**R$ {total_saldos + total_estoque:.2f}**", inline=False)
-        
+
+        com_valor = resumo.get('funcionarios_com_valor', 0)
+        if com_valor > len(resumo.get('top', [])):
+            embed.set_footer(text=f"Mostrando top {len(resumo['top'])} de {com_valor} funcionários. Use !caixa 20 para ver mais.")
+
         await ctx.send(embed=embed)
 
+    # ============================================
+    # EXTRATO (PAGINADO)
+    # ============================================
+
+    EXTRATO_POR_PAGINA = 10
+
+    @staticmethod
+    def _linha_extrato(t: dict) -> str:
+        try:
+            quando = datetime.fromisoformat(str(t['data_criacao']).replace('Z', '+00:00')).strftime('%d/%m %H:%M')
+        except ValueError:
+            quando = str(t['data_criacao'])[:16]
+        sinal = '+' if t['tipo'] == 'entrada' else '-'
+        quem = f" · {t['funcionario_nome']}" if t.get('funcionario_nome') else ""
+        descricao = (t.get('descricao') or '')[:60]
+        return f"`{quando}` **{sinal}R$ {Decimal(str(t['valor'])):.2f}** ({t['tipo']}){quem}\n{descricao}"
+
+    @commands.command(name='extrato', aliases=['historico'])
+    @commands.has_permissions(manage_messages=True)
+    @empresa_configurada()
+    async def extrato(self, ctx, membro: Optional[discord.Member] = None, tipo: Optional[str] = None):
+        """Extrato de transações paginado. Uso: !extrato [@membro] [tipo]"""
+        empresa = await selecionar_empresa(ctx)
+        if not empresa:
+            return
+
+        funcionario_id = None
+        if membro:
+            func = await get_funcionario_by_discord_id(str(membro.id))
+            if not func:
+                await ctx.send(embed=create_error_embed("Erro", f"{membro.display_name} não cadastrado."))
+                return
+            funcionario_id = func['id']
+        tipo = tipo.lower() if tipo else None
+
+        filtros = [f for f in (membro.display_name if membro else None, tipo) if f]
+        titulo = f"📜 Extrato - {empresa['nome']}" + (f" ({', '.join(filtros)})" if filtros else "")
+
+        async def buscar_pagina(cursor, pagina):
+            resultado = await listar_transacoes_empresa(
+                empresa['id'], self.EXTRATO_POR_PAGINA, cursor, tipo, funcionario_id
+            )
+            if resultado is None:
+                return create_error_embed("Erro", "Não foi possível carregar o extrato."), None
+
+            embed = discord.Embed(title=titulo, color=discord.Color.blue())
+            itens = resultado['itens']
+            embed.description = "\n".join(self._linha_extrato(t) for t in itens) if itens else "Nenhuma transação encontrada."
+            embed.set_footer(text=f"Página {pagina}")
+            return embed, resultado['proximo_cursor']
+
+        view = CursorPaginatorView(ctx.author.id, buscar_pagina)
+        embed = await view.render()
+        view.message = await ctx.send(embed=embed, view=view)
+
 
 async def setup(bot):
     await bot.add_cog(FinanceiroCog(bot))
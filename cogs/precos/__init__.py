@@ -4,11 +4,11 @@ Precos cog module - Commands for price and commission configuration.
 
 import discord
 from discord.ext import commands
-from config import supabase
 from database import (
     get_produtos_referencia,
     get_produtos_empresa,
-    configurar_produto_empresa
+    configurar_produto_empresa,
+    aplicar_comissao_produtos
 )
 from utils import empresa_configurada, selecionar_empresa
 
@@ -212,11 +212,11 @@ class PrecosCog(commands.Cog, name="Precos"):
         if porcentagem:
             # Modo direto: aplica comissao imediatamente
             msg = await ctx.send("Aplicando...")
-            for codigo, p in produtos.items():
-                pv = float(p['preco_venda'])
-                nf = round(pv * (porcentagem / 100), 2)
-                await supabase.table('produtos_empresa').update({'preco_pagamento_funcionario': nf}).eq('id', p['id']).execute()
-            await msg.edit(content=f"OK Comissao de {porcentagem}% aplicada!")
+            atualizados = await aplicar_comissao_produtos(empresa['id'], porcentagem)
+            if atualizados is None:
+                await msg.edit(content="Erro ao aplicar comissao.")
+                return
+            await msg.edit(content=f"OK Comissao de {porcentagem}% aplicada em {atualizados} produtos!")
             return
 
         # UI Mode
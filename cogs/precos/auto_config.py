@@ -5,7 +5,7 @@ Auto-configuration functions for prices (min/medio/max).
 import discord
 from database import (
     get_produtos_referencia,
-    configurar_produto_empresa
+    configurar_produtos_empresa_lote
 )
 from utils import selecionar_empresa
 
@@ -27,8 +27,8 @@ async def configurar_precos_com_feedback(ctx, empresa, modo: str):
 
     progress_msg = await ctx.send(f"{cfg['emoji']} Configurando {len(produtos_ref)} produtos com preco **{cfg['nome']}**...")
 
-    configurados = 0
     produtos_config = []
+    precos_lote = []
 
     for p in produtos_ref:
         # Parse min/max handling None
@@ -68,25 +68,37 @@ async def configurar_precos_com_feedback(ctx, empresa, modo: str):
 
         preco_func = round(preco_venda * 0.25, 2)
 
-        if await configurar_produto_empresa(empresa['id'], p['id'], preco_venda, preco_func):
-            configurados += 1
-            produtos_config.append({
-                'codigo': p['codigo'],
-                'nome': p['nome'],
-                'categoria': p.get('categoria', 'Outros'),
-                'preco_venda': preco_venda,
-                'preco_func': preco_func
-            })
+        precos_lote.append({
+            'produto_referencia_id': p['id'],
+            'preco_venda': preco_venda,
+            'preco_pagamento_funcionario': preco_func
+        })
+        produtos_config.append({
+            'codigo': p['codigo'],
+            'nome': p['nome'],
+            'categoria': p.get('categoria', 'Outros'),
+            'preco_venda': preco_venda,
+            'preco_func': preco_func
+        })
+
+    # Um único upsert apenas com as linhas que mudaram
+    alterados = await configurar_produtos_empresa_lote(empresa['id'], precos_lote)
 
     try:
         await progress_msg.delete()
     except:
         pass
 
+    if alterados is None:
+        await ctx.send("Erro ao configurar precos. Tente novamente.")
+        return
+
+    configurados = len(produtos_config)
+
     # Embed principal
     embed_sucesso = discord.Embed(
         title=f"OK Precos Configurados no {cfg['nome']}!",
-        description=f"{cfg['emoji']} **{configurados}/{len(produtos_ref)}** produtos de **{empresa['nome']}** atualizados.",
+        description=f"{cfg['emoji']} **{configurados}/{len(produtos_ref)}** produtos de **{empresa['nome']}** configurados ({alterados} alterados).",
         color=cfg['cor']
     )
 
@@ -3,8 +3,7 @@ UI components for commission configuration.
 """
 
 import discord
-from config import supabase
-from logging_config import logger
+from database import aplicar_comissao_produtos
 
 
 class ComissaoCustomModal(discord.ui.Modal, title="Comissao Personalizada"):
@@ -66,18 +65,10 @@ async def aplicar_comissao(interaction: discord.Interaction, empresa_id, produto
     """Helper to apply commission logic to database."""
     await interaction.response.defer()
 
-    atualizados = 0
-    for codigo, p in produtos.items():
-        preco_venda = float(p['preco_venda'])
-        novo_preco_func = round(preco_venda * (porcentagem / 100), 2)
-
-        try:
-            await supabase.table('produtos_empresa').update({
-                'preco_pagamento_funcionario': novo_preco_func
-            }).eq('id', p['id']).execute()
-            atualizados += 1
-        except Exception as e:
-            logger.error(f"Erro update comissao: {e}")
+    atualizados = await aplicar_comissao_produtos(empresa_id, porcentagem)
+    if atualizados is None:
+        await interaction.followup.send("Erro ao aplicar comissao.")
+        return
 
     embed = discord.Embed(
         title=f"OK Comissao Ajustada: {porcentagem:.0f}%",
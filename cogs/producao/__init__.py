@@ -6,7 +6,6 @@ from datetime import datetime
 from decimal import Decimal
 import discord
 from discord.ext import commands
-from config import supabase
 from database import (
     get_or_create_funcionario,
     get_funcionario_by_discord_id,
@@ -17,9 +16,10 @@ from database import (
     adicionar_ao_estoque,
     remover_do_estoque,
     remover_do_estoque_global,
+    listar_encomendas_abertas,
 )
 from utils import empresa_configurada, selecionar_empresa
-from ui_utils import create_success_embed, create_error_embed, create_info_embed
+from ui_utils import create_success_embed, create_error_embed, create_info_embed, CursorPaginatorView
 from logging_config import logger
 
 from .ui_producao import ProducaoView
@@ -202,23 +202,41 @@ class ProducaoCog(commands.Cog, name="Produção"):
             view.add_item(btn)
             await ctx.send("Clique abaixo para preencher os dados da encomenda:", view=view)
 
+    ENCOMENDAS_POR_PAGINA = 5
+
+    @staticmethod
+    def _campo_encomenda(enc: dict) -> tuple:
+        itens_str = " · ".join([f"{i['quantidade']}x `{i['codigo']}`" for i in enc['itens_json']])
+        responsavel = enc.get('responsavel') or 'N/A'
+
+        status_info = {
+            'pendente': ('🟡', 'Pendente'),
+            'em_andamento': ('🔵', 'Em andamento')
+        }
+        emoji, status_text = status_info.get(enc['status'], ('⚪', enc['status']))
+
+        return (
+            f"{emoji} #{enc['id']} | {enc['comprador']}",
+            f"**Itens:** {itens_str}\n"
+            f"**Valor:** R$ {Decimal(str(enc['valor_total'])):.2f}\n"
+            f"**Resp:** {responsavel}\n"
+            f"*Para entregar: `!entregar {enc['id']}`*"
+        )
+
     @commands.command(name='encomendas', aliases=['5', 'pendentes'])
     @empresa_configurada()
     async def ver_encomendas(self, ctx):
-        """Lista encomendas pendentes com visual melhorado."""
+        """Lista encomendas pendentes, paginadas (busca só a página exibida)."""
         empresa = await selecionar_empresa(ctx)
         if not empresa:
             return
 
-        response = await supabase.table('encomendas').select(
-            '*, funcionarios(nome)'
-        ).eq('empresa_id', empresa['id']).in_(
-            'status', ['pendente', 'em_andamento']
-        ).order('data_criacao').execute()
-
-        encomendas = response.data
+        primeira = await listar_encomendas_abertas(empresa['id'], self.ENCOMENDAS_POR_PAGINA)
+        if primeira is None:
+            await ctx.send(embed=create_error_embed("Erro", "Não foi possível carregar as encomendas."))
+            return
 
-        if not encomendas:
+        if not primeira['itens']:
             embed = discord.Embed(
                 title="📋 Encomendas",
                 description="✅ Nenhuma encomenda pendente!\n\n"
@@ -229,38 +247,30 @@ class ProducaoCog(commands.Cog, name="Produção"):
             await ctx.send(embed=embed)
             return
 
-        embed = discord.Embed(
-            title=f"📋 Encomendas Pendentes - {empresa['nome']}",
-            description=f"Total: **{len(encomendas)}** encomenda(s)",
-            color=discord.Color.blue()
-        )
-
-        for enc in encomendas[:10]:
-            itens_str = " · ".join([f"{i['quantidade']}x `{i['codigo']}`" for i in enc['itens_json']])
-            resp = enc.get('funcionarios', {})
-            responsavel = resp.get('nome', 'N/A') if resp else 'N/A'
+        # A primeira página já foi buscada para decidir o estado vazio: reaproveita uma vez
+        ja_buscada = {None: primeira}
 
-            status_info = {
-                'pendente': ('🟡', 'Pendente'),
-                'em_andamento': ('🔵', 'Em andamento')
-            }
-            emoji, status_text = status_info.get(enc['status'], ('⚪', enc['status']))
+        async def buscar_pagina(cursor, pagina):
+            resultado = ja_buscada.pop(cursor, None)
+            if resultado is None:
+                resultado = await listar_encomendas_abertas(empresa['id'], self.ENCOMENDAS_POR_PAGINA, cursor)
+            if resultado is None:
+                return create_error_embed("Erro", "Não foi possível carregar as encomendas."), None
 
-            embed.add_field(
-                name=f"{emoji} #{enc['id']} | {enc['comprador']}",
-                value=f"**Itens:** {itens_str}\n"
-                      f"**Valor:** R$ {enc['valor_total']:.2f}\n"
-                      f"**Resp:** {responsavel}\n"
-                      f"*Para entregar: `!entregar {enc['id']}`*",
-                inline=False
+            embed = discord.Embed(
+                title=f"📋 Encomendas Pendentes - {empresa['nome']}",
+                description=f"Total: **{resultado['total']}** encomenda(s)",
+                color=discord.Color.blue()
             )
+            for enc in resultado['itens']:
+                nome, valor = self._campo_encomenda(enc)
+                embed.add_field(name=nome, value=valor, inline=False)
+            embed.set_footer(text=f"Página {pagina} · 💡 Use !entregar [ID] (Ex: !entregar 9) para finalizar!")
+            return embed, resultado['proximo_cursor']
 
-        if len(encomendas) > 10:
-            embed.set_footer(text=f"Mostrando 10 de {len(encomendas)} encomendas")
-        else:
-            embed.set_footer(text="💡 Use !entregar [ID] (Ex: !entregar 9) para finalizar!")
-
-        await ctx.send(embed=embed)
+        view = CursorPaginatorView(ctx.author.id, buscar_pagina)
+        embed = await view.render()
+        view.message = await ctx.send(embed=embed, view=view)
 
     @commands.command(name='entregar', aliases=['entregarencomenda'])
     @empresa_configurada()
@@ -304,24 +314,13 @@ class ProducaoCog(commands.Cog, name="Produção"):
             await ctx.send(embed=embed)
             return
 
-        response = await supabase.table('encomendas').select('*').eq('id', encomenda_id).eq('empresa_id', empresa['id']).execute()
-
-        if not response.data:
-            await ctx.send(f"❌ Encomenda #{encomenda_id} não encontrada.\n💡 Use `!encomendas` para ver as pendentes.")
-            return
-
-        encomenda = response.data[0]
-
-        if encomenda['status'] == 'entregue':
-            await ctx.send("❌ Esta encomenda já foi entregue.")
-            return
-
+        # Validação, baixa de estoque e comissão acontecem numa única transação (RPC)
         modo_pagamento = empresa.get('modo_pagamento', 'producao')
 
         if modo_pagamento == 'entrega':
-            await entregar_modo_entrega(ctx, empresa, encomenda, func, encomenda_id, self.bot)
+            await entregar_modo_entrega(ctx, empresa, func, encomenda_id, self.bot)
         else:
-            await entregar_modo_producao(ctx, empresa, encomenda, func, encomenda_id, self.bot)
+            await entregar_modo_producao(ctx, empresa, func, encomenda_id, self.bot)
 
 
 async def setup(bot):
@@ -5,10 +5,12 @@ Carrega variáveis de ambiente e inicializa conexões.
 
 import os
 import re
-from cachetools import TTLCache
+from cachetools import LRUCache, TLRUCache, TTLCache
 from dotenv import load_dotenv
 from supabase import create_async_client, AsyncClient
 
+from db_metrics import ConsultaInstrumentada
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -29,6 +31,13 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 # Usa Service Role Key se disponível (ignora RLS), senão usa Key normal
 KEY_TO_USE = SUPABASE_SERVICE_ROLE_KEY if SUPABASE_SERVICE_ROLE_KEY else SUPABASE_KEY
 
+# Validação de tokens da API: 'auto' valida o JWT localmente (segredo HS256 ou JWKS)
+# e só consulta /auth/v1/user se não houver chave ou faltar o Discord id; 'remote' sempre consulta.
+AUTH_TOKEN_VERIFICATION = os.getenv('AUTH_TOKEN_VERIFICATION', 'auto').lower()
+SUPABASE_JWT_SECRET = os.getenv('SUPABASE_JWT_SECRET')
+SUPABASE_JWT_AUDIENCE = os.getenv('SUPABASE_JWT_AUDIENCE', 'authenticated')
+SUPABASE_JWKS_CACHE_TTL = int(os.getenv('SUPABASE_JWKS_CACHE_TTL', '600'))
+
 # Validação
 if not all([DISCORD_TOKEN, SUPABASE_URL, KEY_TO_USE]):
     raise ValueError("Variáveis de ambiente faltando (DISCORD_TOKEN, SUPABASE_URL, SUPABASE_KEY).")
@@ -51,6 +60,13 @@ class _SupabaseProxy:
             )
         return getattr(self._client, name)
 
+    # table/rpc passam pela instrumentação (métricas, slow log, resumo por comando)
+    def table(self, table_name: str):
+        return ConsultaInstrumentada(self.__getattr__('table')(table_name), table_name, 'table', 'select')
+
+    def rpc(self, fn: str, params: dict | None = None, **kwargs):
+        return ConsultaInstrumentada(self.__getattr__('rpc')(fn, params, **kwargs), fn, 'rpc', 'call')
+
 
 supabase = _SupabaseProxy()
 
@@ -63,6 +79,9 @@ async def init_supabase():
 # Configurações do Asaas
 ASAAS_API_URL = os.getenv('ASAAS_API_URL', "https://www.asaas.com/api/v3")
 ASAAS_WEBHOOK_TOKEN = os.getenv('ASAAS_WEBHOOK_TOKEN')
+# Chave do HMAC que protege o CPF/CNPJ em asaas_clientes (padrão: a chave da API do Asaas).
+# Trocar a chave só faz os clientes serem resolvidos de novo no Asaas.
+ASAAS_CUSTOMER_HASH_KEY = os.getenv('ASAAS_CUSTOMER_HASH_KEY') or ASAAS_API_KEY
 
 # Configurações do Frontend
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
@@ -74,3 +93,37 @@ SUPERADMIN_IDS = [id.strip() for id in os.getenv('SUPERADMIN_IDS', '').split(','
 # Caches globais com TTL (5 minutos)
 empresas_cache = TTLCache(maxsize=1000, ttl=300)
 servidores_cache = TTLCache(maxsize=1000, ttl=300)
+
+# Índice de roteamento por guild_id: lista de empresas + canal/categoria -> empresa
+empresas_guild_cache = TTLCache(maxsize=1000, ttl=300)
+
+# Cache de assinatura (entitlement) por guild_id.
+# Positivos valem até a expiração da assinatura (limitado pelo TTL máximo);
+# negativos valem pouco para que um pagamento recém-confirmado libere rápido.
+ASSINATURA_CACHE_TTL = int(os.getenv('ASSINATURA_CACHE_TTL', '1800'))
+ASSINATURA_NEGATIVE_CACHE_TTL = int(os.getenv('ASSINATURA_NEGATIVE_CACHE_TTL', '60'))
+
+
+def _ttu_por_entrada(_key, value, now):
+    """Cada entrada informa seu próprio TTL (segundos) em `cache_ttl`."""
+    return now + value['cache_ttl']
+
+
+assinaturas_cache = TLRUCache(maxsize=5000, ttu=_ttu_por_entrada)
+
+# Catálogo de produtos por empresa_id (produtos_empresa + produtos_referencia).
+# A versão é incrementada a cada invalidação; uma leitura só é gravada no cache
+# se a versão não mudou durante a consulta (evita gravar catálogo antigo).
+PRODUTOS_CACHE_TTL = int(os.getenv('PRODUTOS_CACHE_TTL', '600'))
+produtos_cache = TTLCache(maxsize=2000, ttl=PRODUTOS_CACHE_TTL)
+produtos_cache_versoes: dict = {}
+
+# Acessos do painel (usuarios_frontend) por discord_id: superadmin + role por guild.
+# TTL curto: a API e o bot podem rodar em processos distintos, e a invalidação
+# feita pelo bot só alcança o próprio processo.
+ACESSOS_FRONTEND_CACHE_TTL = int(os.getenv('ACESSOS_FRONTEND_CACHE_TTL', '60'))
+acessos_frontend_cache = TTLCache(maxsize=5000, ttl=ACESSOS_FRONTEND_CACHE_TTL)
+
+# Cliente Asaas por (discord_id, hash do CPF/CNPJ): frente em memória da tabela asaas_clientes
+ASAAS_CLIENTES_CACHE_SIZE = int(os.getenv('ASAAS_CLIENTES_CACHE_SIZE', '10000'))
+asaas_clientes_cache = LRUCache(maxsize=ASAAS_CLIENTES_CACHE_SIZE)
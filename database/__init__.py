@@ -9,6 +9,7 @@ from config import supabase
 from database.servidor import (
     get_or_create_servidor,
     get_servidor_by_guild,
+    reivindicar_entrada_guild,
 )
 
 from database.usuario_frontend import (
@@ -23,8 +24,11 @@ from database.empresa import (
     get_tipos_empresa,
     get_bases_redm,
     atualizar_base_servidor,
+    listar_ids_empresas,
     get_empresa_by_guild,
     get_empresas_by_guild,
+    get_roteamento_empresas,
+    resolver_empresa_por_canal,
     criar_empresa,
     atualizar_modo_pagamento,
     get_produtos_referencia,
@@ -34,6 +38,8 @@ from database.produto import (
     get_produtos_empresa,
     criar_produto_referencia_custom,
     configurar_produto_empresa,
+    configurar_produtos_empresa_lote,
+    aplicar_comissao_produtos,
 )
 
 from database.funcionario import (
@@ -42,6 +48,9 @@ from database.funcionario import (
     get_funcionario_by_discord_id,
     get_funcionarios_empresa,
     atualizar_canal_funcionario,
+    get_resumo_financeiro_funcionarios,
+    pagar_estoque_funcionario,
+    creditar_saldo_funcionario,
 )
 
 from database.estoque import (
@@ -58,13 +67,18 @@ from database.transacao import (
     registrar_transacao,
     get_transacoes_empresa,
     get_saldo_empresa,
+    listar_transacoes_empresa,
+    reconciliar_saldos_empresas,
 )
 
 from database.encomenda import (
     criar_encomenda,
     get_encomendas_pendentes,
+    listar_encomendas_abertas,
+    reconciliar_encomendas_abertas,
     get_encomenda,
     atualizar_status_encomenda,
+    entregar_encomenda_completa,
 )
 
 from database.assinatura import (
@@ -89,12 +103,16 @@ from database.cache import (
     limpar_cache_global,
     limpar_cache_empresa,
     limpar_cache_servidor,
+    limpar_cache_assinatura,
+    limpar_cache_produtos,
+    limpar_cache_acessos_frontend,
 )
 
 __all__ = [
     # Servidor
     'get_or_create_servidor',
     'get_servidor_by_guild',
+    'reivindicar_entrada_guild',
     # Usuario Frontend
     'criar_usuario_frontend',
     'get_usuario_frontend',
@@ -105,8 +123,11 @@ __all__ = [
     'get_tipos_empresa',
     'get_bases_redm',
     'atualizar_base_servidor',
+    'listar_ids_empresas',
     'get_empresa_by_guild',
     'get_empresas_by_guild',
+    'get_roteamento_empresas',
+    'resolver_empresa_por_canal',
     'criar_empresa',
     'atualizar_modo_pagamento',
     'get_produtos_referencia',
@@ -114,12 +135,17 @@ __all__ = [
     'get_produtos_empresa',
     'criar_produto_referencia_custom',
     'configurar_produto_empresa',
+    'configurar_produtos_empresa_lote',
+    'aplicar_comissao_produtos',
     # Funcionario
     'get_or_create_funcionario',
     'vincular_funcionario_empresa',
     'get_funcionario_by_discord_id',
     'get_funcionarios_empresa',
     'atualizar_canal_funcionario',
+    'get_resumo_financeiro_funcionarios',
+    'pagar_estoque_funcionario',
+    'creditar_saldo_funcionario',
     # Estoque
     'adicionar_ao_estoque',
     'remover_do_estoque',
@@ -132,11 +158,16 @@ __all__ = [
     'registrar_transacao',
     'get_transacoes_empresa',
     'get_saldo_empresa',
+    'listar_transacoes_empresa',
+    'reconciliar_saldos_empresas',
     # Encomenda
     'criar_encomenda',
     'get_encomendas_pendentes',
+    'listar_encomendas_abertas',
+    'reconciliar_encomendas_abertas',
     'get_encomenda',
     'atualizar_status_encomenda',
+    'entregar_encomenda_completa',
     # Assinatura
     'verificar_assinatura_servidor',
     'get_assinatura_servidor',
@@ -155,4 +186,7 @@ __all__ = [
     'limpar_cache_global',
     'limpar_cache_empresa',
     'limpar_cache_servidor',
+    'limpar_cache_assinatura',
+    'limpar_cache_produtos',
+    'limpar_cache_acessos_frontend',
 ]
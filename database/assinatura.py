@@ -2,28 +2,103 @@
 Database functions for assinatura (subscription) and payment management.
 """
 
+import math
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict
-from config import supabase
+from observability import inc_counter
+from config import supabase, assinaturas_cache, ASSINATURA_CACHE_TTL, ASSINATURA_NEGATIVE_CACHE_TTL
+from database.cache import limpar_cache_assinatura
 from logging_config import logger
 
 
-async def verificar_assinatura_servidor(guild_id: str) -> dict:
-    """Verifica se servidor tem assinatura ativa."""
+def _parse_data_expiracao(valor) -> Optional[datetime]:
+    """Converte `data_expiracao` (ISO 8601 vindo do PostgREST) em datetime UTC."""
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        data = valor
+    else:
+        try:
+            data = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return data
+
+
+def _avaliar_assinatura(dados: dict, expiracao: datetime) -> dict:
+    """Recalcula `ativa` e `dias_restantes` localmente a partir da expiração."""
+    restante = (expiracao - datetime.now(timezone.utc)).total_seconds()
+    return {
+        **dados,
+        'ativa': restante > 0,
+        'dias_restantes': max(0, math.ceil(restante / 86400)),
+    }
+
+
+def _armazenar_assinatura(guild_id: str, dados: dict) -> None:
+    """Guarda o resultado do RPC com TTL proporcional ao que ele garante."""
+    expiracao = _parse_data_expiracao(dados.get('data_expiracao'))
+
+    if not dados.get('ativa'):
+        ttl = ASSINATURA_NEGATIVE_CACHE_TTL
+    elif expiracao:
+        ttl = min(ASSINATURA_CACHE_TTL, (expiracao - datetime.now(timezone.utc)).total_seconds())
+    else:
+        ttl = ASSINATURA_CACHE_TTL
+
+    if ttl <= 0:
+        return
+
+    assinaturas_cache[guild_id] = {'dados': dados, 'expiracao': expiracao, 'cache_ttl': ttl}
+
+
+async def verificar_assinatura_servidor(guild_id: str, usar_cache: bool = True) -> dict:
+    """Verifica se servidor tem assinatura ativa.
+
+    O resultado fica em cache por guild: assinaturas ativas são avaliadas
+    localmente até a expiração, e respostas negativas valem por pouco tempo.
+    """
+    if usar_cache:
+        entrada = assinaturas_cache.get(guild_id)
+        if entrada is not None:
+            dados = entrada['dados']
+            if not dados.get('ativa'):
+                inc_counter("assinatura_cache_lookups_total", labels={"result": "negative_hit"})
+                return dict(dados)
+
+            if entrada['expiracao'] is None:
+                inc_counter("assinatura_cache_lookups_total", labels={"result": "hit"})
+                return dict(dados)
+
+            avaliada = _avaliar_assinatura(dados, entrada['expiracao'])
+            if avaliada['ativa']:
+                inc_counter("assinatura_cache_lookups_total", labels={"result": "hit"})
+                return avaliada
+
+            # Expirou desde que entrou no cache: revalida, pode ter sido renovada.
+            assinaturas_cache.pop(guild_id, None)
+
+        inc_counter("assinatura_cache_lookups_total", labels={"result": "miss"})
+
     try:
         response = await supabase.rpc('verificar_assinatura', {'p_guild_id': guild_id}).execute()
 
         if response.data and len(response.data) > 0:
-            return response.data[0]
-
-        return {
-            'ativa': False,
-            'status': None,
-            'dias_restantes': 0,
-            'data_expiracao': None,
-            'plano_nome': None,
-            'tipo': None
-        }
+            dados = response.data[0]
+        else:
+            dados = {
+                'ativa': False,
+                'status': None,
+                'dias_restantes': 0,
+                'data_expiracao': None,
+                'plano_nome': None,
+                'tipo': None
+            }
+
+        _armazenar_assinatura(guild_id, dados)
+        return dict(dados)
     except Exception as e:
         logger.error(f"Erro ao verificar assinatura: {e}")
         return {'ativa': False, 'status': 'erro', 'dias_restantes': 0, 'tipo': None}
@@ -107,6 +182,7 @@ async def ativar_assinatura_servidor(guild_id: str, plano_id: int, pagador_disco
             'p_pagador_discord_id': pagador_discord_id
         }).execute()
 
+        limpar_cache_assinatura(guild_id)
         return response.data == True
     except Exception as e:
         logger.error(f"Erro ao ativar assinatura: {e}")
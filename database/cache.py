@@ -2,22 +2,57 @@
 Database cache management functions.
 """
 
-from config import empresas_cache, servidores_cache
+from config import (
+    empresas_cache,
+    empresas_guild_cache,
+    servidores_cache,
+    assinaturas_cache,
+    produtos_cache,
+    produtos_cache_versoes,
+    acessos_frontend_cache,
+    asaas_clientes_cache,
+)
 
 
 def limpar_cache_global():
     """Limpa todos os caches."""
     empresas_cache.clear()
+    empresas_guild_cache.clear()
     servidores_cache.clear()
+    assinaturas_cache.clear()
+    produtos_cache.clear()
+    acessos_frontend_cache.clear()
+    asaas_clientes_cache.clear()
+    for empresa_id in list(produtos_cache_versoes):
+        produtos_cache_versoes[empresa_id] += 1
 
 
 def limpar_cache_empresa(guild_id: str):
-    """Limpa cache de uma empresa específica."""
-    if guild_id in empresas_cache:
-        del empresas_cache[guild_id]
+    """Limpa cache de uma empresa específica (e o roteamento do servidor)."""
+    empresas_cache.pop(guild_id, None)
+    empresas_guild_cache.pop(guild_id, None)
 
 
 def limpar_cache_servidor(guild_id: str):
     """Limpa cache de um servidor específico."""
     if guild_id in servidores_cache:
         del servidores_cache[guild_id]
+
+
+def limpar_cache_assinatura(guild_id: str):
+    """Limpa cache de assinatura de um servidor (após ativação, tester, etc)."""
+    assinaturas_cache.pop(guild_id, None)
+
+
+def limpar_cache_produtos(empresa_id: int):
+    """Invalida o catálogo de produtos de uma empresa (após alterar preços/produtos)."""
+    produtos_cache_versoes[empresa_id] = produtos_cache_versoes.get(empresa_id, 0) + 1
+    produtos_cache.pop(empresa_id, None)
+
+
+def limpar_cache_acessos_frontend(discord_id: str = None):
+    """Invalida os acessos ao painel de um usuário (ou de todos, se discord_id for None)."""
+    if discord_id is None:
+        acessos_frontend_cache.clear()
+    else:
+        acessos_frontend_cache.pop(str(discord_id), None)
@@ -3,8 +3,9 @@ Database functions for empresa (company) management.
 """
 
 from typing import Optional, List, Dict
-from config import supabase, empresas_cache, servidores_cache
+from config import supabase, empresas_cache, empresas_guild_cache, servidores_cache
 from logging_config import logger
+from database.cache import limpar_cache_empresa
 from database.servidor import get_servidor_by_guild, get_or_create_servidor
 
 
@@ -54,6 +55,19 @@ async def atualizar_base_servidor(guild_id: str, base_id: int) -> bool:
         return False
 
 
+async def listar_ids_empresas(lote: int = 500) -> List[int]:
+    """IDs de todas as empresas, em lotes por id (para rotinas de manutenção). Levanta em caso de erro."""
+    ids: List[int] = []
+    ultimo = 0
+    while True:
+        response = await supabase.table('empresas').select('id').gt('id', ultimo).order('id').limit(lote).execute()
+        pagina = [e['id'] for e in response.data or []]
+        ids.extend(pagina)
+        if len(pagina) < lote:
+            return ids
+        ultimo = pagina[-1]
+
+
 async def get_empresa_by_guild(guild_id: str) -> Optional[Dict]:
     """Obtém a empresa configurada para um servidor Discord."""
     if guild_id in empresas_cache:
@@ -73,17 +87,51 @@ async def get_empresa_by_guild(guild_id: str) -> Optional[Dict]:
         return None
 
 
-async def get_empresas_by_guild(guild_id: str) -> List[Dict]:
-    """Obtém todas as empresas configuradas para um servidor Discord."""
+def _montar_roteamento(empresas: List[Dict]) -> Dict:
+    """Indexa as empresas do servidor por canal principal e por categoria."""
+    canais = {}
+    categorias = {}
+    for emp in empresas:
+        if emp.get('canal_principal_id'):
+            canais.setdefault(str(emp['canal_principal_id']), emp)
+        if emp.get('categoria_id'):
+            categorias.setdefault(str(emp['categoria_id']), emp)
+    return {'empresas': empresas, 'canais': canais, 'categorias': categorias}
+
+
+async def get_roteamento_empresas(guild_id: str) -> Dict:
+    """
+    Obtém o índice de roteamento do servidor (cacheado):
+    {'empresas': [...], 'canais': {canal_id: empresa}, 'categorias': {categoria_id: empresa}}
+    """
+    if guild_id in empresas_guild_cache:
+        return empresas_guild_cache[guild_id]
+
     try:
         response = await supabase.table('empresas').select(
             '*, tipos_empresa(*)'
         ).eq('guild_id', guild_id).eq('ativo', True).order('id').execute()
 
-        return response.data or []
+        roteamento = _montar_roteamento(response.data or [])
+        empresas_guild_cache[guild_id] = roteamento
+        return roteamento
     except Exception as e:
         logger.error(f"Erro ao buscar empresas: {e}")
-        return []
+        return _montar_roteamento([])
+
+
+async def get_empresas_by_guild(guild_id: str) -> List[Dict]:
+    """Obtém todas as empresas configuradas para um servidor Discord."""
+    roteamento = await get_roteamento_empresas(guild_id)
+    return list(roteamento['empresas'])
+
+
+def resolver_empresa_por_canal(roteamento: Dict, channel_id: str, category_id: str = None) -> Optional[Dict]:
+    """Resolve a empresa do canal (prioridade) ou da categoria usando o índice em memória."""
+    empresa = roteamento['canais'].get(channel_id)
+    if empresa is None and category_id:
+        empresa = roteamento['categorias'].get(category_id)
+    return empresa
 
 
 async def criar_empresa(
@@ -112,6 +160,7 @@ async def criar_empresa(
             data['servidor_id'] = servidor_id
 
         response = await supabase.table('empresas').insert(data).execute()
+        limpar_cache_empresa(guild_id)
 
         if response.data:
             return response.data[0]
@@ -133,8 +182,12 @@ async def atualizar_modo_pagamento(empresa_id: int, modo: str) -> bool:
 
         # Invalidar cache para que a próxima leitura busque o valor atualizado
         keys_to_remove = [k for k, v in empresas_cache.items() if isinstance(v, dict) and v.get('id') == empresa_id]
-        for k in keys_to_remove:
-            del empresas_cache[k]
+        keys_to_remove += [
+            k for k, v in empresas_guild_cache.items()
+            if any(emp.get('id') == empresa_id for emp in v['empresas'])
+        ]
+        for k in set(keys_to_remove):
+            limpar_cache_empresa(k)
 
         return True
     except Exception as e:
@@ -5,6 +5,8 @@ Database functions for encomenda (order) management.
 from datetime import datetime, timezone
 from typing import Optional, List, Dict
 from config import supabase
+from database.empresa import listar_ids_empresas
+from database.paginacao import codificar_cursor, decodificar_cursor
 from logging_config import logger
 
 
@@ -39,6 +41,74 @@ async def get_encomendas_pendentes(empresa_id: int) -> List[Dict]:
         return []
 
 
+ENCOMENDAS_PAGINA_MAX = 50
+
+
+async def listar_encomendas_abertas(empresa_id: int, limite: int = 5, cursor: Optional[str] = None) -> Optional[Dict]:
+    """
+    Página das encomendas pendentes/em andamento (RPC `listar_encomendas_abertas`,
+    keyset em (status, data_criacao, id)) com o total vindo do contador por empresa.
+
+    Retorna {'itens': [...], 'total': int, 'proximo_cursor': str | None}.
+    Retorna None em caso de erro; cursor inválido levanta ValueError.
+    """
+    limite = max(1, min(limite, ENCOMENDAS_PAGINA_MAX))
+    status, data_criacao, encomenda_id = decodificar_cursor(cursor, 3) if cursor else (None, None, None)
+    try:
+        encomenda_id = int(encomenda_id) if encomenda_id is not None else None
+    except ValueError as e:
+        raise ValueError("Cursor de paginação inválido") from e
+
+    try:
+        response = await supabase.rpc('listar_encomendas_abertas', {
+            'p_empresa_id': empresa_id,
+            'p_limite': limite + 1,  # uma linha a mais diz se existe próxima página
+            'p_cursor_status': status,
+            'p_cursor_data': data_criacao,
+            'p_cursor_id': encomenda_id
+        }).execute()
+    except Exception as e:
+        logger.error(f"Erro ao listar encomendas da empresa {empresa_id}: {e}")
+        return None
+
+    dados = response.data or {}
+    linhas = dados.get('itens') or []
+    itens = linhas[:limite]
+    proximo = None
+    if len(linhas) > limite:
+        ultima = itens[-1]
+        proximo = codificar_cursor(ultima['status'], ultima['data_criacao'], ultima['id'])
+    return {'itens': itens, 'total': dados.get('total', len(itens)), 'proximo_cursor': proximo}
+
+
+async def reconciliar_encomendas_abertas(empresa_id: Optional[int] = None, corrigir: bool = True) -> Optional[List[Dict]]:
+    """
+    Reconta as encomendas abertas (RPC `reconciliar_encomendas_abertas`) e devolve as
+    empresas cujo contador divergiu. Com `corrigir`, o contador recebe a recontagem.
+    Sem `empresa_id`, uma chamada (e uma transação) por empresa. Retorna None em caso de erro.
+    """
+    try:
+        ids = [empresa_id] if empresa_id is not None else await listar_ids_empresas()
+        divergencias = []
+        for eid in ids:
+            response = await supabase.rpc('reconciliar_encomendas_abertas', {
+                'p_empresa_id': eid,
+                'p_corrigir': corrigir
+            }).execute()
+            divergencias.extend(response.data or [])
+        for d in divergencias:
+            logger.warning(
+                f"Contador de encomendas da empresa {d['empresa_id']} divergente: "
+                f"pendentes={d['pendentes_registrado']}/{d['pendentes_calculado']} "
+                f"em_andamento={d['em_andamento_registrado']}/{d['em_andamento_calculado']}"
+                + (" (corrigido)" if corrigir else "")
+            )
+        return divergencias
+    except Exception as e:
+        logger.error(f"Erro ao reconciliar contadores de encomendas: {e}")
+        return None
+
+
 async def get_encomenda(encomenda_id: int) -> Optional[Dict]:
     """Obtém uma encomenda por ID."""
     try:
@@ -63,3 +133,32 @@ async def atualizar_status_encomenda(encomenda_id: int, status: str, entregador_
     except Exception as e:
         logger.error(f"Erro ao atualizar encomenda: {e}")
         return False
+
+
+async def entregar_encomenda_completa(
+    encomenda_id: int,
+    empresa_id: int,
+    funcionario_id: int,
+    modo: str = 'producao',
+    permitir_sem_estoque: bool = False
+) -> Optional[Dict]:
+    """
+    Entrega a encomenda inteira numa única transação (RPC `entregar_encomenda`):
+    valida o estoque de todos os itens, dá baixa, marca como entregue e registra a comissão.
+
+    Retorna dict com `resultado` ('entregue', 'nao_encontrada', 'ja_entregue',
+    'estoque_insuficiente' ou 'confirmacao_necessaria'), `valor_comissao`,
+    `itens`, `faltando`/`sem_comissao`. Retorna None em caso de erro.
+    """
+    try:
+        response = await supabase.rpc('entregar_encomenda', {
+            'p_encomenda_id': encomenda_id,
+            'p_empresa_id': empresa_id,
+            'p_funcionario_id': funcionario_id,
+            'p_modo': modo,
+            'p_permitir_sem_estoque': permitir_sem_estoque
+        }).execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Erro ao entregar encomenda #{encomenda_id}: {e}")
+        return None
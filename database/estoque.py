@@ -163,8 +163,10 @@ async def remover_do_estoque_global(empresa_id: int, codigo: str, quantidade: in
     """
     Remove quantidade do estoque global (de qualquer funcionário que tenha).
     Usado no modo de pagamento 'entrega' onde o vendedor não precisa ter produzido.
-    Remove dos funcionários na ordem em que têm estoque (FIFO por ID).
-    Retorna informações do item removido incluindo preço para cálculo de comissão.
+    Remove dos funcionários na ordem em que têm estoque (FIFO por ID), de forma
+    atômica via RPC `remover_estoque_global_fifo`.
+    Retorna informações do item removido incluindo preço para cálculo de comissão
+    e `consumos` (de quais funcionários/registros a quantidade saiu).
     """
     try:
         produtos = await get_produtos_empresa(empresa_id)
@@ -176,42 +178,25 @@ async def remover_do_estoque_global(empresa_id: int, codigo: str, quantidade: in
         nome = produto['produtos_referencia']['nome']
         preco_funcionario = produto['preco_pagamento_funcionario']
 
-        response = await supabase.table('estoque_produtos').select('*').eq(
-            'empresa_id', empresa_id
-        ).eq('produto_codigo', codigo.lower()).gt('quantidade', 0).order('id').execute()
-
-        if not response.data:
-            return {'erro': f'Produto {nome} não encontrado no estoque global'}
-
-        total_disponivel = sum(item['quantidade'] for item in response.data)
-
-        if quantidade > total_disponivel:
-            return {'erro': f'Quantidade insuficiente no estoque global. Disponível: {total_disponivel} {nome}'}
-
-        quantidade_restante = quantidade
-        for item in response.data:
-            if quantidade_restante <= 0:
-                break
-
-            disponivel_neste = item['quantidade']
-            a_remover = min(quantidade_restante, disponivel_neste)
-            nova_qtd = disponivel_neste - a_remover
-
-            if nova_qtd == 0:
-                await supabase.table('estoque_produtos').delete().eq('id', item['id']).execute()
-            else:
-                await supabase.table('estoque_produtos').update({
-                    'quantidade': nova_qtd,
-                    'data_atualizacao': datetime.now(timezone.utc).isoformat()
-                }).eq('id', item['id']).execute()
+        response = await supabase.rpc('remover_estoque_global_fifo', {
+            'p_empresa_id': empresa_id,
+            'p_produto_codigo': codigo.lower(),
+            'p_quantidade': quantidade
+        }).execute()
 
-            quantidade_restante -= a_remover
+        resultado = response.data or {}
+        if not resultado.get('ok'):
+            disponivel = resultado.get('disponivel', 0)
+            if not disponivel:
+                return {'erro': f'Produto {nome} não encontrado no estoque global'}
+            return {'erro': f'Quantidade insuficiente no estoque global. Disponível: {disponivel} {nome}'}
 
         return {
-            'quantidade': total_disponivel - quantidade,
+            'quantidade': resultado.get('restante', 0),
             'nome': nome,
-            'removido': quantidade,
-            'preco_funcionario': preco_funcionario
+            'removido': resultado.get('removido', quantidade),
+            'preco_funcionario': preco_funcionario,
+            'consumos': resultado.get('consumos', [])
         }
     except Exception as e:
         logger.error(f"Erro ao remover do estoque global: {e}")
@@ -95,3 +95,79 @@ async def atualizar_canal_funcionario(funcionario_id: int, channel_id: str) -> b
     except Exception as e:
         logger.error(f"Erro ao atualizar channel_id: {e}")
         return False
+
+
+async def get_resumo_financeiro_funcionarios(empresa_id: int, limite: int = 10) -> Optional[Dict]:
+    """
+    Resumo financeiro da empresa numa única consulta (RPC `resumo_financeiro_empresa`).
+    Retorna totais de saldo/estoque de todos os funcionários ativos e apenas os `limite`
+    maiores em `top` (lista de dicts com nome, saldo e estoque).
+    """
+    try:
+        response = await supabase.rpc('resumo_financeiro_empresa', {
+            'p_empresa_id': empresa_id,
+            'p_limite': limite
+        }).execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Erro ao buscar resumo financeiro: {e}")
+        return None
+
+
+async def pagar_estoque_funcionario(
+    funcionario_id: int,
+    empresa_id: int,
+    estoque: Optional[List[Dict]] = None,
+    comissoes_ids: Optional[List[int]] = None
+) -> Optional[Dict]:
+    """
+    Paga estoque + comissões pendentes numa única transação (RPC `pagar_estoque_funcionario`).
+
+    `estoque` é o snapshot mostrado na prévia (`[{'id', 'quantidade'}]`): só essas
+    linhas são pagas, até a quantidade prevista; o que foi produzido depois continua
+    no estoque. `comissoes_ids` são as transações pendentes da prévia.
+
+    Retorna dict com `resultado` ('pago', 'nada_a_pagar' ou 'funcionario_nao_encontrado'),
+    `valor_estoque`, `valor_comissoes`, `total_pago`, `saldo_final`, `itens` e
+    `comissoes_pagas`. Retorna None em caso de erro.
+    """
+    try:
+        response = await supabase.rpc('pagar_estoque_funcionario', {
+            'p_funcionario_id': funcionario_id,
+            'p_empresa_id': empresa_id,
+            'p_estoque': estoque,
+            'p_comissoes': comissoes_ids
+        }).execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Erro ao pagar estoque do funcionário {funcionario_id}: {e}")
+        return None
+
+
+async def creditar_saldo_funcionario(
+    funcionario_id: int,
+    empresa_id: int,
+    valor: float,
+    descricao: str,
+    tipo: str = 'saida'
+) -> Optional[Dict]:
+    """
+    Soma `valor` ao saldo atual e registra a transação numa única transação
+    (RPC `creditar_saldo_funcionario`), sem sobrescrever pagamentos concorrentes.
+
+    Retorna dict com `resultado` ('pago' ou 'funcionario_nao_encontrado', que
+    também cobre funcionário de outra empresa), `saldo_final` e `transacao_id`.
+    Retorna None em caso de erro.
+    """
+    try:
+        response = await supabase.rpc('creditar_saldo_funcionario', {
+            'p_funcionario_id': funcionario_id,
+            'p_empresa_id': empresa_id,
+            'p_valor': valor,
+            'p_descricao': descricao,
+            'p_tipo': tipo
+        }).execute()
+        return response.data
+    except Exception as e:
+        logger.error(f"Erro ao creditar saldo do funcionário {funcionario_id}: {e}")
+        return None
@@ -0,0 +1,26 @@
+"""
+Cursores opacos para paginação keyset (extrato, encomendas).
+"""
+
+import base64
+from typing import List
+
+_SEPARADOR = '|'
+
+
+def codificar_cursor(*chave) -> str:
+    """Codifica a chave de ordenação da última linha da página."""
+    texto = _SEPARADOR.join(str(parte) for parte in chave)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str, partes: int) -> List[str]:
+    """Inverso de `codificar_cursor`. Levanta ValueError se o cursor for inválido."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Cursor de paginação inválido") from e
+    valores = texto.split(_SEPARADOR, partes - 1)
+    if len(valores) != partes:
+        raise ValueError("Cursor de paginação inválido")
+    return valores
@@ -2,19 +2,31 @@
 Database functions for product management.
 """
 
-from typing import Optional, Dict
-from config import supabase
+from typing import Optional, Dict, List
+from config import supabase, produtos_cache, produtos_cache_versoes
+from database.cache import limpar_cache_produtos
 from logging_config import logger
 
 
-async def get_produtos_empresa(empresa_id: int) -> Dict[str, Dict]:
-    """Obtém produtos configurados para a empresa."""
+async def get_produtos_empresa(empresa_id: int, usar_cache: bool = True) -> Dict[str, Dict]:
+    """Obtém produtos configurados para a empresa (com cache versionado por empresa)."""
+    if usar_cache:
+        cached = produtos_cache.get(empresa_id)
+        if cached is not None:
+            return dict(cached)
+
+    versao = produtos_cache_versoes.get(empresa_id, 0)
     try:
         response = await supabase.table('produtos_empresa').select(
             '*, produtos_referencia(*)'
         ).eq('empresa_id', empresa_id).eq('ativo', True).execute()
 
-        return {p['produtos_referencia']['codigo']: p for p in response.data}
+        produtos = {p['produtos_referencia']['codigo']: p for p in response.data}
+
+        # Só grava se ninguém invalidou o catálogo enquanto a consulta rodava
+        if produtos_cache_versoes.get(empresa_id, 0) == versao:
+            produtos_cache[empresa_id] = produtos
+        return dict(produtos)
     except Exception as e:
         logger.error(f"Erro ao buscar produtos da empresa: {e}")
         return {}
@@ -71,3 +83,69 @@ async def configurar_produto_empresa(empresa_id: int, produto_ref_id: int, preco
     except Exception as e:
         logger.error(f"Erro ao configurar produto: {e}")
         return False
+    finally:
+        limpar_cache_produtos(empresa_id)
+
+
+async def configurar_produtos_empresa_lote(empresa_id: int, precos: List[Dict]) -> Optional[int]:
+    """
+    Configura vários produtos da empresa de uma vez.
+    `precos` é uma lista de dicts com produto_referencia_id, preco_venda e preco_pagamento_funcionario.
+    Compara com as linhas atuais e grava apenas o que mudou num único upsert
+    (chave empresa_id + produto_referencia_id). Retorna quantos produtos foram gravados.
+    """
+    try:
+        atuais = await supabase.table('produtos_empresa').select(
+            'produto_referencia_id, preco_venda, preco_pagamento_funcionario, ativo'
+        ).eq('empresa_id', empresa_id).execute()
+
+        existentes = {row['produto_referencia_id']: row for row in atuais.data or []}
+
+        alterados = []
+        for preco in precos:
+            pv = round(float(preco['preco_venda']), 2)
+            pf = round(float(preco['preco_pagamento_funcionario']), 2)
+            atual = existentes.get(preco['produto_referencia_id'])
+
+            if atual and atual.get('ativo') and \
+               round(float(atual['preco_venda']), 2) == pv and \
+               round(float(atual['preco_pagamento_funcionario']), 2) == pf:
+                continue
+
+            alterados.append({
+                'empresa_id': empresa_id,
+                'produto_referencia_id': preco['produto_referencia_id'],
+                'preco_venda': pv,
+                'preco_pagamento_funcionario': pf,
+                'ativo': True
+            })
+
+        if alterados:
+            await supabase.table('produtos_empresa').upsert(
+                alterados, on_conflict='empresa_id,produto_referencia_id'
+            ).execute()
+            limpar_cache_produtos(empresa_id)
+
+        return len(alterados)
+    except Exception as e:
+        logger.error(f"Erro ao configurar produtos em lote: {e}")
+        limpar_cache_produtos(empresa_id)
+        return None
+
+
+async def aplicar_comissao_produtos(empresa_id: int, porcentagem: float) -> Optional[int]:
+    """
+    Recalcula o pagamento do funcionário (preco_venda * porcentagem / 100) de todos os
+    produtos ativos da empresa numa única operação. Retorna a quantidade atualizada.
+    """
+    try:
+        response = await supabase.rpc('aplicar_comissao_empresa', {
+            'p_empresa_id': empresa_id,
+            'p_porcentagem': porcentagem
+        }).execute()
+        return int(response.data or 0)
+    except Exception as e:
+        logger.error(f"Erro ao aplicar comissão: {e}")
+        return None
+    finally:
+        limpar_cache_produtos(empresa_id)
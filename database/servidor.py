@@ -51,3 +51,21 @@ async def get_servidor_by_guild(guild_id: str) -> Optional[Dict]:
     except Exception as e:
         logger.error(f"Erro ao buscar servidor: {e}")
         return None
+
+
+async def reivindicar_entrada_guild(guild_id: str, shard_id: int) -> bool:
+    """Registra a entrada do bot no servidor; False se outro processo já tratou.
+
+    Evita boas-vindas e consumo de trial em dobro quando o GUILD_CREATE é
+    reentregue (reconexão de shard ou troca de cluster durante um rollout).
+    """
+    try:
+        response = await supabase.rpc('reivindicar_entrada_guild', {
+            'p_guild_id': guild_id,
+            'p_shard_id': shard_id,
+        }).execute()
+        return bool(response.data)
+    except Exception as e:
+        # Na dúvida, segue: uma mensagem repetida é melhor que nenhuma
+        logger.error(f"Erro ao reivindicar entrada do servidor {guild_id}: {e}")
+        return True
@@ -4,6 +4,7 @@ Database functions for tester management.
 
 from typing import List, Dict
 from config import supabase
+from database.cache import limpar_cache_assinatura
 from logging_config import logger
 
 
@@ -17,6 +18,7 @@ async def adicionar_tester(guild_id: str, nome: str = None, adicionado_por: str
             'motivo': motivo,
             'ativo': True
         }).execute()
+        limpar_cache_assinatura(guild_id)
         return bool(response.data)
     except Exception as e:
         logger.error(f"Erro ao adicionar tester: {e}")
@@ -29,6 +31,7 @@ async def remover_tester(guild_id: str) -> bool:
         await supabase.table('testers').update({
             'ativo': False
         }).eq('guild_id', guild_id).execute()
+        limpar_cache_assinatura(guild_id)
         return True
     except Exception as e:
         logger.error(f"Erro ao remover tester: {e}")
@@ -58,14 +61,15 @@ async def listar_testers() -> List[Dict]:
 async def simular_pagamento(guild_id: str) -> bool:
     """Simula um pagamento para testes (ativa assinatura do pagamento pendente mais recente)."""
     try:
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                'https://rgopdilceawaqrgaoaca.supabase.co/functions/v1/simulate-payment',
-                json={'guild_id': guild_id},
-                headers={'Content-Type': 'application/json'}
-            ) as response:
-                return response.status == 200
+        from http_client import get_http_session
+        session = get_http_session('supabase')
+        async with session.post(
+            'https://rgopdilceawaqrgaoaca.supabase.co/functions/v1/simulate-payment',
+            json={'guild_id': guild_id},
+            headers={'Content-Type': 'application/json'}
+        ) as response:
+            limpar_cache_assinatura(guild_id)
+            return response.status == 200
     except Exception as e:
         logger.error(f"Erro ao simular pagamento: {e}")
         return False
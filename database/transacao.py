@@ -2,8 +2,11 @@
 Database functions for transacao (transaction) management.
 """
 
-from typing import List, Dict
+from datetime import datetime
+from typing import Optional, List, Dict
 from config import supabase
+from database.empresa import listar_ids_empresas
+from database.paginacao import codificar_cursor, decodificar_cursor
 from logging_config import logger
 
 
@@ -43,24 +46,104 @@ async def get_transacoes_empresa(empresa_id: int, limit: int = 50) -> List[Dict]
         return []
 
 
+TRANSACOES_PAGINA_MAX = 100
+
+
+def codificar_cursor_transacao(transacao: Dict) -> str:
+    """Cursor opaco com a chave (data_criacao, id) da última linha da página."""
+    return codificar_cursor(transacao['data_criacao'], transacao['id'])
+
+
+def decodificar_cursor_transacao(cursor: str) -> tuple:
+    """Inverso de `codificar_cursor_transacao`. Levanta ValueError se inválido."""
+    data_criacao, transacao_id = decodificar_cursor(cursor, 2)
+    try:
+        # Valida aqui: um timestamp inválido só falharia na RPC (erro de banco, não de cursor)
+        datetime.fromisoformat(data_criacao.replace('Z', '+00:00'))
+        return data_criacao, int(transacao_id)
+    except ValueError as e:
+        raise ValueError("Cursor de paginação inválido") from e
+
+
+async def listar_transacoes_empresa(
+    empresa_id: int,
+    limite: int = 10,
+    cursor: Optional[str] = None,
+    tipo: Optional[str] = None,
+    funcionario_id: Optional[int] = None
+) -> Optional[Dict]:
+    """
+    Página do extrato da empresa, do mais recente para o mais antigo (RPC
+    `listar_transacoes_empresa`, keyset em (data_criacao, id): páginas profundas
+    custam o mesmo que a primeira).
+
+    Retorna {'itens': [...], 'proximo_cursor': str | None}. Retorna None em caso de
+    erro; cursor inválido levanta ValueError.
+    """
+    limite = max(1, min(limite, TRANSACOES_PAGINA_MAX))
+    cursor_data, cursor_id = decodificar_cursor_transacao(cursor) if cursor else (None, None)
+    try:
+        response = await supabase.rpc('listar_transacoes_empresa', {
+            'p_empresa_id': empresa_id,
+            'p_limite': limite + 1,  # uma linha a mais diz se existe próxima página
+            'p_cursor_data': cursor_data,
+            'p_cursor_id': cursor_id,
+            'p_tipo': tipo,
+            'p_funcionario_id': funcionario_id
+        }).execute()
+    except Exception as e:
+        logger.error(f"Erro ao listar transações da empresa {empresa_id}: {e}")
+        return None
+
+    linhas = response.data or []
+    itens = linhas[:limite]
+    proximo = codificar_cursor_transacao(itens[-1]) if len(linhas) > limite else None
+    return {'itens': itens, 'proximo_cursor': proximo}
+
+
 async def get_saldo_empresa(empresa_id: int) -> float:
-    """Calcula o saldo atual da empresa usando RPC otimizado."""
+    """Saldo atual da empresa, lido do acumulado `empresas_saldo` (mantido por trigger)."""
     try:
-        response = await supabase.rpc('calcular_saldo_empresa', {'p_empresa_id': empresa_id}).execute()
-        if response.data is not None:
-            return float(response.data)
-        return 0.0
+        response = await supabase.table('empresas_saldo').select('saldo').eq('empresa_id', empresa_id).limit(1).execute()
+        if response.data:
+            return float(response.data[0]['saldo'])
+        return 0.0  # sem linha = empresa sem transações
     except Exception as e:
-        logger.warning(f"RPC calcular_saldo_empresa falhou, usando fallback: {e}")
+        logger.warning(f"Leitura de empresas_saldo falhou, usando calcular_saldo_empresa: {e}")
         try:
-            response = await supabase.table('transacoes').select('tipo, valor').eq('empresa_id', empresa_id).execute()
-            saldo = 0.0
-            for t in response.data or []:
-                if t['tipo'] == 'entrada':
-                    saldo += float(t['valor'])
-                else:
-                    saldo -= float(t['valor'])
-            return saldo
+            response = await supabase.rpc('calcular_saldo_empresa', {'p_empresa_id': empresa_id}).execute()
+            return float(response.data) if response.data is not None else 0.0
         except Exception as e2:
-            logger.error(f"Erro ao calcular saldo (fallback): {e2}")
+            logger.error(f"Erro ao calcular saldo: {e2}")
             return 0.0
+
+
+async def reconciliar_saldos_empresas(empresa_id: Optional[int] = None, corrigir: bool = True) -> Optional[List[Dict]]:
+    """
+    Recalcula o saldo a partir de `transacoes` (RPC `reconciliar_saldo_empresa`) e
+    devolve as empresas cujo acumulado divergiu (`saldo_registrado`, `saldo_calculado`,
+    `diferenca`). Com `corrigir`, o acumulado é substituído pelo valor recalculado.
+
+    Sem `empresa_id`, reconcilia todas, uma chamada (e uma transação) por empresa:
+    o lock de cada linha de `empresas_saldo` dura só a recontagem daquela empresa.
+    Retorna None em caso de erro.
+    """
+    try:
+        ids = [empresa_id] if empresa_id is not None else await listar_ids_empresas()
+        divergencias = []
+        for eid in ids:
+            response = await supabase.rpc('reconciliar_saldo_empresa', {
+                'p_empresa_id': eid,
+                'p_corrigir': corrigir
+            }).execute()
+            divergencias.extend(response.data or [])
+        for d in divergencias:
+            logger.warning(
+                f"Saldo da empresa {d['empresa_id']} divergente: registrado={d['saldo_registrado']} "
+                f"calculado={d['saldo_calculado']} diferença={d['diferenca']}"
+                + (" (corrigido)" if corrigir else "")
+            )
+        return divergencias
+    except Exception as e:
+        logger.error(f"Erro ao reconciliar saldos: {e}")
+        return None
@@ -4,9 +4,20 @@ Database functions for frontend user management.
 
 from typing import Optional, List, Dict
 from config import supabase
+from database.cache import limpar_cache_acessos_frontend
 from logging_config import logger
 
 
+def _invalidar_acessos(linhas: Optional[List[Dict]]):
+    """Invalida o cache de acessos dos usuários afetados por um UPDATE (todos, se desconhecidos)."""
+    discord_ids = {linha.get('discord_id') for linha in (linhas or []) if linha.get('discord_id')}
+    if not discord_ids:
+        limpar_cache_acessos_frontend()
+        return
+    for discord_id in discord_ids:
+        limpar_cache_acessos_frontend(discord_id)
+
+
 async def criar_usuario_frontend(
     discord_id: str,
     guild_id: str,
@@ -24,6 +35,7 @@ async def criar_usuario_frontend(
                 'nome': nome,
                 'ativo': True
             }).eq('id', existing.data[0]['id']).execute()
+            limpar_cache_acessos_frontend(discord_id)
             return response.data[0] if response.data else existing.data[0]
 
         response = await supabase.table('usuarios_frontend').insert({
@@ -33,6 +45,7 @@ async def criar_usuario_frontend(
             'role': role,
             'ativo': True
         }).execute()
+        limpar_cache_acessos_frontend(discord_id)
 
         return response.data[0] if response.data else None
     except Exception as e:
@@ -67,7 +80,8 @@ async def get_usuarios_frontend_by_guild(guild_id: str) -> List[Dict]:
 async def atualizar_role_usuario_frontend(usuario_id: int, role: str) -> bool:
     """Atualiza a role de um usuário frontend."""
     try:
-        await supabase.table('usuarios_frontend').update({'role': role}).eq('id', usuario_id).execute()
+        response = await supabase.table('usuarios_frontend').update({'role': role}).eq('id', usuario_id).execute()
+        _invalidar_acessos(response.data)
         return True
     except Exception as e:
         logger.error(f"Erro ao atualizar role: {e}")
@@ -77,7 +91,8 @@ async def atualizar_role_usuario_frontend(usuario_id: int, role: str) -> bool:
 async def desativar_usuario_frontend(usuario_id: int) -> bool:
     """Desativa um usuário frontend."""
     try:
-        await supabase.table('usuarios_frontend').update({'ativo': False}).eq('id', usuario_id).execute()
+        response = await supabase.table('usuarios_frontend').update({'ativo': False}).eq('id', usuario_id).execute()
+        _invalidar_acessos(response.data)
         return True
     except Exception as e:
         logger.error(f"Erro ao desativar usuário: {e}")
@@ -0,0 +1,175 @@
+"""
+Bot Multi-Empresa Downtown - Instrumentação das chamadas ao Supabase
+Envolve `supabase.table(...)...execute()` e `supabase.rpc(...).execute()` (via
+`config._SupabaseProxy`) para medir cada chamada: alvo, operação, latência,
+linhas, tamanho do payload e classe do erro.
+
+Também mantém um resumo por comando/requisição (número de chamadas e tempo total
+no banco) num ContextVar, logado ao final para deixar N+1 visível.
+"""
+
+import json
+import os
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from observability import counter, histogram
+from logging_config import logger
+
+# Lidos do ambiente na primeira chamada (`_carregar_limites`): o config importa
+# este módulo junto dos outros imports, antes do load_dotenv
+DB_SLOW_QUERY_MS: Optional[float] = None
+DB_CALLS_WARN_THRESHOLD: Optional[int] = None
+# Medir o tamanho re-serializa a resposta no event loop: só sob demanda
+DB_METRICS_PAYLOAD_SIZE: Optional[bool] = None
+
+CHAMADAS_DB = counter('db_calls_total', 'Chamadas ao Supabase por alvo, operação e resultado')
+DURACAO_DB = histogram('db_call_duration_seconds', 'Latência das chamadas ao Supabase')
+LINHAS_DB = histogram(
+    'db_response_rows',
+    'Linhas retornadas por chamada',
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+)
+BYTES_DB = histogram(
+    'db_response_bytes',
+    'Tamanho aproximado (JSON) da resposta por chamada (com DB_METRICS_PAYLOAD_SIZE=true)',
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+
+# Métodos do query builder que definem a operação da chamada
+_OPERACOES = {'select', 'insert', 'update', 'upsert', 'delete'}
+
+
+@dataclass
+class ResumoDB:
+    """Acumulado de chamadas ao banco de um comando/requisição."""
+    escopo: str
+    chamadas: int = 0
+    tempo: float = 0.0
+    erros: int = 0
+
+
+_resumo_atual: ContextVar[Optional[ResumoDB]] = ContextVar('resumo_db', default=None)
+
+
+def _carregar_limites():
+    global DB_SLOW_QUERY_MS, DB_CALLS_WARN_THRESHOLD, DB_METRICS_PAYLOAD_SIZE
+    if DB_SLOW_QUERY_MS is None:
+        DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '500'))
+    if DB_CALLS_WARN_THRESHOLD is None:
+        DB_CALLS_WARN_THRESHOLD = int(os.getenv('DB_CALLS_WARN_THRESHOLD', '15'))
+    if DB_METRICS_PAYLOAD_SIZE is None:
+        DB_METRICS_PAYLOAD_SIZE = os.getenv('DB_METRICS_PAYLOAD_SIZE', 'false').lower() in ('1', 'true', 'yes')
+
+
+def iniciar_resumo_db(escopo: str) -> Token:
+    """Começa a acumular as chamadas do contexto atual (comando ou requisição)."""
+    return _resumo_atual.set(ResumoDB(escopo))
+
+
+def finalizar_resumo_db(token: Token) -> Optional[ResumoDB]:
+    """Encerra o resumo iniciado por `iniciar_resumo_db` e loga se houve chamadas."""
+    resumo = _resumo_atual.get()
+    _resumo_atual.reset(token)
+    if resumo is None or resumo.chamadas == 0:
+        return resumo
+    _carregar_limites()
+    mensagem = (
+        f"db_summary escopo={resumo.escopo} chamadas={resumo.chamadas} "
+        f"db_ms={resumo.tempo * 1000:.1f} erros={resumo.erros}"
+    )
+    if resumo.chamadas >= DB_CALLS_WARN_THRESHOLD:
+        logger.warning(f"{mensagem} (possível N+1)")
+    else:
+        logger.info(mensagem, extra={'sampled': True})
+    return resumo
+
+
+def _contar_linhas(dados: Any) -> int:
+    if dados is None:
+        return 0
+    if isinstance(dados, list):
+        return len(dados)
+    return 1
+
+
+def _tamanho_payload(dados: Any) -> Optional[int]:
+    if not DB_METRICS_PAYLOAD_SIZE or dados is None:
+        return None
+    try:
+        return len(json.dumps(dados, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+def registrar_chamada(alvo: str, tipo: str, operacao: str, duracao: float, dados: Any = None, erro: Optional[str] = None):
+    """Registra métricas, slow log e resumo de uma chamada executada."""
+    _carregar_limites()
+    rotulos = {'target': alvo, 'kind': tipo, 'operation': operacao}
+    CHAMADAS_DB.labels(rotulos, status=erro or 'ok').inc()
+    DURACAO_DB.labels(rotulos).observe(duracao)
+
+    linhas = _contar_linhas(dados)
+    if erro is None:
+        LINHAS_DB.labels(rotulos).observe(linhas)
+        tamanho = _tamanho_payload(dados)
+        if tamanho is not None:
+            BYTES_DB.labels(rotulos).observe(tamanho)
+
+    resumo = _resumo_atual.get()
+    if resumo is not None:
+        resumo.chamadas += 1
+        resumo.tempo += duracao
+        if erro:
+            resumo.erros += 1
+
+    if duracao * 1000 >= DB_SLOW_QUERY_MS:
+        escopo = resumo.escopo if resumo else '-'
+        logger.warning(
+            f"db_slow_query {tipo}={alvo} op={operacao} ms={duracao * 1000:.1f} "
+            f"linhas={linhas} erro={erro or '-'} escopo={escopo}"
+        )
+
+
+class ConsultaInstrumentada:
+    """Embrulha um query builder do supabase-py, medindo o `execute()` final."""
+
+    __slots__ = ('_builder', '_alvo', '_tipo', '_operacao')
+
+    def __init__(self, builder, alvo: str, tipo: str, operacao: str):
+        self._builder = builder
+        self._alvo = alvo
+        self._tipo = tipo
+        self._operacao = operacao
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._builder, nome)
+        if nome == 'execute':
+            return self._execute
+        if not callable(atributo):
+            return atributo
+
+        def encadear(*args, **kwargs):
+            resultado = atributo(*args, **kwargs)
+            # Métodos encadeáveis devolvem outro builder: continua instrumentando
+            if hasattr(resultado, 'execute'):
+                operacao = nome if nome in _OPERACOES else self._operacao
+                return ConsultaInstrumentada(resultado, self._alvo, self._tipo, operacao)
+            return resultado
+
+        return encadear
+
+    async def _execute(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            resposta = await self._builder.execute(*args, **kwargs)
+        except Exception as e:
+            registrar_chamada(self._alvo, self._tipo, self._operacao, time.perf_counter() - inicio, erro=type(e).__name__)
+            raise
+        registrar_chamada(
+            self._alvo, self._tipo, self._operacao, time.perf_counter() - inicio,
+            dados=getattr(resposta, 'data', None),
+        )
+        return resposta
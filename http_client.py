@@ -0,0 +1,135 @@
+"""
+Bot Multi-Empresa Downtown - Cliente HTTP compartilhado
+Registro de sessões aiohttp reaproveitadas pelo processo inteiro (bot e API).
+
+Cada sessão nomeada ('asaas', 'supabase', ...) tem seu próprio pool de conexões
+com keep-alive, cache de DNS e limites por host, evitando pagar TCP + TLS a cada
+chamada. As sessões são criadas sob demanda e fechadas no shutdown.
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+from observability import inc_counter, register_collector, set_gauge
+from logging_config import logger
+
+# Limites do pool (por sessão)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))
+
+# Timeouts padrão da sessão (segundos); para um limite diferente numa chamada,
+# passe `timeout=` ao próprio request (`session.get(url, timeout=...)`)
+HTTP_TIMEOUT_TOTAL = float(os.getenv('HTTP_TIMEOUT_TOTAL', '20'))
+HTTP_TIMEOUT_CONNECT = float(os.getenv('HTTP_TIMEOUT_CONNECT', '5'))
+HTTP_TIMEOUT_READ = float(os.getenv('HTTP_TIMEOUT_READ', '15'))
+
+# nome -> (sessão, loop em que foi criada)
+_sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+
+
+def _timeout_padrao() -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(
+        total=HTTP_TIMEOUT_TOTAL,
+        connect=HTTP_TIMEOUT_CONNECT,
+        sock_connect=HTTP_TIMEOUT_CONNECT,
+        sock_read=HTTP_TIMEOUT_READ,
+    )
+
+
+def _trace_config(nome: str) -> aiohttp.TraceConfig:
+    """Conta conexões novas vs reaproveitadas do pool."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_create(session, ctx, params):
+        inc_counter("http_pool_connections_total", labels={"pool": nome, "reused": "false"})
+
+    async def on_reuse(session, ctx, params):
+        inc_counter("http_pool_connections_total", labels={"pool": nome, "reused": "true"})
+
+    trace.on_connection_create_end.append(on_create)
+    trace.on_connection_reuseconn.append(on_reuse)
+    return trace
+
+
+def _descartar_sessao(nome: str, session: aiohttp.ClientSession, session_loop: asyncio.AbstractEventLoop):
+    """Fecha a sessão que está sendo substituída (criada em outro loop)."""
+    if session.closed:
+        return
+    if session_loop.is_running() and not session_loop.is_closed():
+        # O loop antigo ainda roda (outra thread): o close tem que acontecer nele
+        asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+        return
+    # Loop parado: ninguém mais pode aguardar o close; fecha os sockets direto
+    connector = session.connector
+    session.detach()
+    if connector is not None:
+        try:
+            connector._close()
+        except Exception as e:
+            logger.debug(f"Conexões da sessão HTTP '{nome}' já estavam encerradas: {e}")
+
+
+def get_http_session(nome: str = 'default', *, limit_per_host: Optional[int] = None) -> aiohttp.ClientSession:
+    """
+    Retorna a sessão compartilhada `nome`, criando-a se necessário.
+    Deve ser chamada de dentro de uma coroutine (a sessão pertence ao loop atual).
+    Não use `async with` na sessão: ela é fechada por `close_http_sessions()`.
+    `limit_per_host` só vale na criação da sessão (o pool é de todos os chamadores).
+    """
+    loop = asyncio.get_running_loop()
+    atual = _sessions.get(nome)
+    if atual is not None:
+        session, session_loop = atual
+        if not session.closed and session_loop is loop:
+            return session
+        _descartar_sessao(nome, session, session_loop)
+
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=limit_per_host or HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+    session = aiohttp.ClientSession(
+        connector=connector,
+        timeout=_timeout_padrao(),
+        trace_configs=[_trace_config(nome)],
+    )
+    _sessions[nome] = (session, loop)
+    logger.info(f"Sessão HTTP '{nome}' criada (limit={HTTP_POOL_LIMIT}, por host={limit_per_host or HTTP_POOL_LIMIT_PER_HOST})")
+    return session
+
+
+async def close_http_sessions():
+    """Fecha todas as sessões compartilhadas (shutdown da API / do bot)."""
+    for nome, (session, _loop) in list(_sessions.items()):
+        try:
+            if not session.closed:
+                await session.close()
+        except Exception as e:
+            logger.warning(f"Erro ao fechar sessão HTTP '{nome}': {e}")
+    _sessions.clear()
+
+
+def coletar_metricas_pool():
+    """Atualiza gauges de uso do pool de cada sessão (chamado ao renderizar /metrics)."""
+    for nome, (session, _loop) in list(_sessions.items()):
+        connector = session.connector
+        if session.closed or connector is None:
+            continue
+        labels = {"pool": nome}
+        # Atributos internos do aiohttp: conexões em uso e ociosas (keep-alive)
+        em_uso = len(getattr(connector, '_acquired', ()))
+        ociosas = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        set_gauge("http_pool_connections_in_use", em_uso, labels)
+        set_gauge("http_pool_connections_idle", ociosas, labels)
+        set_gauge("http_pool_limit", connector.limit, labels)
+        set_gauge("http_pool_limit_per_host", connector.limit_per_host, labels)
+
+
+register_collector(coletar_metricas_pool)
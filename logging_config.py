@@ -1,18 +1,39 @@
-
+import atexit
+import copy
 import logging
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 import json
 from datetime import datetime, timezone
 
+from dotenv import load_dotenv
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON encoding when installed
+    orjson = None
+
+# First project module imported by config/db_metrics: LOG_* may come from .env
+load_dotenv()
+
+# Records waiting for the writer thread; when full, new records are dropped
+# instead of blocking the event loop.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of high-volume INFO records kept (those logged with extra={"sampled": True})
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+_listeners: list[QueueListener] = []
+
 
 class JsonFormatter(logging.Formatter):
     """Simple JSON formatter for production log aggregation."""
 
     def format(self, record):
         payload = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -22,12 +43,80 @@ class JsonFormatter(logging.Formatter):
                 payload[key] = getattr(record, key)
         if record.exc_info:
             payload["exception"] = self.formatException(record.exc_info)
-        return json.dumps(payload, ensure_ascii=True)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(payload, default=str).decode()
+        # Same bytes as orjson: raw UTF-8, compact separators
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
 
-def setup_logging(name="bot_fazendeiro", log_file="bot.log", level=logging.INFO):
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of records flagged with extra={"sampled": True} (INFO and below)."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if self.rate >= 1.0 or record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without ever blocking the caller.
+    Only the message is rendered here; formatting and I/O happen in the listener.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            # Tracebacks are rendered now: the frames may change after this call returns
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                notice = logging.makeLogRecord({
+                    "name": record.name,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": f"Log queue full: {self.dropped} records dropped",
+                })
+                self.queue.put_nowait(notice)
+                self.dropped = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def stop_logging():
+    """Flushes pending records and stops the writer threads (also runs at exit)."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_logging)
+
+
+def setup_logging(name="bot_fazendeiro", log_file=None, level=logging.INFO):
     """
     Sets up a centralized logger with console and file handlers.
+    Handlers run on a background QueueListener thread, so logging calls never do disk I/O.
+    The file name comes from LOG_FILE when not given (one file per shard cluster process).
     """
+    log_file = log_file or os.getenv("LOG_FILE", "bot.log")
     # Create logs directory if it doesn't exist
     if not os.path.exists("logs"):
         os.makedirs("logs")
@@ -57,8 +146,16 @@ def setup_logging(name="bot_fazendeiro", log_file="bot.log", level=logging.INFO)
     console_handler.setFormatter(formatter)
     console_handler.setLevel(level)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.setLevel(level)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+    logger.addHandler(queue_handler)
 
     return logger
 
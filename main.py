@@ -4,17 +4,44 @@ Desenvolvido para Discord com integração Supabase
 Versão modularizada com Cogs
 """
 
+import time
+
+# Início da linha do tempo de inicialização: antes dos imports pesados, para que
+# o tempo de import (discord, supabase, cogs...) entre na fase 'imports'
+_INICIO_PROCESSO = time.perf_counter()
+
 import asyncio
 import uuid
 import discord
 from discord.ext import commands
 
 from config import DISCORD_TOKEN, CHECKOUT_URL, supabase, init_supabase
-from database import get_empresas_by_guild, get_produtos_empresa, verificar_assinatura_servidor
+from http_client import close_http_sessions
+from bot_metrics import (
+    registrar_metricas_bot,
+    registrar_erro_comando,
+    registrar_bloqueio_assinatura,
+    iniciar_servidor_metricas,
+    parar_servidor_metricas,
+    registrar_carga_cog,
+    registrar_metricas_shards,
+    LinhaDoTempoInicializacao,
+)
+from sharding import criar_bot, BOT_CLUSTER_ID
+from database import (
+    get_empresas_by_guild,
+    get_produtos_empresa,
+    verificar_assinatura_servidor,
+    reivindicar_entrada_guild,
+    limpar_cache_assinatura,
+)
 from utils import selecionar_empresa
 from ui_utils import create_error_embed
 from logging_config import logger
 
+linha_do_tempo = LinhaDoTempoInicializacao(_INICIO_PROCESSO)
+linha_do_tempo.marcar('imports')
+
 
 # ============================================
 # CONFIGURAÇÃO DO BOT
@@ -25,20 +52,37 @@ intents.message_content = True
 intents.members = True
 intents.guilds = True
 
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
+# AutoShardedBot quando BOT_SHARD_COUNT está definido (ver sharding.py)
+bot = criar_bot(intents, command_prefix='!', help_command=None)
+registrar_metricas_bot(bot)
+registrar_metricas_shards(bot)
+
+linha_do_tempo.marcar('bot_setup')
 
 
 # ============================================
 # EVENTOS DO BOT
 # ============================================
 
+@bot.event
+async def on_connect():
+    """Conectado ao gateway (antes do READY)."""
+    if not linha_do_tempo.tem_fase('gateway_connect'):
+        linha_do_tempo.marcar('gateway_connect')
+
+
 @bot.event
 async def on_ready():
     """Bot está pronto."""
+    if not linha_do_tempo.concluida:
+        linha_do_tempo.marcar('ready')
+        linha_do_tempo.concluir()
     logger.info('============================================')
     logger.info('  Bot Fazendeiro conectado!')
     logger.info(f'  Usuario: {bot.user.name}')
     logger.info(f'  Servidores: {len(bot.guilds)}')
+    if isinstance(bot, commands.AutoShardedBot):
+        logger.info(f'  Cluster {BOT_CLUSTER_ID}: shards {sorted(bot.shards)} de {bot.shard_count}')
     logger.info('============================================')
 
     await bot.change_presence(
@@ -49,6 +93,16 @@ async def on_ready():
     )
 
 
+@bot.event
+async def on_shard_ready(shard_id):
+    logger.info(f"Shard {shard_id} pronto (cluster {BOT_CLUSTER_ID})")
+
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    logger.warning(f"Shard {shard_id} desconectado (cluster {BOT_CLUSTER_ID})")
+
+
 class SetupWizardView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -65,6 +119,11 @@ class SetupWizardView(discord.ui.View):
 @bot.event
 async def on_guild_join(guild):
     """Quando bot entra em novo servidor."""
+    # Só um processo trata a entrada, mesmo se o evento for reentregue a outro shard
+    if not await reivindicar_entrada_guild(str(guild.id), guild.shard_id):
+        logger.info(f"guild_join_skip guild_id={guild.id} shard={guild.shard_id} reason=already_claimed")
+        return
+
     me = guild.me or guild.get_member(bot.user.id)
     canal = guild.system_channel or next(
         (
@@ -127,6 +186,10 @@ async def on_guild_join(guild):
             message
         )
 
+        if status == 'success':
+            # Comandos deste servidor passam por este shard: descarta um "sem assinatura" em cache
+            limpar_cache_assinatura(guild_id)
+
         if not canal:
             return
 
@@ -194,7 +257,11 @@ def criar_embed_bloqueio(assinatura: dict = None):
 
 @bot.check
 async def verificar_assinatura_global(ctx):
-    """Check global que verifica assinatura antes de cada comando."""
+    """Check global que verifica assinatura antes de cada comando.
+
+    O cache de assinatura é por processo, mas cada servidor pertence a um único
+    shard, então todos os comandos de um servidor consultam o mesmo cache.
+    """
     # Comandos livres não precisam de verificação
     if ctx.command and ctx.command.name in COMANDOS_LIVRES:
         return True
@@ -205,6 +272,7 @@ async def verificar_assinatura_global(ctx):
 
     # Se não tiver guild (DM), bloqueia
     if not ctx.guild:
+        registrar_bloqueio_assinatura(ctx, 'dm')
         await ctx.send("❌ Este bot só funciona em servidores!")
         return False
 
@@ -212,6 +280,7 @@ async def verificar_assinatura_global(ctx):
     assinatura = await verificar_assinatura_servidor(str(ctx.guild.id))
 
     if not assinatura.get('ativa'):
+        registrar_bloqueio_assinatura(ctx, 'sem_assinatura')
         embed = criar_embed_bloqueio(assinatura)
         await ctx.send(embed=embed)
         return False
@@ -222,6 +291,7 @@ async def verificar_assinatura_global(ctx):
 @bot.event
 async def on_command_error(ctx, error):
     """Tratamento de erros."""
+    registrar_erro_comando(ctx, error)
     if isinstance(error, commands.MissingRequiredArgument):
         await ctx.send(embed=create_error_embed("Erro", f"Argumento faltando: `{error.param.name}`"))
     elif isinstance(error, commands.MissingPermissions):
@@ -311,6 +381,7 @@ class HelpSelect(discord.ui.Select):
                 "`!pagarestoque @user` - Paga e zera estoque acumulado\n"
                 "\n**Relatórios:**\n"
                 "`!caixa` - Fluxo de caixa e saldos\n"
+                "`!extrato [@user] [tipo]` - Histórico de transações paginado\n"
                 "\n*Pagamentos geram registro de transação automático.*"
             )
 
@@ -444,8 +515,18 @@ async def info_empresa(ctx):
 # CARREGAMENTO DAS COGS
 # ============================================
 
+async def _carregar_cog(cog: str):
+    inicio = time.perf_counter()
+    try:
+        await bot.load_extension(cog)
+        logger.info(f"  [OK] Cog carregada: {cog} ({(time.perf_counter() - inicio) * 1000:.0f}ms)")
+    except Exception as e:
+        logger.error(f"  [ERRO] Erro ao carregar {cog}: {e}")
+    registrar_carga_cog(cog, time.perf_counter() - inicio)
+
+
 async def load_cogs():
-    """Carrega todas as Cogs."""
+    """Carrega todas as Cogs (são independentes entre si, então em paralelo)."""
     cogs = [
         'cogs.admin',
         'cogs.precos',
@@ -454,12 +535,7 @@ async def load_cogs():
         'cogs.assinatura'
     ]
 
-    for cog in cogs:
-        try:
-            await bot.load_extension(cog)
-            logger.info(f"  [OK] Cog carregada: {cog}")
-        except Exception as e:
-            logger.error(f"  [ERRO] Erro ao carregar {cog}: {e}")
+    await asyncio.gather(*(_carregar_cog(cog) for cog in cogs))
 
 
 # ============================================
@@ -470,15 +546,24 @@ async def main():
     """Função principal."""
     logger.info("Iniciando Bot Fazendeiro...")
 
+    await iniciar_servidor_metricas()
+    linha_do_tempo.marcar('metrics_server')
+
     # Inicializa Supabase async client
     await init_supabase()
     logger.info("  [OK] Supabase async client inicializado.")
+    linha_do_tempo.marcar('supabase_init')
 
     logger.info("Carregando Cogs...")
     await load_cogs()
+    linha_do_tempo.marcar('cog_load')
 
     # Run Bot Only (API must be run separately via uvicorn)
-    await bot.start(DISCORD_TOKEN)
+    try:
+        await bot.start(DISCORD_TOKEN)
+    finally:
+        await parar_servidor_metricas()
+        await close_http_sessions()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,302 @@
+"""In-memory metrics registry shared by the API and the bot (Prometheus text format).
+
+Metrics are registered once (`counter`, `gauge`, `histogram`) and updated through
+label handles: `REQUESTS.labels(method="GET", path="/x")` returns a child that can
+be stored and reused, so the hot path is a dict lookup plus an increment. Each
+metric keeps at most METRICS_MAX_SERIES label combinations; beyond that new
+combinations are folded into a single `__overflow__` series.
+
+The module-level helpers (`inc_counter`, `observe_histogram`, `set_gauge`) keep
+working for ad-hoc call sites and create the metric on first use.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import os
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from logging_config import logger
+
+DEFAULT_BUCKETS: Tuple[float, ...] = tuple(
+    float(b)
+    for b in os.getenv(
+        "METRICS_DEFAULT_BUCKETS",
+        "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10",
+    ).split(",")
+    if b.strip()
+)
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "1000"))
+OVERFLOW_LABEL_VALUE = "__overflow__"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_registry_lock = Lock()
+_metrics: Dict[str, "_Metric"] = {}
+_collectors: List[Callable[[], None]] = []
+
+
+def _label_key(labels: Optional[dict]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]) -> None:
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates the q-quantile by linear interpolation inside the matching bucket."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, upper in enumerate(self.upper_bounds):
+            bucket = self.counts[i]
+            if seen + bucket >= rank and bucket:
+                return lower + (upper - lower) * (rank - seen) / bucket
+            seen += bucket
+            lower = upper
+        return self.upper_bounds[-1] if self.upper_bounds else None
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str = "", max_series: Optional[int] = None) -> None:
+        self.name = name
+        self.help = help_text
+        self.max_series = max_series or METRICS_MAX_SERIES
+        self._children: Dict[LabelKey, object] = {}
+        self._lock = Lock()
+        self._overflowed = False
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, labels: Optional[dict] = None, /, **kwargs: str):
+        """Returns the series for these labels (reusable handle)."""
+        if kwargs:
+            labels = {**(labels or {}), **kwargs}
+        key = _label_key(labels)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+        with self._lock:
+            child = self._children.get(key)
+            if child is not None:
+                return child
+            if len(self._children) >= self.max_series:
+                return self._overflow_child(key)
+            child = self._children[key] = self._new_child()
+            return child
+
+    def _overflow_child(self, key: LabelKey):
+        overflow_key = tuple((k, OVERFLOW_LABEL_VALUE) for k, _ in key)
+        child = self._children.get(overflow_key)
+        if child is None:
+            # The overflow series may exceed max_series by one per label set
+            child = self._children[overflow_key] = self._new_child()
+        if not self._overflowed:
+            self._overflowed = True
+            logger.warning("Metric %s reached %s series; folding new labels into overflow", self.name, self.max_series)
+        _series_overflow.labels(metric=self.name).inc()
+        return child
+
+    def series(self) -> List[Tuple[LabelKey, object]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = []
+        if self.help:
+            lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} {self.type_name}")
+        for key, child in self.series():
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: LabelKey, child) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {_format_value(child.value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, labels: Optional[dict] = None) -> None:
+        self.labels(labels).inc(amount)
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float, labels: Optional[dict] = None) -> None:
+        self.labels(labels).set(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str = "",
+        buckets: Optional[Sequence[float]] = None,
+        max_series: Optional[int] = None,
+    ) -> None:
+        super().__init__(name, help_text, max_series)
+        self.upper_bounds = tuple(sorted(float(b) for b in (buckets or DEFAULT_BUCKETS) if not math.isinf(b)))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float, labels: Optional[dict] = None) -> None:
+        self.labels(labels).observe(value)
+
+    def quantile(self, q: float, labels: Optional[dict] = None) -> Optional[float]:
+        return self.labels(labels).quantile(q)
+
+    def _render_child(self, key: LabelKey, child: _HistogramChild) -> List[str]:
+        lines = []
+        cumulative = 0
+        for upper, count in zip(self.upper_bounds, child.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(upper))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {child.count}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {child.count}")
+        return lines
+
+
+def _get_or_create(name: str, cls, factory: Callable[[], _Metric]):
+    metric = _metrics.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _metrics.get(name)
+            if metric is None:
+                metric = _metrics[name] = factory()
+    if not isinstance(metric, cls):
+        raise ValueError(f"Metric {name} already registered as {metric.type_name}")
+    return metric
+
+
+def counter(name: str, help_text: str = "", *, max_series: Optional[int] = None) -> Counter:
+    return _get_or_create(name, Counter, lambda: Counter(name, help_text, max_series))
+
+
+def gauge(name: str, help_text: str = "", *, max_series: Optional[int] = None) -> Gauge:
+    return _get_or_create(name, Gauge, lambda: Gauge(name, help_text, max_series))
+
+
+def histogram(
+    name: str,
+    help_text: str = "",
+    *,
+    buckets: Optional[Sequence[float]] = None,
+    max_series: Optional[int] = None,
+) -> Histogram:
+    return _get_or_create(name, Histogram, lambda: Histogram(name, help_text, buckets, max_series))
+
+
+_series_overflow = Counter(
+    "metrics_series_overflow_total",
+    "Observations folded into the overflow series because of the cardinality cap",
+)
+_metrics[_series_overflow.name] = _series_overflow
+
+
+def inc_counter(name: str, value: float = 1.0, labels: dict[str, str] | None = None) -> None:
+    counter(name).labels(labels).inc(value)
+
+
+def observe_histogram(name: str, value: float, labels: dict[str, str] | None = None) -> None:
+    histogram(name).labels(labels).observe(value)
+
+
+def set_gauge(name: str, value: float, labels: dict[str, str] | None = None) -> None:
+    gauge(name).labels(labels).set(value)
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    """Registers a callback run before rendering (e.g. to refresh gauges from live state)."""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    for collector in list(_collectors):
+        try:
+            collector()
+        except Exception:
+            logger.debug("Metrics collector %r failed", collector, exc_info=True)
+    with _registry_lock:
+        metrics = sorted(_metrics.values(), key=lambda m: m.name)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + ("\n" if lines else "")
@@ -0,0 +1,42 @@
+"""
+Reconcilia os acumulados por empresa: saldo (`empresas_saldo` x soma de `transacoes`)
+e contador de encomendas abertas (`empresas_encomendas_abertas` x `encomendas`).
+
+Uso (cron): python scripts/reconciliar_saldos.py [--empresa ID] [--somente-verificar]
+Sai com código 1 quando encontra divergência, para o agendador alertar.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from config import init_supabase
+from database import reconciliar_saldos_empresas, reconciliar_encomendas_abertas
+
+
+async def main(empresa_id, corrigir: bool) -> int:
+    await init_supabase()
+    divergencias = await reconciliar_saldos_empresas(empresa_id, corrigir)
+    contadores = await reconciliar_encomendas_abertas(empresa_id, corrigir)
+    if divergencias is None or contadores is None:
+        return 2
+    for d in divergencias:
+        print(f"empresa={d['empresa_id']} registrado={d['saldo_registrado']} "
+              f"calculado={d['saldo_calculado']} diferenca={d['diferenca']}")
+    for d in contadores:
+        print(f"empresa={d['empresa_id']} encomendas pendentes={d['pendentes_registrado']}->{d['pendentes_calculado']} "
+              f"em_andamento={d['em_andamento_registrado']}->{d['em_andamento_calculado']}")
+    sufixo = " corrigida(s)" if corrigir and (divergencias or contadores) else ""
+    print(f"{len(divergencias)} saldo(s) e {len(contadores)} contador(es) de encomendas com divergência{sufixo}")
+    return 1 if divergencias or contadores else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--empresa', type=int, default=None, help='Reconcilia só esta empresa')
+    parser.add_argument('--somente-verificar', action='store_true', help='Não corrige, apenas reporta')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.empresa, not args.somente_verificar)))
@@ -0,0 +1,203 @@
+"""
+Bot Multi-Empresa Downtown - Sharding
+Escolhe entre `commands.Bot` e `commands.AutoShardedBot` a partir do ambiente e
+fornece o launcher que divide os shards em clusters (um processo por faixa).
+
+Variáveis:
+    BOT_SHARD_COUNT   total de shards ("auto" = recomendado pelo Discord; vazio = sem sharding)
+    BOT_SHARD_IDS     shards deste processo ("0-3" ou "0,1,2"; vazio = todos)
+    BOT_CLUSTER_ID    identificação do processo nos logs/métricas
+    BOT_CLUSTERS      (launcher) número de processos
+    BOT_IDENTIFY_INTERVAL (launcher) segundos por IDENTIFY entre clusters
+
+Uso do launcher: `python sharding.py` (sobe `main.py` uma vez por cluster, cada um
+com seu BOT_SHARD_IDS e sua porta de métricas, e reinicia processos que caírem).
+"""
+
+import asyncio
+import os
+import signal
+import sys
+import time
+from typing import List, Optional
+
+import discord
+from discord.ext import commands
+from dotenv import load_dotenv
+
+from logging_config import logger
+
+load_dotenv()
+
+BOT_SHARD_COUNT = os.getenv('BOT_SHARD_COUNT', '').strip().lower()
+BOT_SHARD_IDS = os.getenv('BOT_SHARD_IDS', '').strip()
+BOT_CLUSTER_ID = os.getenv('BOT_CLUSTER_ID', '0')
+BOT_CLUSTERS = int(os.getenv('BOT_CLUSTERS', '1'))
+# O Discord aceita 1 IDENTIFY a cada 5s por bucket de max_concurrency
+BOT_IDENTIFY_INTERVAL = float(os.getenv('BOT_IDENTIFY_INTERVAL', '5.5'))
+BOT_RESTART_BACKOFF_MAX = float(os.getenv('BOT_RESTART_BACKOFF_MAX', '60'))
+
+DISCORD_GATEWAY_BOT_URL = 'https://discord.com/api/v10/gateway/bot'
+
+
+def parse_shard_ids(texto: str) -> Optional[List[int]]:
+    """Converte "0-3,8,10-11" em [0, 1, 2, 3, 8, 10, 11] (vazio = None)."""
+    if not texto or not texto.strip():
+        return None
+    ids = set()
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if '-' in parte:
+            inicio, fim = (int(x) for x in parte.split('-', 1))
+            if fim < inicio:
+                raise ValueError(f"Faixa de shards inválida: {parte}")
+            ids.update(range(inicio, fim + 1))
+        else:
+            ids.add(int(parte))
+    return sorted(ids)
+
+
+def formatar_shard_ids(ids: List[int]) -> str:
+    """Inverso de `parse_shard_ids` para faixas contíguas ("0-3")."""
+    if len(ids) == 1:
+        return str(ids[0])
+    return f"{ids[0]}-{ids[-1]}"
+
+
+def dividir_em_clusters(total_shards: int, clusters: int) -> List[List[int]]:
+    """Distribui os shards em faixas contíguas o mais equilibradas possível."""
+    clusters = max(1, min(clusters, total_shards))
+    base, resto = divmod(total_shards, clusters)
+    faixas = []
+    inicio = 0
+    for i in range(clusters):
+        tamanho = base + (1 if i < resto else 0)
+        faixas.append(list(range(inicio, inicio + tamanho)))
+        inicio += tamanho
+    return faixas
+
+
+def sharding_ativo() -> bool:
+    return bool(BOT_SHARD_COUNT)
+
+
+def criar_bot(intents: discord.Intents, **kwargs) -> commands.Bot:
+    """Cria o bot: AutoShardedBot quando BOT_SHARD_COUNT está definido."""
+    if not sharding_ativo():
+        return commands.Bot(intents=intents, **kwargs)
+
+    shard_count = None if BOT_SHARD_COUNT == 'auto' else int(BOT_SHARD_COUNT)
+    shard_ids = parse_shard_ids(BOT_SHARD_IDS)
+    if shard_ids is not None and shard_count is None:
+        raise ValueError("BOT_SHARD_IDS exige BOT_SHARD_COUNT numérico")
+    if shard_ids is not None and shard_ids[-1] >= shard_count:
+        raise ValueError(f"Shard {shard_ids[-1]} fora do total {shard_count}")
+
+    return commands.AutoShardedBot(
+        intents=intents,
+        shard_count=shard_count,
+        shard_ids=shard_ids,
+        **kwargs,
+    )
+
+
+# ============================================
+# LAUNCHER (um processo por cluster de shards)
+# ============================================
+
+async def _shard_count_recomendado(token: str) -> int:
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            DISCORD_GATEWAY_BOT_URL, headers={'Authorization': f'Bot {token}'}
+        ) as resp:
+            resp.raise_for_status()
+            dados = await resp.json()
+    return int(dados['shards'])
+
+
+async def _supervisionar_cluster(cluster_id: int, shard_ids: List[int], total: int,
+                                 atraso_inicial: float, parar: asyncio.Event):
+    """Mantém o processo do cluster vivo, reiniciando com backoff se cair."""
+    porta_base = int(os.getenv('BOT_METRICS_PORT', '9108'))
+    env = {
+        **os.environ,
+        'BOT_SHARD_COUNT': str(total),
+        'BOT_SHARD_IDS': formatar_shard_ids(shard_ids),
+        'BOT_CLUSTER_ID': str(cluster_id),
+        'BOT_METRICS_PORT': str(porta_base + cluster_id if porta_base else 0),
+        # RotatingFileHandler não é seguro entre processos: um arquivo por cluster
+        'LOG_FILE': f'bot-cluster{cluster_id}.log',
+    }
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+    try:
+        await asyncio.wait_for(parar.wait(), timeout=atraso_inicial)
+        return
+    except asyncio.TimeoutError:
+        pass
+
+    backoff = 1.0
+    while not parar.is_set():
+        logger.info(f"[launcher] cluster {cluster_id}: shards {env['BOT_SHARD_IDS']} de {total}")
+        iniciado_em = time.monotonic()
+        processo = await asyncio.create_subprocess_exec(sys.executable, main_py, env=env)
+        espera_parar = asyncio.ensure_future(parar.wait())
+        espera_processo = asyncio.ensure_future(processo.wait())
+        await asyncio.wait({espera_parar, espera_processo}, return_when=asyncio.FIRST_COMPLETED)
+
+        if parar.is_set():
+            espera_processo.cancel()
+            if processo.returncode is None:
+                processo.terminate()
+                try:
+                    await asyncio.wait_for(processo.wait(), timeout=30)
+                except asyncio.TimeoutError:
+                    processo.kill()
+            return
+
+        espera_parar.cancel()
+        if time.monotonic() - iniciado_em > BOT_RESTART_BACKOFF_MAX:
+            backoff = 1.0  # rodou bem por um tempo: não herda o backoff de quedas antigas
+        logger.warning(f"[launcher] cluster {cluster_id} saiu com código {processo.returncode}; reiniciando em {backoff:.0f}s")
+        try:
+            await asyncio.wait_for(parar.wait(), timeout=backoff)
+        except asyncio.TimeoutError:
+            pass
+        backoff = min(backoff * 2, BOT_RESTART_BACKOFF_MAX)
+
+
+async def executar_launcher():
+    """Sobe BOT_CLUSTERS processos de `main.py`, cada um com sua faixa de shards."""
+    token = os.getenv('DISCORD_TOKEN')
+    if BOT_SHARD_COUNT and BOT_SHARD_COUNT != 'auto':
+        total = int(BOT_SHARD_COUNT)
+    else:
+        total = await _shard_count_recomendado(token)
+
+    faixas = dividir_em_clusters(total, BOT_CLUSTERS)
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sinal, parar.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    # Escalona os clusters: os IDENTIFY de processos diferentes não se coordenam
+    tarefas = []
+    atraso = 0.0
+    for cluster_id, shard_ids in enumerate(faixas):
+        tarefas.append(_supervisionar_cluster(cluster_id, shard_ids, total, atraso, parar))
+        atraso += len(shard_ids) * BOT_IDENTIFY_INTERVAL
+    await asyncio.gather(*tarefas)
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(executar_launcher())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,89 @@
+-- Atomic FIFO removal from the company-wide stock ('entrega' payment mode).
+-- Replaces the Python loop (1 SELECT + 1 UPDATE/DELETE per row) with a single RPC.
+-- Rows are locked in FIFO order, so concurrent deliveries serialize instead of racing.
+
+CREATE INDEX IF NOT EXISTS idx_estoque_produtos_empresa_codigo_fifo
+  ON public.estoque_produtos (empresa_id, produto_codigo, id)
+  WHERE quantidade > 0;
+
+CREATE OR REPLACE FUNCTION public.remover_estoque_global_fifo(
+  p_empresa_id integer,
+  p_produto_codigo text,
+  p_quantidade integer
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_total integer;
+  v_restante integer := p_quantidade;
+  v_tirar integer;
+  v_row record;
+  v_consumos jsonb := '[]'::jsonb;
+BEGIN
+  IF p_quantidade IS NULL OR p_quantidade <= 0 THEN
+    RETURN jsonb_build_object('ok', false, 'erro', 'quantidade_invalida', 'disponivel', 0);
+  END IF;
+
+  -- Lock all positive rows of this product (FIFO order keeps lock ordering stable)
+  PERFORM 1
+  FROM public.estoque_produtos e
+  WHERE e.empresa_id = p_empresa_id
+    AND e.produto_codigo = p_produto_codigo
+    AND e.quantidade > 0
+  ORDER BY e.id
+  FOR UPDATE;
+
+  SELECT COALESCE(SUM(e.quantidade), 0)
+  INTO v_total
+  FROM public.estoque_produtos e
+  WHERE e.empresa_id = p_empresa_id
+    AND e.produto_codigo = p_produto_codigo
+    AND e.quantidade > 0;
+
+  IF v_total < p_quantidade THEN
+    RETURN jsonb_build_object('ok', false, 'erro', 'insuficiente', 'disponivel', v_total);
+  END IF;
+
+  FOR v_row IN
+    SELECT e.id, e.funcionario_id, e.quantidade
+    FROM public.estoque_produtos e
+    WHERE e.empresa_id = p_empresa_id
+      AND e.produto_codigo = p_produto_codigo
+      AND e.quantidade > 0
+    ORDER BY e.id
+  LOOP
+    EXIT WHEN v_restante <= 0;
+
+    v_tirar := LEAST(v_restante, v_row.quantidade);
+
+    IF v_tirar = v_row.quantidade THEN
+      DELETE FROM public.estoque_produtos WHERE id = v_row.id;
+    ELSE
+      UPDATE public.estoque_produtos
+      SET quantidade = quantidade - v_tirar,
+          data_atualizacao = NOW()
+      WHERE id = v_row.id;
+    END IF;
+
+    v_consumos := v_consumos || jsonb_build_array(jsonb_build_object(
+      'estoque_id', v_row.id,
+      'funcionario_id', v_row.funcionario_id,
+      'quantidade', v_tirar
+    ));
+    v_restante := v_restante - v_tirar;
+  END LOOP;
+
+  RETURN jsonb_build_object(
+    'ok', true,
+    'removido', p_quantidade,
+    'restante', v_total - p_quantidade,
+    'consumos', v_consumos
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.remover_estoque_global_fifo(integer, text, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.remover_estoque_global_fifo(integer, text, integer) TO service_role;
@@ -0,0 +1,226 @@
+-- Atomic delivery of a whole encomenda (!entregar).
+-- One RPC validates stock for every item, debits it, marks the order delivered
+-- and records the commission. Replaces ~4 round-trips per item plus the final
+-- UPDATE/INSERT, and the order row lock closes the double-delivery race.
+--
+-- p_modo = 'entrega'  -> company-wide stock (FIFO), all items must be available
+-- p_modo = 'producao' -> the funcionario's own stock; items he does not have are
+--                        delivered without commission, but only when
+--                        p_permitir_sem_estoque = true (after the user confirms)
+--
+-- resultado: 'entregue' | 'nao_encontrada' | 'ja_entregue'
+--            | 'estoque_insuficiente' | 'confirmacao_necessaria'
+
+CREATE INDEX IF NOT EXISTS idx_estoque_produtos_funcionario_codigo
+  ON public.estoque_produtos (funcionario_id, empresa_id, produto_codigo)
+  WHERE quantidade > 0;
+
+CREATE OR REPLACE FUNCTION public.entregar_encomenda(
+  p_encomenda_id integer,
+  p_empresa_id integer,
+  p_funcionario_id integer,
+  p_modo text DEFAULT 'producao',
+  p_permitir_sem_estoque boolean DEFAULT false
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_enc record;
+  v_item jsonb;
+  v_codigo text;
+  v_nome text;
+  v_precisa integer;
+  v_tem integer;
+  v_preco numeric;
+  v_restante integer;
+  v_tirar integer;
+  v_row record;
+  v_res jsonb;
+  v_comissao numeric := 0;
+  v_itens jsonb := '[]'::jsonb;
+  v_faltando jsonb := '[]'::jsonb;
+BEGIN
+  -- Lock the order: a concurrent !entregar on the same id waits here and then sees 'entregue'
+  SELECT *
+  INTO v_enc
+  FROM public.encomendas e
+  WHERE e.id = p_encomenda_id
+    AND e.empresa_id = p_empresa_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('resultado', 'nao_encontrada');
+  END IF;
+
+  IF v_enc.status = 'entregue' THEN
+    RETURN jsonb_build_object('resultado', 'ja_entregue');
+  END IF;
+
+  -- 1) Validate every item (no writes yet)
+  FOR v_item IN
+    SELECT value FROM jsonb_array_elements(COALESCE(v_enc.itens_json, '[]'::jsonb))
+  LOOP
+    v_codigo := lower(v_item->>'codigo');
+    v_precisa := COALESCE((v_item->>'quantidade')::integer, 0)
+               - COALESCE((v_item->>'quantidade_entregue')::integer, 0);
+    CONTINUE WHEN v_precisa <= 0;
+
+    SELECT pe.preco_pagamento_funcionario, pr.nome
+    INTO v_preco, v_nome
+    FROM public.produtos_empresa pe
+    JOIN public.produtos_referencia pr ON pr.id = pe.produto_referencia_id
+    WHERE pe.empresa_id = p_empresa_id
+      AND pe.ativo = true
+      AND pr.codigo = v_codigo
+    LIMIT 1;
+
+    v_preco := COALESCE(v_preco, 0);
+    v_nome := COALESCE(v_item->>'nome', v_nome, v_codigo);
+
+    IF p_modo = 'entrega' THEN
+      PERFORM 1
+      FROM public.estoque_produtos e
+      WHERE e.empresa_id = p_empresa_id
+        AND e.produto_codigo = v_codigo
+        AND e.quantidade > 0
+      ORDER BY e.id
+      FOR UPDATE;
+
+      SELECT COALESCE(SUM(e.quantidade), 0)
+      INTO v_tem
+      FROM public.estoque_produtos e
+      WHERE e.empresa_id = p_empresa_id
+        AND e.produto_codigo = v_codigo
+        AND e.quantidade > 0;
+    ELSE
+      PERFORM 1
+      FROM public.estoque_produtos e
+      WHERE e.funcionario_id = p_funcionario_id
+        AND e.empresa_id = p_empresa_id
+        AND e.produto_codigo = v_codigo
+        AND e.quantidade > 0
+      ORDER BY e.id
+      FOR UPDATE;
+
+      SELECT COALESCE(SUM(e.quantidade), 0)
+      INTO v_tem
+      FROM public.estoque_produtos e
+      WHERE e.funcionario_id = p_funcionario_id
+        AND e.empresa_id = p_empresa_id
+        AND e.produto_codigo = v_codigo
+        AND e.quantidade > 0;
+    END IF;
+
+    IF v_tem >= v_precisa THEN
+      v_itens := v_itens || jsonb_build_array(jsonb_build_object(
+        'codigo', v_codigo,
+        'nome', v_nome,
+        'quantidade', v_precisa,
+        'preco_funcionario', v_preco,
+        'comissao', v_preco * v_precisa
+      ));
+      v_comissao := v_comissao + v_preco * v_precisa;
+    ELSE
+      v_faltando := v_faltando || jsonb_build_array(jsonb_build_object(
+        'codigo', v_codigo,
+        'nome', v_nome,
+        'precisa', v_precisa,
+        'tem', v_tem,
+        'falta', v_precisa - v_tem
+      ));
+    END IF;
+  END LOOP;
+
+  IF jsonb_array_length(v_faltando) > 0 THEN
+    IF p_modo = 'entrega' THEN
+      RETURN jsonb_build_object(
+        'resultado', 'estoque_insuficiente',
+        'faltando', v_faltando
+      );
+    ELSIF NOT p_permitir_sem_estoque THEN
+      RETURN jsonb_build_object(
+        'resultado', 'confirmacao_necessaria',
+        'itens', v_itens,
+        'faltando', v_faltando,
+        'valor_comissao', v_comissao
+      );
+    END IF;
+  END IF;
+
+  -- 2) Debit stock for the items that carry commission
+  FOR v_item IN SELECT value FROM jsonb_array_elements(v_itens)
+  LOOP
+    v_codigo := v_item->>'codigo';
+    v_precisa := (v_item->>'quantidade')::integer;
+
+    IF p_modo = 'entrega' THEN
+      v_res := public.remover_estoque_global_fifo(p_empresa_id, v_codigo, v_precisa);
+      IF NOT COALESCE((v_res->>'ok')::boolean, false) THEN
+        RAISE EXCEPTION 'Estoque insuficiente para % na encomenda #%', v_codigo, p_encomenda_id;
+      END IF;
+    ELSE
+      v_restante := v_precisa;
+      FOR v_row IN
+        SELECT e.id, e.quantidade
+        FROM public.estoque_produtos e
+        WHERE e.funcionario_id = p_funcionario_id
+          AND e.empresa_id = p_empresa_id
+          AND e.produto_codigo = v_codigo
+          AND e.quantidade > 0
+        ORDER BY e.id
+      LOOP
+        EXIT WHEN v_restante <= 0;
+        v_tirar := LEAST(v_restante, v_row.quantidade);
+
+        IF v_tirar = v_row.quantidade THEN
+          DELETE FROM public.estoque_produtos WHERE id = v_row.id;
+        ELSE
+          UPDATE public.estoque_produtos
+          SET quantidade = quantidade - v_tirar,
+              data_atualizacao = NOW()
+          WHERE id = v_row.id;
+        END IF;
+
+        v_restante := v_restante - v_tirar;
+      END LOOP;
+
+      IF v_restante > 0 THEN
+        RAISE EXCEPTION 'Estoque insuficiente para % na encomenda #%', v_codigo, p_encomenda_id;
+      END IF;
+    END IF;
+  END LOOP;
+
+  -- 3) Close the order and record the commission
+  UPDATE public.encomendas
+  SET status = 'entregue',
+      data_entrega = NOW(),
+      funcionario_responsavel_id = p_funcionario_id
+  WHERE id = p_encomenda_id;
+
+  IF v_comissao > 0 THEN
+    INSERT INTO public.transacoes (empresa_id, tipo, valor, descricao, funcionario_id)
+    VALUES (
+      p_empresa_id,
+      'comissao_pendente',
+      v_comissao,
+      CASE WHEN p_modo = 'entrega' THEN 'Comissão Venda #' ELSE 'Comissão Encomenda #' END || p_encomenda_id,
+      p_funcionario_id
+    );
+  END IF;
+
+  RETURN jsonb_build_object(
+    'resultado', 'entregue',
+    'valor_comissao', v_comissao,
+    'itens', v_itens,
+    'sem_comissao', v_faltando,
+    'comprador', v_enc.comprador,
+    'valor_total', v_enc.valor_total
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.entregar_encomenda(integer, integer, integer, text, boolean) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.entregar_encomenda(integer, integer, integer, text, boolean) TO service_role;
@@ -0,0 +1,72 @@
+-- Payroll summary for !caixa in a single query.
+-- Replaces 1 query for funcionarios + 2 queries per funcionario (stock + catalog).
+-- Returns totals over all active funcionarios and only the top-N rows for display.
+
+CREATE OR REPLACE FUNCTION public.resumo_financeiro_empresa(
+  p_empresa_id integer,
+  p_limite integer DEFAULT 10
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH catalogo AS (
+    SELECT DISTINCT ON (pr.codigo)
+      pr.codigo,
+      pe.preco_pagamento_funcionario AS preco
+    FROM public.produtos_empresa pe
+    JOIN public.produtos_referencia pr ON pr.id = pe.produto_referencia_id
+    WHERE pe.empresa_id = p_empresa_id
+      AND pe.ativo = true
+    ORDER BY pr.codigo, pe.id DESC
+  ),
+  estoque AS (
+    SELECT e.funcionario_id, SUM(e.quantidade * c.preco) AS valor
+    FROM public.estoque_produtos e
+    JOIN catalogo c ON c.codigo = e.produto_codigo
+    WHERE e.empresa_id = p_empresa_id
+      AND e.quantidade > 0
+    GROUP BY e.funcionario_id
+  ),
+  por_funcionario AS (
+    SELECT
+      f.id,
+      f.nome,
+      COALESCE(f.saldo, 0) AS saldo,
+      COALESCE(s.valor, 0) AS estoque
+    FROM public.funcionarios f
+    LEFT JOIN estoque s ON s.funcionario_id = f.id
+    WHERE f.empresa_id = p_empresa_id
+      AND f.ativo = true
+  ),
+  top_n AS (
+    SELECT *
+    FROM por_funcionario
+    WHERE saldo > 0 OR estoque > 0
+    ORDER BY saldo + estoque DESC, id
+    LIMIT GREATEST(COALESCE(p_limite, 10), 0)
+  )
+  SELECT jsonb_build_object(
+    'total_saldos', COALESCE((SELECT SUM(saldo) FROM por_funcionario), 0),
+    'total_estoque', COALESCE((SELECT SUM(estoque) FROM por_funcionario), 0),
+    'funcionarios_com_valor', (SELECT COUNT(*) FROM por_funcionario WHERE saldo > 0 OR estoque > 0),
+    'top', COALESCE((
+      SELECT jsonb_agg(jsonb_build_object(
+        'funcionario_id', t.id,
+        'nome', t.nome,
+        'saldo', t.saldo,
+        'estoque', t.estoque
+      ) ORDER BY t.saldo + t.estoque DESC, t.id)
+      FROM top_n t
+    ), '[]'::jsonb)
+  );
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_funcionarios_empresa_ativo
+  ON public.funcionarios (empresa_id)
+  WHERE ativo = true;
+
+REVOKE ALL ON FUNCTION public.resumo_financeiro_empresa(integer, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.resumo_financeiro_empresa(integer, integer) TO service_role;
@@ -0,0 +1,31 @@
+-- Bulk commission recalculation for !comissao.
+-- One UPDATE over the empresa's active catalog instead of one UPDATE per product.
+
+CREATE OR REPLACE FUNCTION public.aplicar_comissao_empresa(
+  p_empresa_id integer,
+  p_porcentagem numeric
+)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_atualizados integer;
+BEGIN
+  IF p_porcentagem IS NULL OR p_porcentagem < 0 THEN
+    RAISE EXCEPTION 'Porcentagem inválida: %', p_porcentagem;
+  END IF;
+
+  UPDATE public.produtos_empresa
+  SET preco_pagamento_funcionario = ROUND(preco_venda * p_porcentagem / 100.0, 2)
+  WHERE empresa_id = p_empresa_id
+    AND ativo = true;
+
+  GET DIAGNOSTICS v_atualizados = ROW_COUNT;
+  RETURN v_atualizados;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.aplicar_comissao_empresa(integer, numeric) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.aplicar_comissao_empresa(integer, numeric) TO service_role;
@@ -0,0 +1,25 @@
+-- Asaas customer id per (discord_id, CPF/CNPJ) so repeat purchases and renewals
+-- skip POST /customers (and the GET/PUT fallback) and go straight to /payments.
+-- The document is stored only as a SHA-256 hash of its digits.
+
+CREATE TABLE IF NOT EXISTS public.asaas_clientes (
+  discord_id TEXT NOT NULL,
+  cpf_cnpj_hash TEXT NOT NULL,
+  customer_id TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (discord_id, cpf_cnpj_hash)
+);
+
+ALTER TABLE public.asaas_clientes ENABLE ROW LEVEL SECURITY;
+
+REVOKE ALL ON public.asaas_clientes FROM PUBLIC;
+GRANT SELECT, INSERT, UPDATE, DELETE ON public.asaas_clientes TO service_role;
+
+DROP POLICY IF EXISTS asaas_clientes_service_role_all ON public.asaas_clientes;
+CREATE POLICY asaas_clientes_service_role_all
+ON public.asaas_clientes
+FOR ALL
+TO service_role
+USING (true)
+WITH CHECK (true);
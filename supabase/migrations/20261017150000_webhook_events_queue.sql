@@ -0,0 +1,47 @@
+-- webhook_events as a durable work queue.
+-- The API acknowledges Asaas as soon as the event row is inserted ('processing');
+-- background workers claim due rows, process them and either mark them
+-- 'processed'/'failed' or schedule a retry with backoff (next_attempt_at).
+-- Rows claimed by a worker that died (restart, crash) are reclaimed once
+-- locked_at is older than p_stale_seconds.
+
+ALTER TABLE public.webhook_events
+  ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS next_attempt_at timestamptz NOT NULL DEFAULT NOW(),
+  ADD COLUMN IF NOT EXISTS locked_at timestamptz NULL;
+
+CREATE INDEX IF NOT EXISTS webhook_events_pending_idx
+  ON public.webhook_events (next_attempt_at, id)
+  WHERE status = 'processing';
+
+CREATE OR REPLACE FUNCTION public.claim_webhook_events(
+  p_limit integer DEFAULT 10,
+  p_stale_seconds integer DEFAULT 300
+)
+RETURNS SETOF public.webhook_events
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  RETURN QUERY
+  UPDATE public.webhook_events w
+  SET locked_at = NOW(),
+      attempts = w.attempts + 1
+  WHERE w.id IN (
+    SELECT p.id
+    FROM public.webhook_events p
+    WHERE p.status = 'processing'
+      AND p.next_attempt_at <= NOW()
+      AND (p.locked_at IS NULL OR p.locked_at < NOW() - make_interval(secs => p_stale_seconds))
+    ORDER BY p.next_attempt_at, p.id
+    LIMIT GREATEST(p_limit, 0)
+    -- Several API instances can poll at once: each row goes to a single worker
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING w.*;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.claim_webhook_events(integer, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.claim_webhook_events(integer, integer) TO service_role;
@@ -0,0 +1,53 @@
+-- One row per guild the bot has joined. With the bot split across shard
+-- clusters a GUILD_CREATE can reach on_guild_join more than once (shard
+-- re-identify, cluster rollout); the first caller claims the join and runs the
+-- welcome message + trial consumption, the others skip it.
+
+CREATE TABLE IF NOT EXISTS public.guild_entradas (
+  guild_id TEXT PRIMARY KEY,
+  shard_id INTEGER,
+  entrou_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.guild_entradas ENABLE ROW LEVEL SECURITY;
+
+REVOKE ALL ON public.guild_entradas FROM PUBLIC;
+GRANT SELECT, INSERT, UPDATE, DELETE ON public.guild_entradas TO service_role;
+
+DROP POLICY IF EXISTS guild_entradas_service_role_all ON public.guild_entradas;
+CREATE POLICY guild_entradas_service_role_all
+ON public.guild_entradas
+FOR ALL
+TO service_role
+USING (true)
+WITH CHECK (true);
+
+-- Returns true when this call claimed the join. A guild that removes and
+-- re-adds the bot later is claimed again once p_janela_segundos has passed.
+CREATE OR REPLACE FUNCTION public.reivindicar_entrada_guild(
+  p_guild_id TEXT,
+  p_shard_id INTEGER,
+  p_janela_segundos INTEGER DEFAULT 600
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_reivindicada BOOLEAN;
+BEGIN
+  INSERT INTO public.guild_entradas (guild_id, shard_id, entrou_em)
+  VALUES (p_guild_id, p_shard_id, NOW())
+  ON CONFLICT (guild_id) DO UPDATE
+    SET shard_id = EXCLUDED.shard_id,
+        entrou_em = EXCLUDED.entrou_em
+    WHERE public.guild_entradas.entrou_em < NOW() - make_interval(secs => p_janela_segundos)
+  RETURNING TRUE INTO v_reivindicada;
+
+  RETURN COALESCE(v_reivindicada, FALSE);
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.reivindicar_entrada_guild(TEXT, INTEGER, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.reivindicar_entrada_guild(TEXT, INTEGER, INTEGER) TO service_role;
@@ -0,0 +1,156 @@
+-- Atomic payment of a funcionario's stock + pending commissions (!pagarestoque).
+-- Replaces five sequential calls (history insert, saldo read, saldo write,
+-- stock delete, commission update) that could wipe stock produced between the
+-- preview and the confirm click without paying it.
+--
+-- p_estoque   = snapshot shown in the preview: [{"id": 1, "quantidade": 10}, ...].
+--               Only those rows are paid, and at most the previewed quantity of
+--               each (upsert_estoque adds new production to the same row, so the
+--               extra stays in stock). NULL pays everything currently in stock.
+-- p_comissoes = transacoes ids shown in the preview; only those still pending
+--               for this funcionario/empresa are settled. NULL settles none.
+--
+-- Stock is valued at the current preco_pagamento_funcionario, under lock.
+-- resultado: 'pago' | 'nada_a_pagar' | 'funcionario_nao_encontrado'
+
+CREATE OR REPLACE FUNCTION public.pagar_estoque_funcionario(
+  p_funcionario_id integer,
+  p_empresa_id integer,
+  p_estoque jsonb DEFAULT NULL,
+  p_comissoes integer[] DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_saldo numeric;
+  v_row record;
+  v_pagar integer;
+  v_valor_estoque numeric := 0;
+  v_valor_comissoes numeric := 0;
+  v_qtd_comissoes integer := 0;
+  v_total numeric;
+  v_itens jsonb := '[]'::jsonb;
+BEGIN
+  -- Serializes payments of the same funcionario (double click, two admins)
+  SELECT f.saldo
+  INTO v_saldo
+  FROM public.funcionarios f
+  WHERE f.id = p_funcionario_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('resultado', 'funcionario_nao_encontrado');
+  END IF;
+
+  -- 1) Value and debit the stock rows
+  FOR v_row IN
+    SELECT e.id,
+           e.produto_codigo,
+           e.quantidade,
+           COALESCE(snap.quantidade, e.quantidade) AS quantidade_prevista,
+           prod.preco,
+           prod.nome
+    FROM public.estoque_produtos e
+    -- Same valuation as the preview (get_estoque_funcionario): active products only
+    JOIN LATERAL (
+      SELECT pe.preco_pagamento_funcionario AS preco, pr.nome
+      FROM public.produtos_empresa pe
+      JOIN public.produtos_referencia pr ON pr.id = pe.produto_referencia_id
+      WHERE pe.empresa_id = e.empresa_id
+        AND pe.ativo = true
+        AND pr.codigo = e.produto_codigo
+      LIMIT 1
+    ) prod ON true
+    LEFT JOIN (
+      SELECT (x->>'id')::integer AS id, (x->>'quantidade')::integer AS quantidade
+      FROM jsonb_array_elements(COALESCE(p_estoque, '[]'::jsonb)) x
+    ) snap ON snap.id = e.id
+    WHERE e.funcionario_id = p_funcionario_id
+      AND e.empresa_id = p_empresa_id
+      AND e.quantidade > 0
+      AND (p_estoque IS NULL OR snap.id IS NOT NULL)
+    ORDER BY e.id
+    FOR UPDATE OF e
+  LOOP
+    v_pagar := LEAST(v_row.quantidade, GREATEST(v_row.quantidade_prevista, 0));
+    CONTINUE WHEN v_pagar <= 0;
+
+    IF v_pagar = v_row.quantidade THEN
+      DELETE FROM public.estoque_produtos WHERE id = v_row.id;
+    ELSE
+      UPDATE public.estoque_produtos
+      SET quantidade = quantidade - v_pagar,
+          data_atualizacao = NOW()
+      WHERE id = v_row.id;
+    END IF;
+
+    v_valor_estoque := v_valor_estoque + COALESCE(v_row.preco, 0) * v_pagar;
+    v_itens := v_itens || jsonb_build_array(jsonb_build_object(
+      'codigo', v_row.produto_codigo,
+      'nome', v_row.nome,
+      'quantidade', v_pagar,
+      'preco_funcionario', COALESCE(v_row.preco, 0)
+    ));
+  END LOOP;
+
+  -- 2) Settle exactly the previewed commissions that are still pending
+  IF p_comissoes IS NOT NULL AND cardinality(p_comissoes) > 0 THEN
+    WITH pagas AS (
+      UPDATE public.transacoes t
+      SET tipo = 'comissao_paga'
+      WHERE t.id = ANY(p_comissoes)
+        AND t.empresa_id = p_empresa_id
+        AND t.funcionario_id = p_funcionario_id
+        AND t.tipo = 'comissao_pendente'
+      RETURNING t.valor
+    )
+    SELECT COALESCE(SUM(valor), 0), COUNT(*)
+    INTO v_valor_comissoes, v_qtd_comissoes
+    FROM pagas;
+  END IF;
+
+  v_total := v_valor_estoque + v_valor_comissoes;
+
+  IF v_total <= 0 THEN
+    -- Zero-priced rows may have been cleared above; there is nothing to credit
+    RETURN jsonb_build_object(
+      'resultado', 'nada_a_pagar',
+      'saldo_final', COALESCE(v_saldo, 0)
+    );
+  END IF;
+
+  -- 3) Credit the balance and record the payment
+  UPDATE public.funcionarios
+  SET saldo = COALESCE(saldo, 0) + v_total
+  WHERE id = p_funcionario_id
+  RETURNING saldo INTO v_saldo;
+
+  INSERT INTO public.historico_pagamentos (funcionario_id, tipo, valor, descricao)
+  VALUES (
+    p_funcionario_id,
+    'estoque_acumulado',
+    v_total,
+    format(
+      'Pagamento Acumulado (Estoque: R$%s + Vendas: R$%s)',
+      to_char(v_valor_estoque, 'FM999999990.00'),
+      to_char(v_valor_comissoes, 'FM999999990.00')
+    )
+  );
+
+  RETURN jsonb_build_object(
+    'resultado', 'pago',
+    'valor_estoque', v_valor_estoque,
+    'valor_comissoes', v_valor_comissoes,
+    'total_pago', v_total,
+    'saldo_final', v_saldo,
+    'itens', v_itens,
+    'comissoes_pagas', v_qtd_comissoes
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.pagar_estoque_funcionario(integer, integer, jsonb, integer[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.pagar_estoque_funcionario(integer, integer, jsonb, integer[]) TO service_role;
@@ -0,0 +1,50 @@
+-- Manual payment (!pagar): increments funcionarios.saldo relative to its current
+-- value and records the transacao in the same transaction. The bot used to
+-- write an absolute saldo computed from a snapshot taken when the command
+-- started, so two admins paying the same person lost one of the payments.
+--
+-- resultado: 'pago' | 'funcionario_nao_encontrado'
+
+CREATE OR REPLACE FUNCTION public.creditar_saldo_funcionario(
+  p_funcionario_id integer,
+  p_empresa_id integer,
+  p_valor numeric,
+  p_descricao text,
+  p_tipo text DEFAULT 'saida'
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_saldo numeric;
+  v_transacao_id integer;
+BEGIN
+  IF p_valor IS NULL OR p_valor <= 0 THEN
+    RAISE EXCEPTION 'Valor de pagamento inválido: %', p_valor;
+  END IF;
+
+  UPDATE public.funcionarios
+  SET saldo = COALESCE(saldo, 0) + p_valor
+  WHERE id = p_funcionario_id
+  RETURNING saldo INTO v_saldo;
+
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('resultado', 'funcionario_nao_encontrado');
+  END IF;
+
+  INSERT INTO public.transacoes (empresa_id, tipo, valor, descricao, funcionario_id)
+  VALUES (p_empresa_id, p_tipo, p_valor, p_descricao, p_funcionario_id)
+  RETURNING id INTO v_transacao_id;
+
+  RETURN jsonb_build_object(
+    'resultado', 'pago',
+    'saldo_final', v_saldo,
+    'transacao_id', v_transacao_id
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.creditar_saldo_funcionario(integer, integer, numeric, text, text) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.creditar_saldo_funcionario(integer, integer, numeric, text, text) TO service_role;
@@ -0,0 +1,169 @@
+-- Running balance per empresa, maintained by a trigger on transacoes in the
+-- same transaction as each insert/update/delete. get_saldo_empresa reads one
+-- row instead of aggregating the whole history (calcular_saldo_empresa) or,
+-- on fallback, pulling every row into Python.
+--
+-- Sign convention (same as the previous fallback): tipo 'entrada' adds,
+-- every other tipo subtracts.
+
+CREATE TABLE IF NOT EXISTS public.empresas_saldo (
+  empresa_id INTEGER PRIMARY KEY REFERENCES public.empresas(id) ON DELETE CASCADE,
+  saldo NUMERIC(14,2) NOT NULL DEFAULT 0,
+  transacoes BIGINT NOT NULL DEFAULT 0,
+  atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  reconciliado_em TIMESTAMPTZ
+);
+
+ALTER TABLE public.empresas_saldo ENABLE ROW LEVEL SECURITY;
+
+REVOKE ALL ON public.empresas_saldo FROM PUBLIC;
+GRANT SELECT ON public.empresas_saldo TO service_role;
+
+DROP POLICY IF EXISTS empresas_saldo_service_role_select ON public.empresas_saldo;
+CREATE POLICY empresas_saldo_service_role_select
+ON public.empresas_saldo
+FOR SELECT
+TO service_role
+USING (true);
+
+CREATE OR REPLACE FUNCTION public._valor_saldo_transacao(p_tipo text, p_valor numeric)
+RETURNS numeric
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT CASE WHEN p_tipo = 'entrada' THEN COALESCE(p_valor, 0) ELSE -COALESCE(p_valor, 0) END;
+$$;
+
+CREATE OR REPLACE FUNCTION public._aplicar_delta_saldo_empresa(p_empresa_id integer, p_delta numeric, p_qtd integer)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_empresa_id IS NULL OR (p_delta = 0 AND p_qtd = 0) THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.empresas_saldo AS s (empresa_id, saldo, transacoes, atualizado_em)
+  VALUES (p_empresa_id, p_delta, p_qtd, NOW())
+  ON CONFLICT (empresa_id) DO UPDATE
+    SET saldo = s.saldo + EXCLUDED.saldo,
+        transacoes = s.transacoes + EXCLUDED.transacoes,
+        atualizado_em = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_transacoes_saldo_empresa()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM public._aplicar_delta_saldo_empresa(
+      NEW.empresa_id, public._valor_saldo_transacao(NEW.tipo, NEW.valor), 1);
+  ELSIF TG_OP = 'DELETE' THEN
+    PERFORM public._aplicar_delta_saldo_empresa(
+      OLD.empresa_id, -public._valor_saldo_transacao(OLD.tipo, OLD.valor), -1);
+  ELSIF NEW.empresa_id IS DISTINCT FROM OLD.empresa_id THEN
+    PERFORM public._aplicar_delta_saldo_empresa(
+      OLD.empresa_id, -public._valor_saldo_transacao(OLD.tipo, OLD.valor), -1);
+    PERFORM public._aplicar_delta_saldo_empresa(
+      NEW.empresa_id, public._valor_saldo_transacao(NEW.tipo, NEW.valor), 1);
+  ELSE
+    -- e.g. comissao_pendente -> comissao_paga keeps the sign: delta is 0 and nothing is written
+    PERFORM public._aplicar_delta_saldo_empresa(
+      NEW.empresa_id,
+      public._valor_saldo_transacao(NEW.tipo, NEW.valor) - public._valor_saldo_transacao(OLD.tipo, OLD.valor),
+      0);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transacoes_saldo_empresa ON public.transacoes;
+CREATE TRIGGER transacoes_saldo_empresa
+AFTER INSERT OR DELETE OR UPDATE OF empresa_id, tipo, valor ON public.transacoes
+FOR EACH ROW
+EXECUTE FUNCTION public.trg_transacoes_saldo_empresa();
+
+-- Backfill (locks transacoes briefly so no insert slips between the sum and the trigger)
+LOCK TABLE public.transacoes IN SHARE MODE;
+
+INSERT INTO public.empresas_saldo (empresa_id, saldo, transacoes, atualizado_em, reconciliado_em)
+SELECT t.empresa_id,
+       SUM(public._valor_saldo_transacao(t.tipo, t.valor)),
+       COUNT(*),
+       NOW(),
+       NOW()
+FROM public.transacoes t
+WHERE t.empresa_id IS NOT NULL
+GROUP BY t.empresa_id
+ON CONFLICT (empresa_id) DO UPDATE
+  SET saldo = EXCLUDED.saldo,
+      transacoes = EXCLUDED.transacoes,
+      atualizado_em = NOW(),
+      reconciliado_em = NOW();
+
+-- Recomputes balances from transacoes and returns the empresas whose stored
+-- balance drifted. With p_corrigir the stored balance is replaced. The summary
+-- row is locked first, so concurrent inserts wait and apply their delta on top.
+CREATE OR REPLACE FUNCTION public.reconciliar_saldo_empresa(
+  p_empresa_id integer DEFAULT NULL,
+  p_corrigir boolean DEFAULT true
+)
+RETURNS TABLE(empresa_id integer, saldo_registrado numeric, saldo_calculado numeric, diferenca numeric)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_empresa integer;
+  v_registrado numeric;
+  v_qtd_registrada bigint;
+  v_calculado numeric;
+  v_qtd bigint;
+BEGIN
+  FOR v_empresa IN
+    SELECT e.id
+    FROM public.empresas e
+    WHERE p_empresa_id IS NULL OR e.id = p_empresa_id
+    ORDER BY e.id
+  LOOP
+    SELECT s.saldo, s.transacoes
+    INTO v_registrado, v_qtd_registrada
+    FROM public.empresas_saldo s
+    WHERE s.empresa_id = v_empresa
+    FOR UPDATE;
+
+    SELECT COALESCE(SUM(public._valor_saldo_transacao(t.tipo, t.valor)), 0), COUNT(*)
+    INTO v_calculado, v_qtd
+    FROM public.transacoes t
+    WHERE t.empresa_id = v_empresa;
+
+    IF COALESCE(v_registrado, 0) <> v_calculado OR COALESCE(v_qtd_registrada, 0) <> v_qtd THEN
+      empresa_id := v_empresa;
+      saldo_registrado := COALESCE(v_registrado, 0);
+      saldo_calculado := v_calculado;
+      diferenca := v_calculado - COALESCE(v_registrado, 0);
+      RETURN NEXT;
+    END IF;
+
+    IF p_corrigir THEN
+      INSERT INTO public.empresas_saldo AS s (empresa_id, saldo, transacoes, atualizado_em, reconciliado_em)
+      VALUES (v_empresa, v_calculado, v_qtd, NOW(), NOW())
+      ON CONFLICT ON CONSTRAINT empresas_saldo_pkey DO UPDATE
+        SET saldo = EXCLUDED.saldo,
+            transacoes = EXCLUDED.transacoes,
+            atualizado_em = NOW(),
+            reconciliado_em = NOW();
+    END IF;
+  END LOOP;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public._aplicar_delta_saldo_empresa(integer, numeric, integer) FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.reconciliar_saldo_empresa(integer, boolean) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.reconciliar_saldo_empresa(integer, boolean) TO service_role;
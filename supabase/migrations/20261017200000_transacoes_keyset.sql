@@ -0,0 +1,55 @@
+-- Keyset (cursor) pagination over an empresa's ledger for !extrato and the
+-- dashboard. Pages are ordered by (data_criacao, id) DESC and continue from the
+-- last row seen, so page N costs the same index range scan as page 1 (no OFFSET).
+-- Optional filters: tipo and funcionario_id, each with a matching index.
+
+CREATE INDEX IF NOT EXISTS idx_transacoes_empresa_data_id
+  ON public.transacoes (empresa_id, data_criacao DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transacoes_empresa_tipo_data_id
+  ON public.transacoes (empresa_id, tipo, data_criacao DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transacoes_empresa_funcionario_data_id
+  ON public.transacoes (empresa_id, funcionario_id, data_criacao DESC, id DESC);
+
+CREATE OR REPLACE FUNCTION public.listar_transacoes_empresa(
+  p_empresa_id integer,
+  p_limite integer DEFAULT 10,
+  p_cursor_data timestamptz DEFAULT NULL,
+  p_cursor_id bigint DEFAULT NULL,
+  p_tipo text DEFAULT NULL,
+  p_funcionario_id integer DEFAULT NULL
+)
+RETURNS TABLE(
+  id bigint,
+  tipo text,
+  valor numeric,
+  descricao text,
+  funcionario_id integer,
+  funcionario_nome text,
+  data_criacao timestamptz
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT t.id::bigint,
+         t.tipo::text,
+         t.valor::numeric,
+         t.descricao::text,
+         t.funcionario_id::integer,
+         f.nome::text,
+         t.data_criacao::timestamptz
+  FROM public.transacoes t
+  LEFT JOIN public.funcionarios f ON f.id = t.funcionario_id
+  WHERE t.empresa_id = p_empresa_id
+    AND (p_tipo IS NULL OR t.tipo = p_tipo)
+    AND (p_funcionario_id IS NULL OR t.funcionario_id = p_funcionario_id)
+    AND (p_cursor_data IS NULL OR (t.data_criacao, t.id) < (p_cursor_data, p_cursor_id))
+  ORDER BY t.data_criacao DESC, t.id DESC
+  LIMIT LEAST(GREATEST(COALESCE(p_limite, 10), 1), 101);
+$$;
+
+REVOKE ALL ON FUNCTION public.listar_transacoes_empresa(integer, integer, timestamptz, bigint, text, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.listar_transacoes_empresa(integer, integer, timestamptz, bigint, text, integer) TO service_role;
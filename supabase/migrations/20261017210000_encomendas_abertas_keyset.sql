@@ -0,0 +1,144 @@
+-- Open orders browser (!encomendas): keyset pagination over the open orders of
+-- an empresa plus a per-empresa counter, so the bot fetches only the page being
+-- viewed and still shows the total.
+--
+-- Order: (status, data_criacao, id) ascending -> 'em_andamento' before
+-- 'pendente', oldest first inside each status.
+
+CREATE INDEX IF NOT EXISTS idx_encomendas_abertas_keyset
+  ON public.encomendas (empresa_id, status, data_criacao, id)
+  WHERE status IN ('pendente', 'em_andamento');
+
+CREATE TABLE IF NOT EXISTS public.empresas_encomendas_abertas (
+  empresa_id INTEGER PRIMARY KEY REFERENCES public.empresas(id) ON DELETE CASCADE,
+  pendentes INTEGER NOT NULL DEFAULT 0,
+  em_andamento INTEGER NOT NULL DEFAULT 0,
+  atualizado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.empresas_encomendas_abertas ENABLE ROW LEVEL SECURITY;
+
+REVOKE ALL ON public.empresas_encomendas_abertas FROM PUBLIC;
+GRANT SELECT ON public.empresas_encomendas_abertas TO service_role;
+
+DROP POLICY IF EXISTS empresas_encomendas_abertas_service_role_select ON public.empresas_encomendas_abertas;
+CREATE POLICY empresas_encomendas_abertas_service_role_select
+ON public.empresas_encomendas_abertas
+FOR SELECT
+TO service_role
+USING (true);
+
+CREATE OR REPLACE FUNCTION public._contar_encomenda_aberta(p_empresa_id integer, p_status text, p_delta integer)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_empresa_id IS NULL OR p_status NOT IN ('pendente', 'em_andamento') THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.empresas_encomendas_abertas AS c (empresa_id, pendentes, em_andamento, atualizado_em)
+  VALUES (
+    p_empresa_id,
+    CASE WHEN p_status = 'pendente' THEN GREATEST(p_delta, 0) ELSE 0 END,
+    CASE WHEN p_status = 'em_andamento' THEN GREATEST(p_delta, 0) ELSE 0 END,
+    NOW()
+  )
+  ON CONFLICT (empresa_id) DO UPDATE
+    SET pendentes = GREATEST(c.pendentes + CASE WHEN p_status = 'pendente' THEN p_delta ELSE 0 END, 0),
+        em_andamento = GREATEST(c.em_andamento + CASE WHEN p_status = 'em_andamento' THEN p_delta ELSE 0 END, 0),
+        atualizado_em = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_encomendas_contagem_abertas()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM public._contar_encomenda_aberta(OLD.empresa_id, OLD.status, -1);
+  END IF;
+  IF TG_OP IN ('UPDATE', 'INSERT') THEN
+    PERFORM public._contar_encomenda_aberta(NEW.empresa_id, NEW.status, 1);
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS encomendas_contagem_abertas ON public.encomendas;
+CREATE TRIGGER encomendas_contagem_abertas
+AFTER INSERT OR DELETE OR UPDATE OF status, empresa_id ON public.encomendas
+FOR EACH ROW
+EXECUTE FUNCTION public.trg_encomendas_contagem_abertas();
+
+-- Backfill (SHARE lock: no order changes between the count and the trigger)
+LOCK TABLE public.encomendas IN SHARE MODE;
+
+INSERT INTO public.empresas_encomendas_abertas (empresa_id, pendentes, em_andamento, atualizado_em)
+SELECT e.empresa_id,
+       COUNT(*) FILTER (WHERE e.status = 'pendente'),
+       COUNT(*) FILTER (WHERE e.status = 'em_andamento'),
+       NOW()
+FROM public.encomendas e
+WHERE e.empresa_id IS NOT NULL
+  AND e.status IN ('pendente', 'em_andamento')
+GROUP BY e.empresa_id
+ON CONFLICT (empresa_id) DO UPDATE
+  SET pendentes = EXCLUDED.pendentes,
+      em_andamento = EXCLUDED.em_andamento,
+      atualizado_em = NOW();
+
+-- One page of open orders + the total from the counter table.
+-- Returns up to p_limite + 1 rows in 'itens' (the extra row tells the caller a
+-- next page exists). The cursor is the (status, data_criacao, id) of the last row.
+CREATE OR REPLACE FUNCTION public.listar_encomendas_abertas(
+  p_empresa_id integer,
+  p_limite integer DEFAULT 5,
+  p_cursor_status text DEFAULT NULL,
+  p_cursor_data timestamptz DEFAULT NULL,
+  p_cursor_id integer DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT jsonb_build_object(
+    'total', COALESCE((
+      SELECT c.pendentes + c.em_andamento
+      FROM public.empresas_encomendas_abertas c
+      WHERE c.empresa_id = p_empresa_id
+    ), 0),
+    'itens', COALESCE((
+      SELECT jsonb_agg(to_jsonb(pagina) ORDER BY pagina.status, pagina.data_criacao, pagina.id)
+      FROM (
+        SELECT e.id,
+               e.comprador,
+               e.itens_json,
+               e.valor_total,
+               e.status,
+               e.data_criacao,
+               f.nome AS responsavel
+        FROM public.encomendas e
+        LEFT JOIN public.funcionarios f ON f.id = e.funcionario_responsavel_id
+        WHERE e.empresa_id = p_empresa_id
+          AND e.status IN ('pendente', 'em_andamento')
+          AND (
+            p_cursor_id IS NULL
+            OR (e.status, e.data_criacao, e.id) > (p_cursor_status, p_cursor_data, p_cursor_id)
+          )
+        ORDER BY e.status, e.data_criacao, e.id
+        LIMIT LEAST(GREATEST(COALESCE(p_limite, 5), 1), 51)
+      ) pagina
+    ), '[]'::jsonb)
+  );
+$$;
+
+REVOKE ALL ON FUNCTION public.listar_encomendas_abertas(integer, integer, text, timestamptz, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.listar_encomendas_abertas(integer, integer, text, timestamptz, integer) TO service_role;
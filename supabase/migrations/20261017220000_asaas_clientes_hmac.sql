@@ -0,0 +1,9 @@
+-- asaas_clientes.cpf_cnpj_hash is now an HMAC-SHA256 keyed with a server-side
+-- secret (ASAAS_CUSTOMER_HASH_KEY). The rows written with the plain SHA-256
+-- are reversible and no longer match any lookup: drop them. The mapping is a
+-- cache, so the next purchase resolves the customer on Asaas again.
+
+DELETE FROM public.asaas_clientes;
+
+COMMENT ON COLUMN public.asaas_clientes.cpf_cnpj_hash IS
+  'HMAC-SHA256 of the CPF/CNPJ digits keyed with ASAAS_CUSTOMER_HASH_KEY';
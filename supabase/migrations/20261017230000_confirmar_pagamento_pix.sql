@@ -0,0 +1,90 @@
+-- Idempotent PIX confirmation. Asaas sends PAYMENT_RECEIVED and PAYMENT_CONFIRMED
+-- for the same payment and the webhook queue runs several workers, so two
+-- confirmations of one payment can run at once. The payment row is locked
+-- first: the second call waits, then sees 'pago' and does nothing. The
+-- subscription write and the 'pago' mark commit together, so a failed attempt
+-- leaves the payment pending for the retry.
+--
+-- resultado: 'pago' | 'ja_processado' | 'pendente_ativacao'
+--          | 'nao_encontrado' | 'plano_nao_encontrado'
+
+-- One subscription per guild (the bot and the trial RPC already assume it):
+-- keep the row that expires last and make guild_id upsertable. A NULL
+-- data_expiracao sorts lowest; a plain row comparison yields NULL there, both
+-- rows would survive and the unique index below would fail.
+DELETE FROM public.assinaturas a
+USING public.assinaturas b
+WHERE a.guild_id = b.guild_id
+  AND (COALESCE(a.data_expiracao, '-infinity'::timestamptz), a.id)
+    < (COALESCE(b.data_expiracao, '-infinity'::timestamptz), b.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_assinaturas_guild_id
+  ON public.assinaturas (guild_id);
+
+CREATE OR REPLACE FUNCTION public.confirmar_pagamento_pix(p_pix_id text)
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_pagamento record;
+  v_duracao integer;
+  v_expiracao timestamptz;
+BEGIN
+  SELECT p.guild_id, p.plano_id, p.discord_id, p.status
+  INTO v_pagamento
+  FROM public.pagamentos_pix p
+  WHERE p.pix_id = p_pix_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('resultado', 'nao_encontrado');
+  END IF;
+
+  IF v_pagamento.status = 'pago' THEN
+    RETURN jsonb_build_object('resultado', 'ja_processado');
+  END IF;
+
+  IF v_pagamento.guild_id = 'pending_activation' THEN
+    UPDATE public.pagamentos_pix SET status = 'pago' WHERE pix_id = p_pix_id;
+    RETURN jsonb_build_object('resultado', 'pendente_ativacao');
+  END IF;
+
+  SELECT pl.duracao_dias
+  INTO v_duracao
+  FROM public.planos pl
+  WHERE pl.id = v_pagamento.plano_id;
+
+  IF NOT FOUND THEN
+    RETURN jsonb_build_object('resultado', 'plano_nao_encontrado');
+  END IF;
+
+  v_expiracao := NOW() + make_interval(days => v_duracao);
+
+  INSERT INTO public.assinaturas AS a (
+    guild_id, plano_id, data_inicio, data_expiracao, status, pagador_discord_id
+  )
+  VALUES (
+    v_pagamento.guild_id, v_pagamento.plano_id, NOW(), v_expiracao, 'ativa', v_pagamento.discord_id
+  )
+  ON CONFLICT (guild_id) DO UPDATE
+    SET plano_id = EXCLUDED.plano_id,
+        data_inicio = EXCLUDED.data_inicio,
+        data_expiracao = EXCLUDED.data_expiracao,
+        status = EXCLUDED.status,
+        pagador_discord_id = EXCLUDED.pagador_discord_id,
+        updated_at = NOW();
+
+  UPDATE public.pagamentos_pix SET status = 'pago' WHERE pix_id = p_pix_id;
+
+  RETURN jsonb_build_object(
+    'resultado', 'pago',
+    'guild_id', v_pagamento.guild_id,
+    'data_expiracao', v_expiracao
+  );
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.confirmar_pagamento_pix(text) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.confirmar_pagamento_pix(text) TO service_role;
@@ -0,0 +1,74 @@
+-- reconciliar_saldo_empresa now handles one empresa per call, so each call is
+-- its own transaction. The old version looped over every empresa in a single
+-- RPC and held FOR UPDATE on each empresas_saldo row until the loop finished.
+-- Every transacoes insert, through the trigger, waited for the whole reconcile.
+-- The caller (scripts/reconciliar_saldos.py) now loops over the ids.
+--
+-- The summary row is created first when it is missing, so the FOR UPDATE lock
+-- always exists and a concurrent first insert waits instead of racing the recount.
+-- A missing row already reads as 0 (get_saldo_empresa), so the placeholder does
+-- not change what the bot shows.
+
+DROP FUNCTION IF EXISTS public.reconciliar_saldo_empresa(integer, boolean);
+
+CREATE FUNCTION public.reconciliar_saldo_empresa(
+  p_empresa_id integer,
+  p_corrigir boolean DEFAULT true
+)
+RETURNS TABLE(empresa_id integer, saldo_registrado numeric, saldo_calculado numeric, diferenca numeric)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_registrado numeric;
+  v_qtd_registrada bigint;
+  v_calculado numeric;
+  v_qtd bigint;
+BEGIN
+  IF p_empresa_id IS NULL THEN
+    RAISE EXCEPTION 'p_empresa_id é obrigatório (reconcilie uma empresa por chamada)';
+  END IF;
+
+  INSERT INTO public.empresas_saldo (empresa_id, saldo, transacoes, atualizado_em)
+  SELECT e.id, 0, 0, NOW()
+  FROM public.empresas e
+  WHERE e.id = p_empresa_id
+  ON CONFLICT ON CONSTRAINT empresas_saldo_pkey DO NOTHING;
+
+  SELECT s.saldo, s.transacoes
+  INTO v_registrado, v_qtd_registrada
+  FROM public.empresas_saldo s
+  WHERE s.empresa_id = p_empresa_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN;  -- empresa inexistente
+  END IF;
+
+  SELECT COALESCE(SUM(public._valor_saldo_transacao(t.tipo, t.valor)), 0), COUNT(*)
+  INTO v_calculado, v_qtd
+  FROM public.transacoes t
+  WHERE t.empresa_id = p_empresa_id;
+
+  IF v_registrado <> v_calculado OR v_qtd_registrada <> v_qtd THEN
+    empresa_id := p_empresa_id;
+    saldo_registrado := v_registrado;
+    saldo_calculado := v_calculado;
+    diferenca := v_calculado - v_registrado;
+    RETURN NEXT;
+  END IF;
+
+  IF p_corrigir THEN
+    UPDATE public.empresas_saldo s
+    SET saldo = v_calculado,
+        transacoes = v_qtd,
+        atualizado_em = NOW(),
+        reconciliado_em = NOW()
+    WHERE s.empresa_id = p_empresa_id;
+  END IF;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.reconciliar_saldo_empresa(integer, boolean) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.reconciliar_saldo_empresa(integer, boolean) TO service_role;
@@ -0,0 +1,73 @@
+-- listar_transacoes_empresa: build the predicate from the filters actually
+-- supplied. The SQL version used catch-all predicates such as
+-- (p_cursor_data IS NULL OR (t.data_criacao, t.id) < (...)) and
+-- (p_tipo IS NULL OR t.tipo = p_tipo). A SECURITY DEFINER function with
+-- SET search_path is never inlined, so those got one generic plan. There the
+-- cursor could not be an index condition: every page scanned all rows newer than
+-- the cursor, which is the cost of OFFSET. The tipo/funcionario indexes were
+-- unusable for the same reason.
+--
+-- EXECUTE is planned on every call with the real values, so a deep page is one
+-- index seek, e.g. with a cursor and a tipo:
+--   Index Scan using idx_transacoes_empresa_tipo_data_id
+--     Index Cond: ((empresa_id = $1) AND (tipo = $5)
+--                  AND (ROW(data_criacao, id) < ROW($3, $4)))
+
+CREATE OR REPLACE FUNCTION public.listar_transacoes_empresa(
+  p_empresa_id integer,
+  p_limite integer DEFAULT 10,
+  p_cursor_data timestamptz DEFAULT NULL,
+  p_cursor_id bigint DEFAULT NULL,
+  p_tipo text DEFAULT NULL,
+  p_funcionario_id integer DEFAULT NULL
+)
+RETURNS TABLE(
+  id bigint,
+  tipo text,
+  valor numeric,
+  descricao text,
+  funcionario_id integer,
+  funcionario_nome text,
+  data_criacao timestamptz
+)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_sql text := '
+    SELECT t.id::bigint,
+           t.tipo::text,
+           t.valor::numeric,
+           t.descricao::text,
+           t.funcionario_id::integer,
+           f.nome::text,
+           t.data_criacao::timestamptz
+    FROM public.transacoes t
+    LEFT JOIN public.funcionarios f ON f.id = t.funcionario_id
+    WHERE t.empresa_id = $1';
+BEGIN
+  IF p_tipo IS NOT NULL THEN
+    v_sql := v_sql || ' AND t.tipo = $5';
+  END IF;
+  IF p_funcionario_id IS NOT NULL THEN
+    v_sql := v_sql || ' AND t.funcionario_id = $6';
+  END IF;
+  IF p_cursor_data IS NOT NULL THEN
+    v_sql := v_sql || ' AND (t.data_criacao, t.id) < ($3, $4)';
+  END IF;
+  v_sql := v_sql || ' ORDER BY t.data_criacao DESC, t.id DESC LIMIT $2';
+
+  RETURN QUERY EXECUTE v_sql
+    USING p_empresa_id,
+          LEAST(GREATEST(COALESCE(p_limite, 10), 1), 101),
+          p_cursor_data,
+          p_cursor_id,
+          p_tipo,
+          p_funcionario_id;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.listar_transacoes_empresa(integer, integer, timestamptz, bigint, text, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.listar_transacoes_empresa(integer, integer, timestamptz, bigint, text, integer) TO service_role;
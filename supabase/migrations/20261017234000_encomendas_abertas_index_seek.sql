@@ -0,0 +1,171 @@
+-- Open orders browser, follow-up to 20261017210000:
+--
+-- 1) listar_encomendas_abertas builds its predicate from the arguments actually
+--    supplied (same fix as listar_transacoes_empresa). The catch-all
+--    (p_cursor_id IS NULL OR (status, data_criacao, id) > (...)) got a generic
+--    plan in which the cursor was not an index condition, so deep pages
+--    scanned every earlier open order. With EXECUTE the plan is made per call:
+--      Index Scan using idx_encomendas_abertas_keyset
+--        Index Cond: ((empresa_id = $1)
+--                     AND (ROW(status, data_criacao, id) > ROW($3, $4, $5)))
+--
+-- 2) The counter no longer clamps at 0. A negative value means the counter
+--    drifted, and it must show up instead of being hidden.
+--    reconciliar_encomendas_abertas recounts one empresa per call and reports
+--    the drift, like reconciliar_saldo_empresa.
+
+CREATE OR REPLACE FUNCTION public._contar_encomenda_aberta(p_empresa_id integer, p_status text, p_delta integer)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_empresa_id IS NULL OR p_status NOT IN ('pendente', 'em_andamento') THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO public.empresas_encomendas_abertas AS c (empresa_id, pendentes, em_andamento, atualizado_em)
+  VALUES (
+    p_empresa_id,
+    CASE WHEN p_status = 'pendente' THEN p_delta ELSE 0 END,
+    CASE WHEN p_status = 'em_andamento' THEN p_delta ELSE 0 END,
+    NOW()
+  )
+  ON CONFLICT (empresa_id) DO UPDATE
+    SET pendentes = c.pendentes + EXCLUDED.pendentes,
+        em_andamento = c.em_andamento + EXCLUDED.em_andamento,
+        atualizado_em = NOW();
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.listar_encomendas_abertas(
+  p_empresa_id integer,
+  p_limite integer DEFAULT 5,
+  p_cursor_status text DEFAULT NULL,
+  p_cursor_data timestamptz DEFAULT NULL,
+  p_cursor_id integer DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_total integer;
+  v_itens jsonb;
+  v_sql text := '
+    SELECT COALESCE(jsonb_agg(to_jsonb(pagina) ORDER BY pagina.status, pagina.data_criacao, pagina.id), ''[]''::jsonb)
+    FROM (
+      SELECT e.id,
+             e.comprador,
+             e.itens_json,
+             e.valor_total,
+             e.status,
+             e.data_criacao,
+             f.nome AS responsavel
+      FROM public.encomendas e
+      LEFT JOIN public.funcionarios f ON f.id = e.funcionario_responsavel_id
+      WHERE e.empresa_id = $1
+        AND e.status IN (''pendente'', ''em_andamento'')';
+BEGIN
+  IF p_cursor_id IS NOT NULL THEN
+    v_sql := v_sql || ' AND (e.status, e.data_criacao, e.id) > ($3, $4, $5)';
+  END IF;
+  v_sql := v_sql || ' ORDER BY e.status, e.data_criacao, e.id LIMIT $2) pagina';
+
+  EXECUTE v_sql
+    INTO v_itens
+    USING p_empresa_id,
+          LEAST(GREATEST(COALESCE(p_limite, 5), 1), 51),
+          p_cursor_status,
+          p_cursor_data,
+          p_cursor_id;
+
+  SELECT c.pendentes + c.em_andamento
+  INTO v_total
+  FROM public.empresas_encomendas_abertas c
+  WHERE c.empresa_id = p_empresa_id;
+
+  RETURN jsonb_build_object('total', COALESCE(v_total, 0), 'itens', v_itens);
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public.listar_encomendas_abertas(integer, integer, text, timestamptz, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.listar_encomendas_abertas(integer, integer, text, timestamptz, integer) TO service_role;
+
+-- Recounts the open orders of one empresa and returns a row when the counter
+-- drifted. With p_corrigir the counter is replaced by the recount. The counter
+-- row is created if missing and locked first, so a concurrent order change
+-- waits and applies its delta on top of the corrected value.
+CREATE OR REPLACE FUNCTION public.reconciliar_encomendas_abertas(
+  p_empresa_id integer,
+  p_corrigir boolean DEFAULT true
+)
+RETURNS TABLE(
+  empresa_id integer,
+  pendentes_registrado integer,
+  pendentes_calculado integer,
+  em_andamento_registrado integer,
+  em_andamento_calculado integer
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_pendentes integer;
+  v_em_andamento integer;
+  v_pendentes_calc integer;
+  v_em_andamento_calc integer;
+BEGIN
+  IF p_empresa_id IS NULL THEN
+    RAISE EXCEPTION 'p_empresa_id é obrigatório (reconcilie uma empresa por chamada)';
+  END IF;
+
+  INSERT INTO public.empresas_encomendas_abertas (empresa_id, pendentes, em_andamento, atualizado_em)
+  SELECT e.id, 0, 0, NOW()
+  FROM public.empresas e
+  WHERE e.id = p_empresa_id
+  ON CONFLICT ON CONSTRAINT empresas_encomendas_abertas_pkey DO NOTHING;
+
+  SELECT c.pendentes, c.em_andamento
+  INTO v_pendentes, v_em_andamento
+  FROM public.empresas_encomendas_abertas c
+  WHERE c.empresa_id = p_empresa_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN;  -- empresa inexistente
+  END IF;
+
+  SELECT COUNT(*) FILTER (WHERE e.status = 'pendente'),
+         COUNT(*) FILTER (WHERE e.status = 'em_andamento')
+  INTO v_pendentes_calc, v_em_andamento_calc
+  FROM public.encomendas e
+  WHERE e.empresa_id = p_empresa_id
+    AND e.status IN ('pendente', 'em_andamento');
+
+  IF v_pendentes <> v_pendentes_calc OR v_em_andamento <> v_em_andamento_calc THEN
+    empresa_id := p_empresa_id;
+    pendentes_registrado := v_pendentes;
+    pendentes_calculado := v_pendentes_calc;
+    em_andamento_registrado := v_em_andamento;
+    em_andamento_calculado := v_em_andamento_calc;
+    RETURN NEXT;
+  END IF;
+
+  IF p_corrigir THEN
+    UPDATE public.empresas_encomendas_abertas c
+    SET pendentes = v_pendentes_calc,
+        em_andamento = v_em_andamento_calc,
+        atualizado_em = NOW()
+    WHERE c.empresa_id = p_empresa_id;
+  END IF;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION public._contar_encomenda_aberta(integer, text, integer) FROM PUBLIC;
+REVOKE ALL ON FUNCTION public.reconciliar_encomendas_abertas(integer, boolean) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.reconciliar_encomendas_abertas(integer, boolean) TO service_role;
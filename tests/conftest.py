@@ -64,3 +64,12 @@ def mock_config(mock_supabase):
             except AttributeError:
                 pass
         yield m
+
+
+@pytest.fixture(autouse=True)
+def limpar_caches_globais():
+    """Isola os caches em memória entre testes."""
+    from database.cache import limpar_cache_global
+    limpar_cache_global()
+    yield
+    limpar_cache_global()
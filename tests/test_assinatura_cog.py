@@ -98,7 +98,7 @@ async def test_superadmin_add_tester(cog, mock_ctx, mock_env):
 async def test_validar_pagamento_pendente(cog, mock_ctx):
     # Need to mock local imports inside validarpagamento
     with patch('cogs.assinatura.buscar_pagamento_pendente_usuario', new_callable=AsyncMock) as mock_buscar, \
-         patch('aiohttp.ClientSession') as MockSession, \
+         patch('cogs.assinatura.get_http_session') as MockSession, \
          patch('cogs.assinatura.ASAAS_API_KEY', "key"), \
          patch('cogs.assinatura.ativar_assinatura_servidor', new_callable=AsyncMock) as mock_ativar, \
          patch('cogs.assinatura.supabase') as mock_supabase:
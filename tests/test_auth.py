@@ -0,0 +1,111 @@
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, patch
+
+import api_pkg.auth as auth
+
+SECRET = "segredo-de-teste-com-tamanho-suficiente-32b"
+
+
+def _token(exp_delta: int = 3600, provider_id: str | None = "555", secret: str = SECRET) -> str:
+    claims = {
+        "sub": "user-uuid",
+        "email": "user@example.com",
+        "aud": "authenticated",
+        "role": "authenticated",
+        "exp": int(time.time()) + exp_delta,
+        "user_metadata": {"provider_id": provider_id} if provider_id else {},
+    }
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+@pytest.fixture
+def local_auth(monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", SECRET)
+    monkeypatch.setattr(auth, "AUTH_TOKEN_VERIFICATION", "auto")
+    with patch.object(auth, "_fetch_user_from_token", new_callable=AsyncMock) as remote, \
+         patch.object(auth, "_check_superadmin", new_callable=AsyncMock) as superadmin:
+        superadmin.return_value = False
+        yield remote
+
+
+@pytest.mark.asyncio
+async def test_token_valido_verificado_localmente(local_auth):
+    ctx = await auth.require_auth_context(f"Bearer {_token()}")
+
+    assert ctx.discord_id == "555"
+    assert ctx.user_id == "user-uuid"
+    assert ctx.email == "user@example.com"
+    local_auth.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_token_expirado_ou_assinatura_invalida_rejeitado(local_auth):
+    with pytest.raises(HTTPException) as exc:
+        await auth.require_auth_context(f"Bearer {_token(exp_delta=-60)}")
+    assert exc.value.status_code == 401
+
+    with pytest.raises(HTTPException) as exc:
+        await auth.require_auth_context(f"Bearer {_token(secret='outro-segredo-com-tamanho-suficiente-32')}")
+    assert exc.value.status_code == 401
+    local_auth.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_claims_sem_discord_id_usam_verificacao_remota(local_auth):
+    local_auth.return_value = {
+        "id": "user-uuid",
+        "identities": [{"provider": "discord", "id": "777"}],
+    }
+
+    ctx = await auth.require_auth_context(f"Bearer {_token(provider_id=None)}")
+
+    assert ctx.discord_id == "777"
+    local_auth.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_sem_segredo_configurado_usa_verificacao_remota(local_auth, monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWT_SECRET", None)
+    local_auth.return_value = {"id": "user-uuid", "user_metadata": {"provider_id": "555"}}
+
+    ctx = await auth.require_auth_context(f"Bearer {_token()}")
+
+    assert ctx.discord_id == "555"
+    local_auth.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_acessos_consultados_uma_vez_e_cacheados(mock_supabase, monkeypatch):
+    monkeypatch.setattr(auth, "supabase", mock_supabase)
+    qb = mock_supabase.table.return_value
+    qb.execute.return_value.data = [
+        {"id": 1, "role": "admin", "guild_id": "100", "ativo": True},
+        {"id": 2, "role": "funcionario", "guild_id": "200", "ativo": True},
+    ]
+
+    assert await auth._check_superadmin("555") is False
+    assert (await auth.get_guild_access("555", "100"))["role"] == "admin"
+    assert (await auth.get_guild_access("555", "200"))["role"] == "funcionario"
+    assert await auth.get_guild_access("555", "300") is None
+
+    assert qb.execute.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_alterar_role_invalida_cache_de_acessos(mock_supabase, mock_config, monkeypatch):
+    from database import atualizar_role_usuario_frontend
+
+    monkeypatch.setattr(auth, "supabase", mock_supabase)
+    qb = mock_supabase.table.return_value
+    qb.execute.return_value.data = [{"id": 1, "role": "funcionario", "guild_id": "100", "ativo": True}]
+    assert (await auth.get_guild_access("555", "100"))["role"] == "funcionario"
+
+    qb.execute.return_value.data = [{"id": 1, "role": "admin", "guild_id": "100", "ativo": True, "discord_id": "555"}]
+    assert await atualizar_role_usuario_frontend(1, "admin") is True
+
+    assert (await auth.get_guild_access("555", "100"))["role"] == "admin"
+    assert qb.execute.await_count == 3
@@ -0,0 +1,90 @@
+import aiohttp
+import time
+
+import pytest
+from discord.ext import commands
+from unittest.mock import MagicMock
+
+import bot_metrics
+from observability import render_metrics
+
+
+def _ctx(nome='produzir', cog='Produção', falhou=False):
+    ctx = MagicMock()
+    ctx.command.qualified_name = nome
+    ctx.cog.qualified_name = cog
+    ctx.command_failed = falhou
+    return ctx
+
+
+@pytest.mark.asyncio
+async def test_latencia_e_resultado_por_comando():
+    ctx = _ctx()
+    await bot_metrics._antes_do_comando(ctx)
+    await bot_metrics._depois_do_comando(ctx)
+
+    ctx_erro = _ctx(falhou=True)
+    await bot_metrics._antes_do_comando(ctx_erro)
+    await bot_metrics._depois_do_comando(ctx_erro)
+
+    metricas = render_metrics()
+    assert 'bot_command_duration_seconds_count{cog="Produção",command="produzir"}' in metricas
+    assert 'bot_commands_total{cog="Produção",command="produzir",status="ok"}' in metricas
+    assert 'bot_commands_total{cog="Produção",command="produzir",status="error"}' in metricas
+
+
+def test_erros_checks_e_bloqueios():
+    ctx = _ctx('caixa', 'Financeiro')
+    bot_metrics.registrar_erro_comando(ctx, commands.CommandInvokeError(ValueError('x')))
+    bot_metrics.registrar_erro_comando(ctx, commands.CheckFailure())
+    bot_metrics.registrar_bloqueio_assinatura(ctx, 'sem_assinatura')
+
+    metricas = render_metrics()
+    assert 'bot_command_errors_total{cog="Financeiro",command="caixa",error="ValueError"}' in metricas
+    assert 'bot_check_failures_total{check="CheckFailure",cog="Financeiro",command="caixa"}' in metricas
+    assert 'bot_subscription_blocks_total{cog="Financeiro",command="caixa",reason="sem_assinatura"}' in metricas
+
+
+@pytest.mark.asyncio
+async def test_endpoint_de_metricas_do_bot(unused_tcp_port):
+    await bot_metrics.iniciar_servidor_metricas('127.0.0.1', unused_tcp_port)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'http://127.0.0.1:{unused_tcp_port}/metrics') as resp:
+                assert resp.status == 200
+                assert '# TYPE bot_commands_total counter' in await resp.text()
+    finally:
+        await bot_metrics.parar_servidor_metricas()
+
+
+def test_linha_do_tempo_de_inicializacao():
+    linha = bot_metrics.LinhaDoTempoInicializacao(time.perf_counter() - 1.0)
+    linha.marcar('imports')
+    linha.marcar('cog_load')
+    linha.concluir()
+    linha.concluir()  # reconexões não republicam o total
+
+    assert [fase for fase, _ in linha.fases] == ['imports', 'cog_load']
+    assert linha.fases[0][1] >= 1.0
+    assert linha.tem_fase('cog_load') and not linha.tem_fase('ready')
+
+    metricas = render_metrics()
+    assert 'bot_startup_phase_seconds{phase="imports"}' in metricas
+    assert 'bot_startup_seconds ' in metricas
+
+
+def test_metricas_por_shard():
+    bot = MagicMock()
+    bot.guilds = [MagicMock(shard_id=0), MagicMock(shard_id=1), MagicMock(shard_id=1)]
+    bot.shards = {
+        0: MagicMock(latency=0.05, is_closed=MagicMock(return_value=False)),
+        1: MagicMock(latency=float('nan'), is_closed=MagicMock(return_value=True)),
+    }
+    bot_metrics.coletar_metricas_shards(bot)
+
+    metricas = render_metrics()
+    assert 'bot_shard_latency_seconds{shard="0"} 0.05' in metricas
+    assert 'bot_shard_latency_seconds{shard="1"}' not in metricas
+    assert 'bot_shard_guilds{shard="1"} 2' in metricas
+    assert 'bot_shard_up{shard="0"} 1' in metricas
+    assert 'bot_shard_up{shard="1"} 0' in metricas
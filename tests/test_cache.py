@@ -0,0 +1,258 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from unittest.mock import AsyncMock, MagicMock
+
+from config import assinaturas_cache, produtos_cache, empresas_guild_cache
+from database import (
+    get_empresas_by_guild,
+    atualizar_modo_pagamento,
+    verificar_assinatura_servidor,
+    limpar_cache_assinatura,
+    get_produtos_empresa,
+    configurar_produto_empresa,
+    aplicar_comissao_produtos,
+    configurar_produtos_empresa_lote,
+    limpar_cache_produtos,
+)
+
+
+def _assinatura(ativa: bool, dias: int = 10) -> dict:
+    expiracao = datetime.now(timezone.utc) + timedelta(days=dias)
+    return {
+        'ativa': ativa,
+        'status': 'ativa' if ativa else 'expirada',
+        'dias_restantes': max(dias, 0),
+        'data_expiracao': expiracao.isoformat(),
+        'plano_nome': 'Mensal',
+        'tipo': 'pago',
+    }
+
+
+@pytest.mark.asyncio
+async def test_assinatura_ativa_servida_do_cache(mock_supabase, mock_config):
+    query_builder = mock_supabase.rpc.return_value
+    query_builder.execute.return_value.data = [_assinatura(True, dias=10)]
+
+    primeira = await verificar_assinatura_servidor('111')
+    segunda = await verificar_assinatura_servidor('111')
+
+    assert primeira['ativa'] is True
+    assert segunda['ativa'] is True
+    assert segunda['dias_restantes'] == 10
+    assert mock_supabase.rpc.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_assinatura_negativa_tambem_cacheada(mock_supabase, mock_config):
+    query_builder = mock_supabase.rpc.return_value
+    query_builder.execute.return_value.data = []
+
+    await verificar_assinatura_servidor('222')
+    resultado = await verificar_assinatura_servidor('222')
+
+    assert resultado['ativa'] is False
+    assert mock_supabase.rpc.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_assinatura_expirada_no_cache_revalida(mock_supabase, mock_config):
+    vencida = _assinatura(True)
+    vencida['data_expiracao'] = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    assinaturas_cache['333'] = {'dados': vencida, 'expiracao': datetime.now(timezone.utc) - timedelta(seconds=1), 'cache_ttl': 60}
+
+    query_builder = mock_supabase.rpc.return_value
+    query_builder.execute.return_value.data = [_assinatura(True, dias=30)]
+
+    resultado = await verificar_assinatura_servidor('333')
+
+    assert resultado['ativa'] is True
+    assert resultado['dias_restantes'] == 30
+    mock_supabase.rpc.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_erro_nao_e_cacheado_e_limpeza_forca_nova_consulta(mock_supabase, mock_config):
+    query_builder = mock_supabase.rpc.return_value
+    query_builder.execute.side_effect = Exception("timeout")
+
+    resultado = await verificar_assinatura_servidor('444')
+    assert resultado['status'] == 'erro'
+    assert '444' not in assinaturas_cache
+
+    query_builder.execute.side_effect = None
+    query_builder.execute.return_value.data = [_assinatura(True)]
+    await verificar_assinatura_servidor('444')
+    assert '444' in assinaturas_cache
+
+    limpar_cache_assinatura('444')
+    assert '444' not in assinaturas_cache
+
+
+def _produto(codigo: str, preco_func: float = 1.0) -> dict:
+    return {
+        'id': 1,
+        'preco_venda': 4.0,
+        'preco_pagamento_funcionario': preco_func,
+        'produtos_referencia': {'codigo': codigo, 'nome': codigo.title()},
+    }
+
+
+@pytest.mark.asyncio
+async def test_catalogo_servido_do_cache(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = [_produto('milho')]
+
+    primeira = await get_produtos_empresa(10)
+    segunda = await get_produtos_empresa(10)
+
+    assert list(segunda) == ['milho']
+    assert mock_supabase.table.call_count == 1
+    # O chamador recebe uma cópia: alterar o dict não afeta o cache
+    primeira.pop('milho')
+    assert 'milho' in produtos_cache[10]
+
+
+@pytest.mark.asyncio
+async def test_configurar_produto_invalida_catalogo(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = [_produto('milho', 1.0)]
+    await get_produtos_empresa(10)
+
+    await configurar_produto_empresa(10, 1, 4.0, 2.0)
+    assert 10 not in produtos_cache
+
+    query_builder.execute.return_value.data = [_produto('milho', 2.0)]
+    produtos = await get_produtos_empresa(10)
+    assert produtos['milho']['preco_pagamento_funcionario'] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_comissao_em_lote_invalida_catalogo(mock_supabase, mock_config):
+    mock_supabase.table.return_value.execute.return_value.data = [_produto('milho')]
+    await get_produtos_empresa(10)
+
+    mock_supabase.rpc.return_value.execute.return_value.data = 42
+    assert await aplicar_comissao_produtos(10, 25) == 42
+    mock_supabase.rpc.assert_called_once_with('aplicar_comissao_empresa', {'p_empresa_id': 10, 'p_porcentagem': 25})
+    assert 10 not in produtos_cache
+
+
+@pytest.mark.asyncio
+async def test_configuracao_em_lote_grava_apenas_alterados(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = [
+        {'produto_referencia_id': 1, 'preco_venda': '10.00', 'preco_pagamento_funcionario': '2.50', 'ativo': True},
+        {'produto_referencia_id': 2, 'preco_venda': '8.00', 'preco_pagamento_funcionario': '2.00', 'ativo': True},
+        {'produto_referencia_id': 3, 'preco_venda': '5.00', 'preco_pagamento_funcionario': '1.25', 'ativo': False},
+    ]
+    produtos_cache[10] = {'milho': _produto('milho')}
+
+    alterados = await configurar_produtos_empresa_lote(10, [
+        {'produto_referencia_id': 1, 'preco_venda': 10.0, 'preco_pagamento_funcionario': 2.5},   # igual
+        {'produto_referencia_id': 2, 'preco_venda': 9.0, 'preco_pagamento_funcionario': 2.25},   # preço mudou
+        {'produto_referencia_id': 3, 'preco_venda': 5.0, 'preco_pagamento_funcionario': 1.25},   # reativar
+        {'produto_referencia_id': 4, 'preco_venda': 4.0, 'preco_pagamento_funcionario': 1.0},    # novo
+    ])
+
+    assert alterados == 3
+    query_builder.upsert.assert_called_once()
+    linhas = query_builder.upsert.call_args.args[0]
+    assert [l['produto_referencia_id'] for l in linhas] == [2, 3, 4]
+    assert query_builder.upsert.call_args.kwargs == {'on_conflict': 'empresa_id,produto_referencia_id'}
+    assert 10 not in produtos_cache
+
+
+@pytest.mark.asyncio
+async def test_configuracao_em_lote_sem_mudancas_nao_escreve(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = [
+        {'produto_referencia_id': 1, 'preco_venda': 10.0, 'preco_pagamento_funcionario': 2.5, 'ativo': True},
+    ]
+
+    alterados = await configurar_produtos_empresa_lote(10, [
+        {'produto_referencia_id': 1, 'preco_venda': 10.0, 'preco_pagamento_funcionario': 2.5},
+    ])
+
+    assert alterados == 0
+    query_builder.upsert.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_invalidacao_durante_consulta_nao_grava_catalogo_antigo(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    result = query_builder.execute.return_value
+    result.data = [_produto('milho')]
+
+    async def execute_com_invalidacao():
+        limpar_cache_produtos(10)
+        return result
+
+    query_builder.execute.side_effect = execute_com_invalidacao
+
+    produtos = await get_produtos_empresa(10)
+    assert 'milho' in produtos
+    assert 10 not in produtos_cache
+
+
+def _empresas_guild() -> list:
+    return [
+        {'id': 1, 'nome': 'Fazenda', 'canal_principal_id': '100', 'categoria_id': '900'},
+        {'id': 2, 'nome': 'Padaria', 'canal_principal_id': '200', 'categoria_id': None},
+    ]
+
+
+def _ctx(channel_id: int, category_id=None):
+    ctx = MagicMock()
+    ctx.guild.id = 555
+    ctx.channel.id = channel_id
+    ctx.channel.category = MagicMock(id=category_id) if category_id else None
+    ctx.send = AsyncMock()
+    return ctx
+
+
+async def _rodar_check(ctx):
+    from utils import empresa_configurada
+    check = empresa_configurada()(lambda c: None)
+    return await check.__commands_checks__[0](ctx)
+
+
+@pytest.mark.asyncio
+async def test_roteamento_resolve_canal_e_categoria_sem_nova_consulta(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = _empresas_guild()
+
+    ctx_canal = _ctx(200)
+    assert await _rodar_check(ctx_canal) is True
+    assert ctx_canal.empresa['id'] == 2
+
+    ctx_categoria = _ctx(999, category_id=900)
+    assert await _rodar_check(ctx_categoria) is True
+    assert ctx_categoria.empresa['id'] == 1
+
+    ctx_neutro = _ctx(999)
+    assert await _rodar_check(ctx_neutro) is True
+    assert ctx_neutro.empresa is None
+    assert len(ctx_neutro.empresas_lista) == 2
+
+    assert mock_supabase.table.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_atualizar_modo_pagamento_invalida_roteamento(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = _empresas_guild()
+    await get_empresas_by_guild('555')
+    assert '555' in empresas_guild_cache
+
+    assert await atualizar_modo_pagamento(2, 'entrega') is True
+    assert '555' not in empresas_guild_cache
+
+
+@pytest.mark.asyncio
+async def test_erro_ao_buscar_empresas_nao_e_cacheado(mock_supabase, mock_config):
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.side_effect = Exception("timeout")
+
+    assert await get_empresas_by_guild('555') == []
+    assert '555' not in empresas_guild_cache
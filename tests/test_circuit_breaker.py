@@ -0,0 +1,81 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+
+import api_pkg.routes.payment as payment
+from api_pkg.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    ConcurrencyLimitExceeded,
+)
+from observability import render_metrics
+
+
+def test_circuito_abre_apos_falhas_e_fecha_com_probe_ok():
+    breaker = CircuitBreaker("teste", failure_threshold=3, recovery_timeout=30)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # Depois do tempo de recuperação, apenas um probe passa
+    breaker.changed_at -= 31
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_falha_no_probe_reabre_circuito():
+    breaker = CircuitBreaker("teste", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.changed_at -= 31
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_limitador_adaptativo_reduz_e_rejeita():
+    limiter = AdaptiveConcurrencyLimiter("teste", initial_limit=4, min_limit=1, queue_timeout=0.05)
+    limiter.on_failure()
+    assert int(limiter.limit) == 2
+    limiter.on_success(latency=10.0)  # lento conta como falha
+    assert int(limiter.limit) == 1
+
+    async with limiter.acquire():
+        with pytest.raises(ConcurrencyLimitExceeded):
+            async with limiter.acquire():
+                pass
+    assert limiter.in_flight == 0
+
+    for _ in range(10):
+        limiter.on_success(latency=0.1)
+    assert limiter.limit > 1
+
+
+@pytest.mark.asyncio
+async def test_request_asaas_retorna_503_com_circuito_aberto(monkeypatch):
+    breaker = CircuitBreaker("asaas", failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    monkeypatch.setattr(payment, "asaas_breaker", breaker)
+
+    with patch.object(payment, "get_http_session") as session:
+        with pytest.raises(HTTPException) as exc:
+            await payment._request_asaas("GET", "https://asaas.test/payments", {})
+
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+    session.assert_not_called()
+    assert 'circuit_breaker_state{circuit="asaas"}' in render_metrics()
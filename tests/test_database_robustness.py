@@ -1,5 +1,6 @@
 
 import pytest
+from unittest.mock import MagicMock
 from database import atualizar_canal_funcionario, criar_produto_referencia_custom
 import logging
 
@@ -64,3 +65,37 @@ async def test_criar_produto_referencia_custom(mock_supabase, mock_config):
     assert inserted_data['nome'] == nome
     assert inserted_data['codigo'] == "jor1"
     
+
+
+@pytest.mark.asyncio
+async def test_get_saldo_empresa_le_acumulado(mock_supabase, mock_config):
+    from database import get_saldo_empresa
+
+    query_builder = mock_supabase.table.return_value
+    query_builder.execute.return_value.data = [{'saldo': '1250.50'}]
+    assert await get_saldo_empresa(3) == 1250.50
+    mock_supabase.table.assert_called_with('empresas_saldo')
+    query_builder.eq.assert_called_with('empresa_id', 3)
+
+    # Sem linha: empresa sem transações
+    query_builder.execute.return_value.data = []
+    assert await get_saldo_empresa(3) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_reconciliar_saldos_empresas(mock_supabase, mock_config):
+    from database import reconciliar_saldos_empresas
+
+    divergente = {'empresa_id': 3, 'saldo_registrado': 100, 'saldo_calculado': 90, 'diferenca': -10}
+    mock_supabase.rpc.return_value.execute.side_effect = [
+        MagicMock(data=[{'id': 3}, {'id': 4}]),  # ids das empresas
+        MagicMock(data=[divergente]),
+        MagicMock(data=[]),
+    ]
+    divergencias = await reconciliar_saldos_empresas(corrigir=False)
+    assert divergencias == [divergente]
+    # Uma chamada (uma transação) por empresa, nunca todas de uma vez
+    assert [c.args[1] for c in mock_supabase.rpc.call_args_list] == [
+        {'p_empresa_id': 3, 'p_corrigir': False},
+        {'p_empresa_id': 4, 'p_corrigir': False},
+    ]
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import db_metrics
+from observability import render_metrics
+from config import _SupabaseProxy
+
+
+@pytest.fixture
+def proxy():
+    client = MagicMock()
+    qb = MagicMock()
+    qb.execute = AsyncMock(return_value=MagicMock(data=[{'id': 1}, {'id': 2}]))
+    for metodo in ('select', 'eq', 'update', 'insert', 'order', 'limit'):
+        getattr(qb, metodo).return_value = qb
+    client.table.return_value = qb
+    client.rpc.return_value = qb
+
+    p = _SupabaseProxy()
+    p._client = client
+    return p, qb
+
+
+@pytest.mark.asyncio
+async def test_table_e_rpc_instrumentados(proxy):
+    p, _qb = proxy
+
+    resp = await p.table('funcionarios').select('*').eq('empresa_id', 1).execute()
+    assert len(resp.data) == 2
+    await p.table('funcionarios').update({'saldo': 0}).eq('id', 1).execute()
+    await p.rpc('resumo_financeiro_empresa', {'p_empresa_id': 1}).execute()
+
+    metricas = render_metrics()
+    assert 'db_calls_total{kind="table",operation="select",status="ok",target="funcionarios"}' in metricas
+    assert 'db_calls_total{kind="table",operation="update",status="ok",target="funcionarios"}' in metricas
+    assert 'db_calls_total{kind="rpc",operation="call",status="ok",target="resumo_financeiro_empresa"}' in metricas
+    assert 'db_response_rows_bucket{kind="rpc",operation="call",target="resumo_financeiro_empresa",le="5"}' in metricas
+
+
+@pytest.mark.asyncio
+async def test_erro_contado_e_resumo_por_comando(proxy, monkeypatch):
+    p, qb = proxy
+    monkeypatch.setattr(db_metrics, 'DB_CALLS_WARN_THRESHOLD', 3)
+    avisos = MagicMock()
+    monkeypatch.setattr(db_metrics.logger, 'warning', avisos)
+
+    token = db_metrics.iniciar_resumo_db('cmd:caixa')
+    for _ in range(2):
+        await p.table('empresas').select('*').execute()
+    qb.execute.side_effect = TimeoutError()
+    with pytest.raises(TimeoutError):
+        await p.table('empresas').select('*').execute()
+    resumo = db_metrics.finalizar_resumo_db(token)
+
+    assert resumo.chamadas == 3
+    assert resumo.erros == 1
+    assert 'possível N+1' in avisos.call_args.args[0]
+    assert 'status="TimeoutError",target="empresas"' in render_metrics()
+
+
+@pytest.mark.asyncio
+async def test_slow_query_logada(proxy, monkeypatch):
+    p, _qb = proxy
+    monkeypatch.setattr(db_metrics, 'DB_SLOW_QUERY_MS', 0)
+    avisos = MagicMock()
+    monkeypatch.setattr(db_metrics.logger, 'warning', avisos)
+
+    await p.table('encomendas').select('*').execute()
+
+    assert 'db_slow_query table=encomendas op=select' in avisos.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_tamanho_do_payload_so_quando_ativado(proxy, monkeypatch):
+    p, _qb = proxy
+    monkeypatch.setattr(db_metrics, 'DB_METRICS_PAYLOAD_SIZE', None)
+    monkeypatch.delenv('DB_METRICS_PAYLOAD_SIZE', raising=False)
+
+    await p.table('produtos_empresa').select('*').execute()
+    assert 'db_response_bytes_count{kind="table",operation="select",target="produtos_empresa"}' not in render_metrics()
+
+    monkeypatch.setattr(db_metrics, 'DB_METRICS_PAYLOAD_SIZE', True)
+    await p.table('produtos_empresa').select('*').execute()
+    assert 'db_response_bytes_count{kind="table",operation="select",target="produtos_empresa"} 1' in render_metrics()
@@ -7,6 +7,7 @@ Verifica que:
 
 import sys
 import os
+import discord
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from decimal import Decimal
@@ -90,13 +91,16 @@ class TestDatabaseFunctions:
             # Setup async chain
             qb = _setup_async_supabase(mock_supabase)
 
-            # Mock estoque disponível
+            # RPC consome FIFO: 25 saem do registro 1 (30 disponíveis)
             mock_response = MagicMock()
-            mock_response.data = [
-                {'id': 1, 'funcionario_id': 101, 'quantidade': 30},
-                {'id': 2, 'funcionario_id': 102, 'quantidade': 20},
-            ]
+            mock_response.data = {
+                'ok': True,
+                'removido': 25,
+                'restante': 25,
+                'consumos': [{'estoque_id': 1, 'funcionario_id': 101, 'quantidade': 25}],
+            }
             qb.execute = AsyncMock(return_value=mock_response)
+            mock_supabase.rpc.return_value = qb
 
             from database import remover_do_estoque_global
             result = await remover_do_estoque_global(empresa_id=1, codigo='prod1', quantidade=25)
@@ -106,9 +110,16 @@ class TestDatabaseFunctions:
             assert result['removido'] == 25
             assert result['preco_funcionario'] == 15.0
             assert result['nome'] == 'Produto 1'
+            assert result['quantidade'] == 25
+            assert result['consumos'][0]['funcionario_id'] == 101
 
-            # Verifica que chamou update/delete no supabase
-            assert mock_supabase.table.called
+            # Uma única chamada RPC atômica, sem updates/deletes linha a linha
+            mock_supabase.rpc.assert_called_once_with('remover_estoque_global_fifo', {
+                'p_empresa_id': 1,
+                'p_produto_codigo': 'prod1',
+                'p_quantidade': 25
+            })
+            assert not mock_supabase.table.called
 
     @pytest.mark.asyncio
     async def test_remover_do_estoque_global_insufficient(self):
@@ -125,10 +136,8 @@ class TestDatabaseFunctions:
 
             # Mock estoque insuficiente
             mock_response = MagicMock()
-            mock_response.data = [
-                {'id': 1, 'funcionario_id': 101, 'quantidade': 10},
-            ]
-            mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.gt.return_value.order.return_value.execute = AsyncMock(return_value=mock_response)
+            mock_response.data = {'ok': False, 'erro': 'insuficiente', 'disponivel': 10}
+            mock_supabase.rpc.return_value.execute = AsyncMock(return_value=mock_response)
 
             from database import remover_do_estoque_global
             result = await remover_do_estoque_global(empresa_id=1, codigo='prod1', quantidade=50)
@@ -139,6 +148,15 @@ class TestDatabaseFunctions:
             assert 'insuficiente' in result['erro'].lower()
 
 
+def _embeds_enviados(ctx):
+    embeds = []
+    for call in ctx.send.call_args_list:
+        embed = call.kwargs.get('embed') or (call.args[0] if call.args else None)
+        if isinstance(embed, discord.Embed):
+            embeds.append(embed)
+    return embeds
+
+
 class TestEntregarModoEntrega:
     """Testes para o modo de pagamento 'entrega'."""
 
@@ -168,14 +186,7 @@ class TestEntregarModoEntrega:
         """
         with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
              patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
-             patch('cogs.producao.entrega.get_estoque_global_detalhado', new_callable=AsyncMock) as mock_estoque_global, \
-             patch('cogs.producao.entrega.remover_do_estoque_global', new_callable=AsyncMock) as mock_remover_global, \
-             patch('cogs.producao.supabase') as mock_supabase_init, \
-             patch('cogs.producao.entrega.supabase') as mock_supabase:
-
-            # Setup async chains for supabase mocks
-            _setup_async_supabase(mock_supabase_init)
-            _setup_async_supabase(mock_supabase)
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
 
             # Empresa em modo ENTREGA
             mock_empresa.return_value = {
@@ -187,49 +198,26 @@ class TestEntregarModoEntrega:
             # Funcionário que vai entregar (não produziu nada)
             mock_get_func.return_value = {'id': 201, 'nome': 'Vendedor'}
 
-            # Estoque GLOBAL tem os produtos (produzidos por outro funcionário)
-            mock_estoque_global.return_value = {
-                'prod1': {
-                    'codigo': 'prod1',
-                    'nome': 'Produto 1',
-                    'quantidade': 100,
-                    'preco_funcionario': 10.0,
-                    'registros': [{'id': 1, 'funcionario_id': 999, 'quantidade': 100}]  # Outro funcionário produziu
-                }
+            # RPC debita o estoque global (produzido por outro funcionário) e registra a comissão
+            mock_entregar.return_value = {
+                'resultado': 'entregue',
+                'valor_comissao': 200.0,
+                'itens': [{'codigo': 'prod1', 'nome': 'Produto 1', 'quantidade': 20, 'preco_funcionario': 10.0, 'comissao': 200.0}],
+                'sem_comissao': [],
+                'comprador': 'Cliente X',
+                'valor_total': 400.0
             }
 
-            # Mock da encomenda (for __init__.py query)
-            mock_select = MagicMock()
-            mock_select.data = [{
-                'id': 500,
-                'status': 'pendente',
-                'itens_json': [{'codigo': 'prod1', 'quantidade': 20, 'quantidade_entregue': 0, 'nome': 'Produto 1'}],
-                'valor_total': 400.0,
-                'comprador': 'Cliente X'
-            }]
-            mock_supabase_init.table.return_value.select.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=mock_select)
-
             # Executa entrega
             await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=500)
 
-            # Verifica que usou estoque global
-            mock_estoque_global.assert_called_once()
-
-            # Verifica que removeu do estoque global
-            mock_remover_global.assert_called_with(1, 'prod1', 20)
-
-            # Verifica que registrou transação de comissão
-            insert_calls = [call for call in mock_supabase.table.return_value.insert.call_args_list]
-            assert len(insert_calls) > 0
+            # Uma única operação atômica no modo entrega
+            mock_entregar.assert_called_once_with(500, 1, 201, 'entrega')
 
             # Verifica embed de sucesso
-            assert mock_ctx.send.called
-            embed_call = mock_ctx.send.call_args
-            embed = embed_call.kwargs.get('embed') or embed_call.args[0]
-
-            # Deve mostrar comissão
+            embed = _embeds_enviados(mock_ctx)[-1]
             embed_dict = embed.to_dict()
-            assert any('Comissão' in str(f.get('name', '')) or 'Comissão' in str(f.get('value', ''))
+            assert any('Comissão' in str(f.get('name', '')) and '200.00' in str(f.get('value', ''))
                       for f in embed_dict.get('fields', []))
 
     @pytest.mark.asyncio
@@ -240,15 +228,8 @@ class TestEntregarModoEntrega:
         """
         with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
              patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
-             patch('cogs.producao.entrega.get_estoque_global_detalhado', new_callable=AsyncMock) as mock_estoque_global, \
-             patch('cogs.producao.supabase') as mock_supabase_init, \
-             patch('cogs.producao.entrega.supabase') as mock_supabase:
-
-            # Setup async chains for supabase mocks
-            _setup_async_supabase(mock_supabase_init)
-            _setup_async_supabase(mock_supabase)
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
 
-            # Empresa em modo ENTREGA
             mock_empresa.return_value = {
                 'id': 1,
                 'nome': 'Empresa Teste',
@@ -257,37 +238,36 @@ class TestEntregarModoEntrega:
 
             mock_get_func.return_value = {'id': 201, 'nome': 'Vendedor'}
 
-            # Estoque GLOBAL insuficiente
-            mock_estoque_global.return_value = {
-                'prod1': {
-                    'codigo': 'prod1',
-                    'nome': 'Produto 1',
-                    'quantidade': 5,  # Só tem 5
-                    'preco_funcionario': 10.0,
-                    'registros': []
-                }
+            # Estoque GLOBAL insuficiente: RPC não altera nada
+            mock_entregar.return_value = {
+                'resultado': 'estoque_insuficiente',
+                'faltando': [{'codigo': 'prod1', 'nome': 'Produto 1', 'precisa': 20, 'tem': 5, 'falta': 15}]
             }
 
-            # Encomenda precisa de 20 (mock in __init__.py)
-            mock_select = MagicMock()
-            mock_select.data = [{
-                'id': 501,
-                'status': 'pendente',
-                'itens_json': [{'codigo': 'prod1', 'quantidade': 20, 'quantidade_entregue': 0, 'nome': 'Produto 1'}],
-                'valor_total': 400.0,
-                'comprador': 'Cliente Y'
-            }]
-            mock_supabase_init.table.return_value.select.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=mock_select)
-
             await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=501)
 
-            # Verifica que mostrou erro de estoque insuficiente
-            assert mock_ctx.send.called
-            embed_call = mock_ctx.send.call_args
-            embed = embed_call.kwargs.get('embed') or embed_call.args[0]
+            mock_entregar.assert_called_once()
+            embed = _embeds_enviados(mock_ctx)[-1]
 
             # Deve ser embed de erro (vermelho)
             assert embed.color.value == 0xe74c3c  # discord.Color.red()
+            assert 'falta 15' in embed.fields[0].value
+
+    @pytest.mark.asyncio
+    async def test_entregar_encomenda_ja_entregue(self, cog, mock_ctx):
+        """Segunda entrega da mesma encomenda é recusada pelo lock da RPC."""
+        with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
+             patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
+
+            mock_empresa.return_value = {'id': 1, 'nome': 'Empresa Teste', 'modo_pagamento': 'entrega'}
+            mock_get_func.return_value = {'id': 201, 'nome': 'Vendedor'}
+            mock_entregar.return_value = {'resultado': 'ja_entregue'}
+
+            await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=502)
+
+            mock_ctx.send.assert_called_once()
+            assert 'já foi entregue' in mock_ctx.send.call_args.args[0]
 
 
 class TestEntregarModoProducao:
@@ -312,21 +292,14 @@ class TestEntregarModoProducao:
         return ProducaoCog(mock_bot)
 
     @pytest.mark.asyncio
-    async def test_entregar_modo_producao_com_estoque_pessoal(self, cog, mock_ctx):
+    async def test_entregar_modo_producao_com_estoque_pessoal(self, cog, mock_bot, mock_ctx):
         """
         Testa que no modo 'producao', funcionário com estoque pessoal
-        ganha comissão normalmente.
+        ganha comissão normalmente, sem pedir confirmação.
         """
         with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
              patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
-             patch('cogs.producao.entrega.get_estoque_funcionario', new_callable=AsyncMock) as mock_estoque_func, \
-             patch('cogs.producao.entrega.remover_do_estoque', new_callable=AsyncMock) as mock_remover, \
-             patch('cogs.producao.supabase') as mock_supabase_init, \
-             patch('cogs.producao.entrega.supabase') as mock_supabase:
-
-            # Setup async chains for supabase mocks
-            _setup_async_supabase(mock_supabase_init)
-            _setup_async_supabase(mock_supabase)
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
 
             # Empresa em modo PRODUCAO
             mock_empresa.return_value = {
@@ -337,48 +310,33 @@ class TestEntregarModoProducao:
 
             mock_get_func.return_value = {'id': 201, 'nome': 'Produtor'}
 
-            # Funcionário TEM o produto no estoque pessoal
-            mock_estoque_func.return_value = [
-                {'produto_codigo': 'prod1', 'quantidade': 50, 'preco_funcionario': 10.0}
-            ]
-
-            # Mock encomenda query in __init__.py
-            mock_select = MagicMock()
-            mock_select.data = [{
-                'id': 600,
-                'status': 'pendente',
-                'itens_json': [{'codigo': 'prod1', 'quantidade': 20, 'quantidade_entregue': 0, 'nome': 'Produto 1'}],
-                'valor_total': 400.0,
-                'comprador': 'Cliente Z'
-            }]
-            mock_supabase_init.table.return_value.execute = AsyncMock(return_value=mock_select)
+            mock_entregar.return_value = {
+                'resultado': 'entregue',
+                'valor_comissao': 200.0,
+                'itens': [{'codigo': 'prod1', 'nome': 'Produto 1', 'quantidade': 20, 'preco_funcionario': 10.0, 'comissao': 200.0}],
+                'sem_comissao': [],
+                'comprador': 'Cliente Z',
+                'valor_total': 400.0
+            }
 
             await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=600)
 
-            # Verifica que usou estoque pessoal (não global)
-            mock_estoque_func.assert_called_once()
-
-            # Verifica que removeu do estoque pessoal
-            mock_remover.assert_called_with(201, 1, 'prod1', 20)
+            # Usa estoque pessoal (modo producao) numa única chamada
+            mock_entregar.assert_called_once_with(600, 1, 201, 'producao')
+            mock_bot.wait_for.assert_not_called()
 
-            # Verifica sucesso
-            assert mock_ctx.send.called
+            embed = _embeds_enviados(mock_ctx)[-1]
+            assert 'Entregue' in embed.title
 
     @pytest.mark.asyncio
     async def test_entregar_modo_producao_sem_estoque_pessoal(self, cog, mock_bot, mock_ctx):
         """
         Testa que no modo 'producao', funcionário SEM estoque pessoal
-        NÃO ganha comissão (lógica original).
+        NÃO ganha comissão (lógica original) e só entrega após confirmar.
         """
         with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
              patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
-             patch('cogs.producao.entrega.get_estoque_funcionario', new_callable=AsyncMock) as mock_estoque_func, \
-             patch('cogs.producao.supabase') as mock_supabase_init, \
-             patch('cogs.producao.entrega.supabase') as mock_supabase:
-
-            # Setup async chains for supabase mocks
-            _setup_async_supabase(mock_supabase_init)
-            _setup_async_supabase(mock_supabase)
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
 
             # Empresa em modo PRODUCAO
             mock_empresa.return_value = {
@@ -389,19 +347,16 @@ class TestEntregarModoProducao:
 
             mock_get_func.return_value = {'id': 201, 'nome': 'Vendedor Sem Estoque'}
 
-            # Funcionário NÃO tem o produto (estoque vazio)
-            mock_estoque_func.return_value = []
-
-            # Mock encomenda query in __init__.py
-            mock_select = MagicMock()
-            mock_select.data = [{
-                'id': 601,
-                'status': 'pendente',
-                'itens_json': [{'codigo': 'prod1', 'quantidade': 20, 'quantidade_entregue': 0, 'nome': 'Produto 1'}],
-                'valor_total': 400.0,
-                'comprador': 'Cliente W'
-            }]
-            mock_supabase_init.table.return_value.execute = AsyncMock(return_value=mock_select)
+            faltando = [{'codigo': 'prod1', 'nome': 'Produto 1', 'precisa': 20, 'tem': 0, 'falta': 20}]
+            mock_entregar.side_effect = [
+                # 1ª chamada: prévia, nada é alterado
+                {'resultado': 'confirmacao_necessaria', 'itens': [], 'faltando': faltando, 'valor_comissao': 0},
+                # 2ª chamada (após "sim"): entrega sem comissão
+                {
+                    'resultado': 'entregue', 'valor_comissao': 0, 'itens': [],
+                    'sem_comissao': faltando, 'comprador': 'Cliente W', 'valor_total': 400.0
+                },
+            ]
 
             # Mock confirmação do usuário
             msg = AsyncMock()
@@ -413,16 +368,37 @@ class TestEntregarModoProducao:
             await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=601)
 
             # Deve ter mostrado aviso de estoque insuficiente
-            calls = mock_ctx.send.call_args_list
-            warning_shown = False
-            for call in calls:
-                embed = call.kwargs.get('embed') or (call.args[0] if call.args else None)
-                if embed and hasattr(embed, 'title'):
-                    if 'Insuficiente' in str(embed.title):
-                        warning_shown = True
-                        break
+            titulos = [str(e.title) for e in _embeds_enviados(mock_ctx)]
+            assert any('Insuficiente' in t for t in titulos), "Deveria mostrar aviso de estoque insuficiente"
 
-            assert warning_shown, "Deveria mostrar aviso de estoque insuficiente"
+            assert mock_entregar.call_count == 2
+            assert mock_entregar.call_args.kwargs == {'permitir_sem_estoque': True}
+
+            final = _embeds_enviados(mock_ctx)[-1]
+            assert any('SEM Comissão' in f.name for f in final.fields)
+
+    @pytest.mark.asyncio
+    async def test_entregar_modo_producao_cancelado(self, cog, mock_bot, mock_ctx):
+        """Se o usuário não confirma, a entrega não é feita."""
+        with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
+             patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
+
+            mock_empresa.return_value = {'id': 1, 'nome': 'Empresa Teste', 'modo_pagamento': 'producao'}
+            mock_get_func.return_value = {'id': 201, 'nome': 'Vendedor'}
+            mock_entregar.return_value = {
+                'resultado': 'confirmacao_necessaria', 'itens': [],
+                'faltando': [{'codigo': 'prod1', 'nome': 'Produto 1', 'precisa': 1, 'tem': 0, 'falta': 1}],
+                'valor_comissao': 0
+            }
+
+            msg = AsyncMock()
+            msg.content = "não"
+            mock_bot.wait_for.return_value = msg
+
+            await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=602)
+
+            mock_entregar.assert_called_once()
 
 
 class TestModoPagamentoSwitch:
@@ -451,37 +427,17 @@ class TestModoPagamentoSwitch:
         """Verifica que o modo de pagamento é lido corretamente da empresa."""
         with patch('cogs.producao.selecionar_empresa', new_callable=AsyncMock) as mock_empresa, \
              patch('cogs.producao.get_funcionario_by_discord_id', new_callable=AsyncMock) as mock_get_func, \
-             patch('cogs.producao.entrega.get_estoque_global_detalhado', new_callable=AsyncMock) as mock_global, \
-             patch('cogs.producao.entrega.get_estoque_funcionario', new_callable=AsyncMock) as mock_pessoal, \
-             patch('cogs.producao.supabase') as mock_supabase_init, \
-             patch('cogs.producao.entrega.supabase') as mock_supabase:
-
-            # Setup async chains for supabase mocks
-            _setup_async_supabase(mock_supabase_init)
-            _setup_async_supabase(mock_supabase)
+             patch('cogs.producao.entrega.entregar_encomenda_completa', new_callable=AsyncMock) as mock_entregar:
 
             mock_get_func.return_value = {'id': 201, 'nome': 'Test'}
-            mock_global.return_value = {}
-            mock_pessoal.return_value = []
-
-            # Mock encomenda query in __init__.py
-            mock_select = MagicMock()
-            mock_select.data = [{
-                'id': 700, 'status': 'pendente',
-                'itens_json': [{'codigo': 'x', 'quantidade': 1, 'quantidade_entregue': 0, 'nome': 'X'}],
-                'valor_total': 10.0, 'comprador': 'C'
-            }]
-            mock_supabase_init.table.return_value.select.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=mock_select)
+            mock_entregar.return_value = {'resultado': 'nao_encontrada'}
 
             # Teste modo ENTREGA
             mock_empresa.return_value = {'id': 1, 'nome': 'E', 'modo_pagamento': 'entrega'}
             await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=700)
-            mock_global.assert_called()  # Deve usar estoque global
-
-            mock_global.reset_mock()
-            mock_pessoal.reset_mock()
+            assert mock_entregar.call_args.args[3] == 'entrega'  # Deve usar estoque global
 
             # Teste modo PRODUCAO
             mock_empresa.return_value = {'id': 1, 'nome': 'E', 'modo_pagamento': 'producao'}
             await cog.entregar_encomenda.callback(cog, mock_ctx, encomenda_id=700)
-            mock_pessoal.assert_called()  # Deve usar estoque pessoal
+            assert mock_entregar.call_args.args[3] == 'producao'  # Deve usar estoque pessoal
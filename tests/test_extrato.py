@@ -0,0 +1,100 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+
+import discord
+from api_pkg.auth import AuthContext, require_auth_context
+from database.transacao import codificar_cursor_transacao, decodificar_cursor_transacao
+from database import listar_transacoes_empresa
+from ui_utils import CursorPaginatorView
+
+
+def _linhas(n, inicio=100):
+    return [
+        {'id': inicio - i, 'tipo': 'entrada', 'valor': 10, 'descricao': 'x',
+         'data_criacao': f'2026-10-17T10:00:{59 - i:02d}+00:00'}
+        for i in range(n)
+    ]
+
+
+def test_cursor_ida_e_volta():
+    cursor = codificar_cursor_transacao({'id': 42, 'data_criacao': '2026-10-17T10:00:00+00:00'})
+    assert decodificar_cursor_transacao(cursor) == ('2026-10-17T10:00:00+00:00', 42)
+    with pytest.raises(ValueError):
+        decodificar_cursor_transacao('lixo')
+    with pytest.raises(ValueError):
+        decodificar_cursor_transacao(codificar_cursor_transacao({'id': 42, 'data_criacao': 'ontem'}))
+
+
+@pytest.mark.asyncio
+async def test_pagina_keyset_com_proximo_cursor(mock_supabase, mock_config):
+    mock_supabase.rpc.return_value.execute.return_value.data = _linhas(4)
+
+    pagina = await listar_transacoes_empresa(1, limite=3, tipo='entrada')
+    assert [t['id'] for t in pagina['itens']] == [100, 99, 98]
+    assert decodificar_cursor_transacao(pagina['proximo_cursor']) == ('2026-10-17T10:00:57+00:00', 98)
+    assert mock_supabase.rpc.call_args[0][1]['p_limite'] == 4
+
+    await listar_transacoes_empresa(1, limite=3, cursor=pagina['proximo_cursor'])
+    params = mock_supabase.rpc.call_args[0][1]
+    assert (params['p_cursor_data'], params['p_cursor_id']) == ('2026-10-17T10:00:57+00:00', 98)
+
+    # Última página: sem linha extra, sem cursor
+    mock_supabase.rpc.return_value.execute.return_value.data = _linhas(2)
+    pagina = await listar_transacoes_empresa(1, limite=3)
+    assert pagina['proximo_cursor'] is None
+
+
+@pytest.mark.asyncio
+async def test_paginador_guarda_cursores_visitados():
+    chamadas = []
+
+    async def buscar(cursor, pagina):
+        chamadas.append((cursor, pagina))
+        return discord.Embed(title=f"p{pagina}"), ('c2' if pagina == 1 else None)
+
+    view = CursorPaginatorView(1, buscar)
+    embed = await view.render()
+    assert embed.title == 'p1' and view.previous_page.disabled and not view.next_page.disabled
+
+    interaction = MagicMock()
+    interaction.response.edit_message = AsyncMock()
+    await view.next_page.callback(interaction)
+    assert chamadas[-1] == ('c2', 2) and view.next_page.disabled
+
+    await view.previous_page.callback(interaction)
+    assert chamadas[-1] == (None, 1)
+
+
+def test_endpoint_de_extrato(mock_supabase):
+    from api import app
+
+    mock_supabase.table.return_value.execute.return_value.data = [{'id': 1, 'guild_id': '555'}]
+    auth = AuthContext(user_id='u', discord_id='9', email=None, raw_user={}, is_superadmin=False)
+    app.dependency_overrides[require_auth_context] = lambda: auth
+    try:
+        with patch('api_pkg.routes.transacoes.supabase', mock_supabase), \
+             patch('api_pkg.auth.get_guild_access', new_callable=AsyncMock, return_value={'role': 'admin'}), \
+             patch('api_pkg.routes.transacoes.listar_transacoes_empresa', new_callable=AsyncMock) as listar:
+            listar.return_value = {'itens': [{'id': 5}], 'proximo_cursor': 'abc'}
+            client = TestClient(app)
+            resp = client.get('/api/empresas/1/transacoes?limit=10&tipo=entrada')
+            assert resp.status_code == 200
+            assert resp.json()['next_cursor'] == 'abc'
+            listar.assert_awaited_once_with(1, 10, None, 'entrada', None)
+
+            listar.side_effect = ValueError('cursor')
+            assert client.get('/api/empresas/1/transacoes?cursor=zz').status_code == 400
+
+        # id válido com timestamp lixo: 400 antes de chegar à RPC, não 503
+        cursor = codificar_cursor_transacao({'id': 7, 'data_criacao': 'nao-e-data'})
+        with patch('api_pkg.routes.transacoes.supabase', mock_supabase), \
+             patch('api_pkg.auth.get_guild_access', new_callable=AsyncMock, return_value={'role': 'admin'}), \
+             patch('database.transacao.supabase', mock_supabase):
+            mock_supabase.rpc.reset_mock()
+            resp = TestClient(app).get(f'/api/empresas/1/transacoes?cursor={cursor}')
+            assert resp.status_code == 400
+            assert resp.json()['detail'] == 'Invalid cursor'
+            mock_supabase.rpc.assert_not_called()
+    finally:
+        app.dependency_overrides.clear()
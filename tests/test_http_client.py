@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from observability import render_metrics
+from http_client import get_http_session, close_http_sessions
+
+
+@pytest.mark.asyncio
+async def test_sessao_compartilhada_reaproveitada():
+    try:
+        primeira = get_http_session('asaas')
+        segunda = get_http_session('asaas')
+        outra = get_http_session('supabase')
+
+        assert primeira is segunda
+        assert outra is not primeira
+        assert primeira.connector.limit_per_host > 0
+    finally:
+        await close_http_sessions()
+
+    assert primeira.closed
+    assert outra.closed
+
+
+@pytest.mark.asyncio
+async def test_sessao_recriada_apos_fechamento_e_metricas_do_pool():
+    try:
+        antiga = get_http_session('asaas')
+        await antiga.close()
+
+        nova = get_http_session('asaas')
+        assert nova is not antiga
+        assert not nova.closed
+
+        metricas = render_metrics()
+        assert 'http_pool_connections_in_use{pool="asaas"} 0' in metricas
+        assert 'http_pool_limit_per_host{pool="asaas"}' in metricas
+    finally:
+        await close_http_sessions()
+
+
+def test_sessao_de_loop_antigo_e_fechada_ao_ser_substituida():
+    async def obter():
+        return get_http_session('asaas')
+
+    antiga = asyncio.run(obter())
+    assert not antiga.closed
+
+    async def substituir():
+        try:
+            nova = get_http_session('asaas')
+            assert nova is not antiga
+        finally:
+            await close_http_sessions()
+
+    asyncio.run(substituir())
+    assert antiga.closed
@@ -0,0 +1,75 @@
+import json
+import logging
+import queue
+
+import logging_config
+from logging_config import JsonFormatter, NonBlockingQueueHandler, SamplingFilter
+
+
+def _record(msg='mensagem %s', args=('x',), level=logging.INFO, **extra):
+    record = logging.makeLogRecord({'msg': msg, 'args': args, 'levelno': level,
+                                    'levelname': logging.getLevelName(level), 'name': 'teste'})
+    record.__dict__.update(extra)
+    return record
+
+
+def test_fila_cheia_descarta_sem_bloquear_e_avisa():
+    fila = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(fila)
+
+    handler.emit(_record())
+    handler.emit(_record())  # fila cheia: descartado, sem bloquear
+    assert handler.dropped == 1
+
+    fila.get_nowait()
+    handler.emit(_record('depois', args=()))
+    assert 'dropped' in fila.get_nowait().getMessage()
+
+
+def test_registro_preparado_com_mensagem_e_traceback():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    try:
+        raise ValueError('falhou')
+    except ValueError:
+        import sys
+        record = _record(exc_info=sys.exc_info())
+
+    preparado = handler.prepare(record)
+    assert preparado.getMessage() == 'mensagem x'
+    assert preparado.exc_info is None
+    assert 'ValueError: falhou' in preparado.exc_text
+
+    payload = json.loads(JsonFormatter().format(preparado))
+    assert payload['message'] == 'mensagem x'
+    assert 'ValueError' in payload['exception']
+
+
+def test_amostragem_apenas_para_info_marcado():
+    filtro = SamplingFilter(0.0)
+    assert filtro.filter(_record()) is True
+    assert filtro.filter(_record(sampled=True)) is False
+    assert filtro.filter(_record(level=logging.WARNING, sampled=True)) is True
+
+
+def test_logger_usa_fila_em_thread_de_escrita(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    root = logging.getLogger()
+    monkeypatch.setattr(root, 'handlers', [])
+
+    logger = logging_config.setup_logging(name='teste_fila', log_file='teste.log')
+    try:
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], NonBlockingQueueHandler)
+        logger.warning('gravado pela thread de escrita')
+    finally:
+        logging_config.stop_logging()
+        logger.handlers.clear()
+
+    assert 'gravado pela thread de escrita' in (tmp_path / 'logs' / 'teste.log').read_text(encoding='utf-8')
+
+
+def test_json_sem_orjson_mantem_utf8(monkeypatch):
+    monkeypatch.setattr(logging_config, 'orjson', None)
+    linha = JsonFormatter().format(_record('ação concluída', args=()))
+    assert '"message":"ação concluída"' in linha
+    assert json.loads(linha)['level'] == 'INFO'
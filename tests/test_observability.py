@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import observability as obs
+
+
+def test_histograma_com_buckets_e_quantis():
+    hist = obs.histogram("teste_latencia_seconds", "latencia", buckets=[0.1, 0.5, 1.0])
+    serie = hist.labels(rota="/x")
+    for valor in [0.05] * 90 + [0.7] * 10:
+        serie.observe(valor)
+
+    texto = "\n".join(hist.render())
+    assert "# TYPE teste_latencia_seconds histogram" in texto
+    assert 'teste_latencia_seconds_bucket{rota="/x",le="0.1"} 90' in texto
+    assert 'teste_latencia_seconds_bucket{rota="/x",le="1"} 100' in texto
+    assert 'teste_latencia_seconds_bucket{rota="/x",le="+Inf"} 100' in texto
+    assert 'teste_latencia_seconds_count{rota="/x"} 100' in texto
+    assert serie.quantile(0.5) <= 0.1
+    assert 0.5 < serie.quantile(0.99) <= 1.0
+
+
+def test_limite_de_cardinalidade_agrupa_em_overflow():
+    cont = obs.counter("teste_cardinalidade_total", max_series=3)
+    for i in range(10):
+        cont.labels(pagamento=f"pay_{i}").inc()
+
+    series = dict(cont.series())
+    assert len(series) == 4
+    assert series[(("pagamento", obs.OVERFLOW_LABEL_VALUE),)].value == 7
+    assert 'metrics_series_overflow_total{metric="teste_cardinalidade_total"}' in obs.render_metrics()
+
+
+def test_handle_pre_vinculado_e_helpers_compativeis():
+    handle = obs.counter("teste_handle_total").labels(tipo="a")
+    handle.inc()
+    obs.inc_counter("teste_handle_total", labels={"tipo": "a"})
+    assert handle.value == 2
+
+    obs.set_gauge("teste_gauge", 3, {"pool": "x"})
+    texto = obs.render_metrics()
+    assert 'teste_gauge{pool="x"} 3' in texto
+
+    with pytest.raises(ValueError):
+        obs.gauge("teste_handle_total")
+
+
+def test_middleware_usa_template_da_rota():
+    from api import app
+
+    client = TestClient(app)
+    client.get("/api/pix/status/pay_123")
+    client.get("/api/pix/status/pay_456")
+
+    texto = obs.render_metrics()
+    assert 'path="/api/pix/status/{payment_id}"' in texto
+    assert "pay_123" not in texto
@@ -0,0 +1,69 @@
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, patch
+
+import api_pkg.routes.payment as payment
+
+
+@pytest.fixture
+def asaas(mock_supabase, monkeypatch):
+    monkeypatch.setattr(payment, "supabase", mock_supabase)
+    with patch.object(payment, "_request_asaas", new_callable=AsyncMock) as request_asaas:
+        yield request_asaas
+
+
+@pytest.mark.asyncio
+async def test_cliente_criado_uma_vez_e_reaproveitado(asaas, mock_supabase):
+    asaas.return_value = (200, {"id": "cus_123"})
+
+    assert await payment._get_stored_customer_id("555", "12345678901") is None
+    customer_id = await payment._create_asaas_customer("555", "12345678901", "a@b.c", {})
+    assert customer_id == "cus_123"
+
+    # Segunda compra: sai do LRU em memória, sem Asaas nem tabela
+    mock_supabase.table.reset_mock()
+    assert await payment._get_stored_customer_id("555", "12345678901") == "cus_123"
+    mock_supabase.table.assert_not_called()
+    asaas.assert_awaited_once()
+
+    # Documento diferente é outro cliente
+    assert await payment._get_stored_customer_id("555", "98765432100") is None
+
+
+@pytest.mark.asyncio
+async def test_cliente_carregado_da_tabela_sem_chamar_asaas(asaas, mock_supabase):
+    mock_supabase.table.return_value.execute.return_value.data = [{"customer_id": "cus_tabela"}]
+
+    assert await payment._get_stored_customer_id("555", "12345678901") == "cus_tabela"
+    mock_supabase.table.return_value.execute.return_value.data = []
+    assert await payment._get_stored_customer_id("555", "12345678901") == "cus_tabela"
+    asaas.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_falha_ao_criar_cliente_nao_grava_cache(asaas):
+    asaas.side_effect = [(400, {"errors": []}), (200, {"data": []})]
+
+    with pytest.raises(HTTPException) as exc:
+        await payment._create_asaas_customer("555", "12345678901", "a@b.c", {})
+    assert exc.value.status_code == 400
+    assert await payment._get_stored_customer_id("555", "12345678901") is None
+
+
+def test_hash_do_documento_usa_chave_do_servidor(monkeypatch):
+    import hashlib
+
+    monkeypatch.setattr(payment, "ASAAS_CUSTOMER_HASH_KEY", "segredo")
+    com_chave = payment._customer_doc_hash("12345678901")
+    assert com_chave != hashlib.sha256(b"12345678901").hexdigest()
+    monkeypatch.setattr(payment, "ASAAS_CUSTOMER_HASH_KEY", "outro")
+    assert payment._customer_doc_hash("12345678901") != com_chave
+
+
+def test_so_erro_de_cliente_descarta_o_mapeamento():
+    assert payment._is_stale_customer_error(404, {})
+    assert payment._is_stale_customer_error(400, {"errors": [{"code": "invalid_customer"}]})
+    # Validação comum (valor, vencimento) não invalida o cliente salvo
+    assert not payment._is_stale_customer_error(400, {"errors": [{"code": "invalid_dueDate"}]})
+    assert not payment._is_stale_customer_error(400, "Bad Request")
+    assert not payment._is_stale_customer_error(200, {})
@@ -43,15 +43,10 @@ def mock_dependencies():
     with patch('cogs.precos.selecionar_empresa', new_callable=AsyncMock) as mock_selecionar_empresa, \
          patch('cogs.precos.auto_config.get_produtos_referencia', new_callable=AsyncMock) as mock_get_ref, \
          patch('cogs.precos.get_produtos_empresa', new_callable=AsyncMock) as mock_get_empresa, \
-         patch('cogs.precos.auto_config.configurar_produto_empresa', new_callable=AsyncMock) as mock_config_prod, \
-         patch('cogs.precos.supabase') as mock_supabase:
+         patch('cogs.precos.auto_config.configurar_produtos_empresa_lote', new_callable=AsyncMock) as mock_config_prod, \
+         patch('cogs.precos.aplicar_comissao_produtos', new_callable=AsyncMock) as mock_aplicar_comissao:
 
-        # Make execute() async since all .execute() calls are now awaited
-        qb = MagicMock()
-        qb.execute = AsyncMock(return_value=MagicMock(data=[]))
-        qb.update.return_value = qb
-        qb.eq.return_value = qb
-        mock_supabase.table.return_value = qb
+        mock_aplicar_comissao.return_value = 1
 
         mock_selecionar_empresa.return_value = {
             'id': 1, 'nome': 'Test Corp', 'tipo_empresa_id': 1
@@ -73,14 +68,14 @@ def mock_dependencies():
             }
         }
         
-        mock_config_prod.return_value = True
+        mock_config_prod.return_value = 2
 
         yield {
             'selecionar_empresa': mock_selecionar_empresa,
             'get_ref': mock_get_ref,
             'get_empresa': mock_get_empresa,
             'config_prod': mock_config_prod,
-            'supabase': mock_supabase
+            'aplicar_comissao': mock_aplicar_comissao
         }
 
 @pytest.mark.asyncio
@@ -97,19 +92,13 @@ async def test_configurar_minimo(cog, mock_ctx, mock_dependencies):
     deps = mock_dependencies
     await cog.configurar_minimo.callback(cog, mock_ctx)
     
-    # Should configure p1 and p2 to min prices (10.0 and 5.0)
-    assert deps['config_prod'].call_count == 2
-    # Verify call args for first product (id 10, min 10.0)
-    # config_prod(empresa_id, prod_id, pv, pf)
-    # Check if any call matches
-    calls = deps['config_prod'].call_args_list
-    # call(1, 10, 10.0, 2.5) -> p1
-    found = False
-    for c in calls:
-        if c.args[1] == 10 and c.args[2] == 10.0:
-            found = True
-            break
-    assert found
+    # Should configure p1 and p2 to min prices (10.0 and 5.0) in a single batch
+    deps['config_prod'].assert_called_once()
+    empresa_id, precos = deps['config_prod'].call_args.args
+    assert empresa_id == 1
+    assert len(precos) == 2
+    # p1 -> id 10, min 10.0, funcionario 25% = 2.5
+    assert {'produto_referencia_id': 10, 'preco_venda': 10.0, 'preco_pagamento_funcionario': 2.5} in precos
     assert mock_ctx.send.called # Success embed
 
 @pytest.mark.asyncio
@@ -117,26 +106,16 @@ async def test_configurar_medio(cog, mock_ctx, mock_dependencies):
     deps = mock_dependencies
     await cog.configurar_medio.callback(cog, mock_ctx)
     # (10+20)/2 = 15.0
-    calls = deps['config_prod'].call_args_list
-    found = False
-    for c in calls:
-        if c.args[1] == 10 and c.args[2] == 15.0:
-            found = True
-            break
-    assert found
+    precos = deps['config_prod'].call_args.args[1]
+    assert any(p['produto_referencia_id'] == 10 and p['preco_venda'] == 15.0 for p in precos)
 
 @pytest.mark.asyncio
 async def test_configurar_maximo(cog, mock_ctx, mock_dependencies):
     deps = mock_dependencies
     await cog.configurar_maximo.callback(cog, mock_ctx)
     # Max 20.0
-    calls = deps['config_prod'].call_args_list
-    found = False
-    for c in calls:
-        if c.args[1] == 10 and c.args[2] == 20.0:
-            found = True
-            break
-    assert found
+    precos = deps['config_prod'].call_args.args[1]
+    assert any(p['produto_referencia_id'] == 10 and p['preco_venda'] == 20.0 for p in precos)
 
 @pytest.mark.asyncio
 async def test_configurar_comissao(cog, mock_ctx, mock_dependencies):
@@ -144,10 +123,25 @@ async def test_configurar_comissao(cog, mock_ctx, mock_dependencies):
     
     # Test setting commission to 50%
     await cog.configurar_comissao.callback(cog, mock_ctx, porcentagem=50.0)
-    
-    deps['supabase'].table.assert_called_with('produtos_empresa')
-    # Update should be called for existing products
-    # Current product p1 price 15.0. New func price = 15.0 * 0.5 = 7.5
-    # We can check if update was called
-    # deps['supabase'].table().update().eq().execute()
-    assert deps['supabase'].table.return_value.update.called
+
+    # A single bulk update for the whole catalog (p1: 15.0 * 0.5 = 7.5 is computed in SQL)
+    deps['aplicar_comissao'].assert_called_once_with(1, 50.0)
+    msg = mock_ctx.send.return_value
+    assert "1 produtos" in msg.edit.call_args.kwargs['content']
+
+
+@pytest.mark.asyncio
+async def test_aplicar_comissao_ui_usa_operacao_em_lote():
+    from cogs.precos.ui_comissao import aplicar_comissao
+
+    interaction = MagicMock()
+    interaction.response.defer = AsyncMock()
+    interaction.followup.send = AsyncMock()
+
+    with patch('cogs.precos.ui_comissao.aplicar_comissao_produtos', new_callable=AsyncMock) as mock_aplicar:
+        mock_aplicar.return_value = 150
+        await aplicar_comissao(interaction, 1, {}, 30.0)
+
+    mock_aplicar.assert_called_once_with(1, 30.0)
+    embed = interaction.followup.send.call_args.kwargs['embed']
+    assert "150 produtos" in embed.description
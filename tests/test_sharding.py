@@ -0,0 +1,53 @@
+import discord
+import pytest
+from discord.ext import commands
+
+import sharding
+from database import reivindicar_entrada_guild
+
+
+def test_parse_shard_ids():
+    assert sharding.parse_shard_ids('') is None
+    assert sharding.parse_shard_ids('0-3,8, 10-11') == [0, 1, 2, 3, 8, 10, 11]
+    with pytest.raises(ValueError):
+        sharding.parse_shard_ids('5-2')
+
+
+def test_dividir_em_clusters():
+    assert sharding.dividir_em_clusters(10, 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert sharding.dividir_em_clusters(2, 5) == [[0], [1]]
+    faixas = sharding.dividir_em_clusters(16, 4)
+    assert [sharding.formatar_shard_ids(f) for f in faixas] == ['0-3', '4-7', '8-11', '12-15']
+
+
+def test_criar_bot_conforme_ambiente(monkeypatch):
+    intents = discord.Intents.default()
+
+    monkeypatch.setattr(sharding, 'BOT_SHARD_COUNT', '')
+    bot = sharding.criar_bot(intents, command_prefix='!')
+    assert not isinstance(bot, commands.AutoShardedBot)
+
+    monkeypatch.setattr(sharding, 'BOT_SHARD_COUNT', '8')
+    monkeypatch.setattr(sharding, 'BOT_SHARD_IDS', '4-7')
+    bot = sharding.criar_bot(intents, command_prefix='!')
+    assert isinstance(bot, commands.AutoShardedBot)
+    assert bot.shard_count == 8
+    assert bot.shard_ids == [4, 5, 6, 7]
+
+    monkeypatch.setattr(sharding, 'BOT_SHARD_IDS', '6-9')
+    with pytest.raises(ValueError):
+        sharding.criar_bot(intents, command_prefix='!')
+
+
+@pytest.mark.asyncio
+async def test_reivindicar_entrada_guild(mock_supabase, mock_config):
+    resultado = mock_supabase.rpc.return_value.execute.return_value
+    resultado.data = True
+    assert await reivindicar_entrada_guild('123', 2) is True
+    mock_supabase.rpc.assert_called_with('reivindicar_entrada_guild', {'p_guild_id': '123', 'p_shard_id': 2})
+
+    resultado.data = False
+    assert await reivindicar_entrada_guild('123', 2) is False
+
+    mock_supabase.rpc.return_value.execute.side_effect = Exception('timeout')
+    assert await reivindicar_entrada_guild('123', 2) is True
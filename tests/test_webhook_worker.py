@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import api_pkg.webhook_worker as worker
+
+
+@pytest.fixture
+def supabase_worker(mock_supabase, monkeypatch):
+    monkeypatch.setattr(worker, "supabase", mock_supabase)
+    return mock_supabase
+
+
+def _updates(mock_supabase):
+    return [c.args[0] for c in mock_supabase.table.return_value.update.call_args_list]
+
+
+@pytest.mark.asyncio
+async def test_evento_processado_com_sucesso(supabase_worker):
+    handler = AsyncMock()
+
+    status = await worker.process_event({"id": 1, "attempts": 1, "event_type": "PAYMENT_RECEIVED"}, handler)
+
+    assert status == "processed"
+    handler.assert_awaited_once()
+    assert _updates(supabase_worker)[-1]["status"] == "processed"
+
+
+@pytest.mark.asyncio
+async def test_falha_agenda_retry_com_backoff(supabase_worker, monkeypatch):
+    monkeypatch.setattr(worker, "WEBHOOK_MAX_ATTEMPTS", 3)
+    handler = AsyncMock(side_effect=RuntimeError("supabase fora"))
+
+    status = await worker.process_event({"id": 1, "attempts": 1, "event_type": "PAYMENT_RECEIVED"}, handler)
+
+    assert status == "processing"
+    update = _updates(supabase_worker)[-1]
+    assert "status" not in update
+    assert update["locked_at"] is None
+    assert update["next_attempt_at"]
+    assert worker.retry_delay(3) > worker.retry_delay(1)
+
+
+@pytest.mark.asyncio
+async def test_falha_na_ultima_tentativa_marca_failed(supabase_worker, monkeypatch):
+    monkeypatch.setattr(worker, "WEBHOOK_MAX_ATTEMPTS", 3)
+    handler = AsyncMock(side_effect=RuntimeError("erro"))
+
+    status = await worker.process_event({"id": 1, "attempts": 3, "event_type": "PAYMENT_RECEIVED"}, handler)
+
+    assert status == "failed"
+    assert _updates(supabase_worker)[-1]["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_workers_drenam_eventos_pendentes_ao_iniciar(supabase_worker, monkeypatch):
+    pendentes = [
+        [{"id": 1, "attempts": 1, "event_type": "PAYMENT_RECEIVED"},
+         {"id": 2, "attempts": 2, "event_type": "PAYMENT_CONFIRMED"}],
+        [],
+    ]
+    monkeypatch.setattr(worker, "claim_due_events", AsyncMock(side_effect=lambda limit: pendentes.pop(0) if pendentes else []))
+    processados = []
+    done = asyncio.Event()
+
+    async def handler(event):
+        processados.append(event["id"])
+        if len(processados) == 2:
+            done.set()
+
+    worker.start_webhook_workers(handler)
+    try:
+        await asyncio.wait_for(done.wait(), timeout=2)
+    finally:
+        await worker.stop_webhook_workers()
+
+    assert sorted(processados) == [1, 2]
+
+
+
+@pytest.mark.asyncio
+async def test_backlog_maior_que_a_fila_drena_sem_esperar_o_poll(supabase_worker, monkeypatch):
+    monkeypatch.setattr(worker, "WEBHOOK_WORKERS", 1)  # capacidade da fila: 2
+    monkeypatch.setattr(worker, "WEBHOOK_POLL_INTERVAL", 60)
+    pendentes = [{"id": i, "attempts": 1, "event_type": "PAYMENT_RECEIVED"} for i in range(7)]
+
+    async def claim(limit):
+        lote = pendentes[:limit]
+        del pendentes[:limit]
+        return lote
+
+    monkeypatch.setattr(worker, "claim_due_events", claim)
+    processados = []
+    done = asyncio.Event()
+
+    async def handler(event):
+        processados.append(event["id"])
+        if len(processados) == 7:
+            done.set()
+
+    worker.start_webhook_workers(handler)
+    try:
+        await asyncio.wait_for(done.wait(), timeout=2)
+    finally:
+        await worker.stop_webhook_workers()
+
+    assert sorted(processados) == list(range(7))
+
+
+
+@pytest.mark.asyncio
+async def test_confirmacao_duplicada_aplica_pagamento_uma_vez(mock_supabase, monkeypatch):
+    import api_pkg.routes.payment as payment
+
+    monkeypatch.setattr(payment, "supabase", mock_supabase)
+    # PAYMENT_RECEIVED e PAYMENT_CONFIRMED: a RPC trava a linha, o segundo vê 'pago'
+    mock_supabase.rpc.return_value.execute.side_effect = [
+        MagicMock(data={"resultado": "pago"}),
+        MagicMock(data={"resultado": "ja_processado"}),
+    ]
+
+    resultados = await asyncio.gather(
+        payment.process_payment_confirmation("pay_1"),
+        payment.process_payment_confirmation("pay_1"),
+    )
+
+    assert sorted(resultados) == [False, True]
+    mock_supabase.rpc.assert_called_with("confirmar_pagamento_pix", {"p_pix_id": "pay_1"})
+    # Nenhuma escrita direta em assinaturas/pagamentos_pix fora da RPC
+    mock_supabase.table.assert_not_called()
+
+    mock_supabase.rpc.return_value.execute.side_effect = [MagicMock(data={"resultado": "plano_nao_encontrado"})]
+    with pytest.raises(RuntimeError):
+        await payment.process_payment_confirmation("pay_2")
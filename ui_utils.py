@@ -136,3 +136,39 @@ class ConfirmView(BaseMenuView):
         self.stop()
         await interaction.response.defer() # Acknowledge
 
+
+
+class CursorPaginatorView(BaseMenuView):
+    """
+    Previous/next pager over cursor (keyset) paginated data.
+
+    `fetch_page(cursor, page)` returns `(embed, next_cursor)`; the cursors of the
+    pages already visited are kept, so going back never needs an offset.
+    """
+    def __init__(self, user_id: int, fetch_page, *, timeout: int = 180):
+        super().__init__(user_id=user_id, timeout=timeout)
+        self.fetch_page = fetch_page
+        self.cursors = [None]  # cursor that opens each visited page
+        self.next_cursor = None
+
+    @property
+    def page(self) -> int:
+        return len(self.cursors)
+
+    async def render(self) -> discord.Embed:
+        embed, self.next_cursor = await self.fetch_page(self.cursors[-1], self.page)
+        self.previous_page.disabled = self.page == 1
+        self.next_page.disabled = self.next_cursor is None
+        return embed
+
+    @discord.ui.button(label="Anterior", style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Próxima", style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
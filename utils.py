@@ -7,7 +7,7 @@ import discord
 from discord.ext import commands
 from typing import Optional, Dict, List
 from config import PRODUTO_REGEX
-from database import get_empresas_by_guild
+from database import get_roteamento_empresas, resolver_empresa_por_canal
 
 
 # ============================================
@@ -23,19 +23,15 @@ def empresa_configurada():
         channel_id = str(ctx.channel.id)
         category_id = str(ctx.channel.category.id) if ctx.channel.category else None
         
-        empresas = await get_empresas_by_guild(guild_id)
+        roteamento = await get_roteamento_empresas(guild_id)
+        empresas = roteamento['empresas']
         
         if not empresas:
             await ctx.send("❌ Nenhuma empresa configurada neste servidor. Use `/configurar`.")
             return False
 
-        # 1. Busca exata pelo Canal ou Categoria
-        empresa_alvo = None
-        for emp in empresas:
-            if emp.get('canal_principal_id') == channel_id or \
-               emp.get('categoria_id') == category_id:
-                empresa_alvo = emp
-                break
+        # 1. Busca exata pelo Canal ou Categoria (índice em memória, O(1))
+        empresa_alvo = resolver_empresa_por_canal(roteamento, channel_id, category_id)
         
         if empresa_alvo:
             ctx.empresa = empresa_alvo
@@ -46,13 +42,13 @@ def empresa_configurada():
         # Se for comando administrativo (como configurar), permite seguir para seleção
         if len(empresas) == 1:
             ctx.empresa = empresas[0]
-            ctx.empresas_lista = empresas
+            ctx.empresas_lista = list(empresas)
             return True
         else:
             # Caso de múltiplas empresas e canal neutro
             # Vamos permitir que o selecionar_empresa lide com isso
             ctx.empresa = None
-            ctx.empresas_lista = empresas
+            ctx.empresas_lista = list(empresas)
             return True
 
     return commands.check(predicate)